@@ -0,0 +1,25 @@
+from django.contrib import admin
+from .models import ShipmentDailyRollup, ShipmentDailyTotal, BillingDailyRollup, BillingDailyTotal
+
+@admin.register(ShipmentDailyRollup)
+class ShipmentDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'client', 'destination', 'service_type', 'status', 'shipments', 'value')
+    list_filter = ('status', 'day')
+    date_hierarchy = 'day'
+
+@admin.register(ShipmentDailyTotal)
+class ShipmentDailyTotalAdmin(admin.ModelAdmin):
+    list_display = ('day', 'status', 'shipments', 'value')
+    list_filter = ('status',)
+    date_hierarchy = 'day'
+
+@admin.register(BillingDailyRollup)
+class BillingDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'client', 'invoices', 'amount_ttc', 'payments', 'received')
+    list_filter = ('day',)
+    date_hierarchy = 'day'
+
+@admin.register(BillingDailyTotal)
+class BillingDailyTotalAdmin(admin.ModelAdmin):
+    list_display = ('day', 'invoices', 'amount_ttc', 'payments', 'received')
+    date_hierarchy = 'day'
@@ -0,0 +1,77 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from analytics.models import ShipmentDailyTotal, BillingDailyTotal
+from analytics.rollups import rebuild_rollups
+from billing.models import Invoice, PaymentRecord
+from shipments.models import Shipment
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily analytics rollups from shipments, invoices and payments. '
+        'Run after bulk imports (which bypass the signals that keep rollups current).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild, YYYY-MM-DD (default: oldest data)')
+        parser.add_argument('--end', help='Last day to rebuild, YYYY-MM-DD (default: today)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days per chunk / transaction')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=min(4, os.cpu_count() or 1),
+            help='Chunks rebuilt in parallel (ignored on SQLite)',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Only rebuild when the rollup tables are empty (initial backfill at deploy)',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and (ShipmentDailyTotal.objects.exists() or BillingDailyTotal.objects.exists()):
+            self.stdout.write('Rollups already populated, skipping.')
+            return
+
+        start = self.parse_day(options['start'], '--start') or self.oldest_day()
+        end = self.parse_day(options['end'], '--end') or timezone.localdate()
+        if start is None:
+            self.stdout.write('Nothing to rebuild: no shipments, invoices or payments.')
+            return
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        chunks = rebuild_rollups(
+            start,
+            end + timedelta(days=1),
+            chunk_days=options['chunk_days'],
+            workers=options['workers'],
+            on_chunk=lambda chunk_start, chunk_end: self.stdout.write(f'  {chunk_start} .. {chunk_end - timedelta(days=1)}'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {start} to {end} ({chunks} chunks)'))
+
+    @staticmethod
+    def parse_day(value, option):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date (YYYY-MM-DD)')
+        return day
+
+    @staticmethod
+    def oldest_day():
+        oldest_shipment = Shipment.objects.aggregate(oldest=Min('created_at'))['oldest']
+        candidates = [
+            timezone.localdate(oldest_shipment) if oldest_shipment else None,
+            Invoice.objects.aggregate(oldest=Min('date'))['oldest'],
+            PaymentRecord.objects.aggregate(oldest=Min('date'))['oldest'],
+        ]
+        candidates = [day for day in candidates if day]
+        return min(candidates) if candidates else None
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:53
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('destinations', '0001_initial'),
+        ('service_types', '0002_servicetype_additional_fees_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoices', models.IntegerField(default=0)),
+                ('amount_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tva', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments', models.IntegerField(default=0)),
+                ('received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField(unique=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipments', models.IntegerField(default=0)),
+                ('weight_kg', models.FloatField(default=0)),
+                ('volume_m3', models.FloatField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='unique_shipment_total_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BillingDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoices', models.IntegerField(default=0)),
+                ('amount_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tva', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('amount_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments', models.IntegerField(default=0)),
+                ('received', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField()),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', 'day'], name='analytics_b_client__10521f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'client'), name='unique_billing_rollup_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shipments', models.IntegerField(default=0)),
+                ('weight_kg', models.FloatField(default=0)),
+                ('volume_m3', models.FloatField(default=0)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('day', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('destination', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='destinations.destination')),
+                ('service_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='service_types.servicetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', 'day'], name='analytics_s_client__54ce55_idx')],
+                'constraints': [models.UniqueConstraint(models.F('day'), models.F('client'), django.db.models.functions.comparison.Coalesce('destination', 0), django.db.models.functions.comparison.Coalesce('service_type', 0), models.F('status'), name='unique_shipment_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import Coalesce
+
+# Rollups are kept current by signals (analytics/signals.py) and rebuilt
+# with `manage.py rebuild_rollups`. Each fact table feeds two grains: a
+# per-client detail table (client dashboards, drill-down) and a per-day
+# total table that company-wide charts read a few hundred rows from.
+# Their keys are not database constraints and never cascade: deleting a
+# client, destination or service type moves its cells through signals
+# like any other change (see analytics/signals.py).
+ROLLUP_KEY = {'on_delete': models.DO_NOTHING, 'db_constraint': False, 'related_name': '+'}
+
+
+class ShipmentMeasures(models.Model):
+    shipments = models.IntegerField(default=0)
+    weight_kg = models.FloatField(default=0)
+    volume_m3 = models.FloatField(default=0)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class BillingMeasures(models.Model):
+    invoices = models.IntegerField(default=0)
+    amount_ht = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tva = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    amount_ttc = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments = models.IntegerField(default=0)
+    received = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ShipmentDailyRollup(ShipmentMeasures):
+    """Shipments per creation day, client, destination, service type and current status"""
+    day = models.DateField()
+    client = models.ForeignKey(settings.AUTH_USER_MODEL, **ROLLUP_KEY)
+    destination = models.ForeignKey('destinations.Destination', null=True, **ROLLUP_KEY)
+    service_type = models.ForeignKey('service_types.ServiceType', null=True, **ROLLUP_KEY)
+    status = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            # Coalesce so rows without destination / service type are unique too
+            models.UniqueConstraint(
+                'day', 'client', Coalesce('destination', 0), Coalesce('service_type', 0), 'status',
+                name='unique_shipment_rollup_key',
+            ),
+        ]
+        indexes = [models.Index(fields=['client', 'day'])]
+
+    def __str__(self):
+        return f"Shipments {self.day} - client {self.client_id}: {self.shipments}"
+
+
+class ShipmentDailyTotal(ShipmentMeasures):
+    """Shipments per creation day and current status, all clients"""
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='unique_shipment_total_key'),
+        ]
+
+    def __str__(self):
+        return f"Shipments {self.day} ({self.status}): {self.shipments}"
+
+
+class BillingDailyRollup(BillingMeasures):
+    """
+    Invoiced amounts (by invoice date) and payments received (by payment
+    date) per day and client.
+    """
+    day = models.DateField()
+    client = models.ForeignKey(settings.AUTH_USER_MODEL, **ROLLUP_KEY)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'client'], name='unique_billing_rollup_key'),
+        ]
+        indexes = [models.Index(fields=['client', 'day'])]
+
+    def __str__(self):
+        return f"Billing {self.day} - client {self.client_id}: {self.amount_ttc}"
+
+
+class BillingDailyTotal(BillingMeasures):
+    """Invoiced and received amounts per day, all clients"""
+    day = models.DateField(unique=True)
+
+    def __str__(self):
+        return f"Billing {self.day}: {self.amount_ttc}"
@@ -0,0 +1,234 @@
+"""
+Rollup Maintenance
+==================
+Incremental deltas (called from signals) and range rebuilds (called from
+`manage.py rebuild_rollups`) for the daily rollup tables.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from billing.models import Invoice, PaymentRecord
+from shipments.models import Shipment
+from .models import ShipmentDailyRollup, ShipmentDailyTotal, BillingDailyRollup, BillingDailyTotal
+
+SHIPMENT_FIELDS = ('created_at', 'client_id', 'destination_id', 'service_type_id', 'status', 'weight_kg', 'volume_m3', 'price')
+INVOICE_FIELDS = ('date', 'client_id', 'amount_ht', 'tva', 'amount_ttc')
+PAYMENT_FIELDS = ('date', 'invoice_id', 'amount')
+
+
+# ----------------------------------------------------------------------
+# Incremental updates
+# ----------------------------------------------------------------------
+def apply_delta(model, key, **deltas):
+    """Add `deltas` to the rollup row for `key`, creating it on first use"""
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**key).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **deltas)
+    except IntegrityError:
+        # Created concurrently by another request
+        model.objects.filter(**key).update(**updates)
+
+
+def shipment_delta(values, sign):
+    """`values` holds SHIPMENT_FIELDS of one shipment; sign is +1 or -1"""
+    day = timezone.localdate(values['created_at'])
+    deltas = {
+        'shipments': sign,
+        'weight_kg': sign * float(values['weight_kg']),
+        'volume_m3': sign * float(values['volume_m3']),
+        'value': sign * _decimal(values['price']),
+    }
+    apply_delta(ShipmentDailyRollup, {
+        'day': day,
+        'client_id': values['client_id'],
+        'destination_id': values['destination_id'],
+        'service_type_id': values['service_type_id'],
+        'status': values['status'],
+    }, **deltas)
+    apply_delta(ShipmentDailyTotal, {'day': day, 'status': values['status']}, **deltas)
+
+
+def move_shipment_status(shipments, status):
+    """
+    Set-based counterpart of the signal deltas, for a bulk status UPDATE of
+    the `shipments` queryset: call it before the update, in its transaction.
+    Moves each (day, client, destination, service type, status) cell's
+    measures into the same cell under `status`, one delta per cell.
+    """
+    cells = (
+        shipments.exclude(status=status)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'client_id', 'destination_id', 'service_type_id', 'status')
+        .annotate(n=Count('id'), weight=Sum('weight_kg'), volume=Sum('volume_m3'), total=Sum('price'))
+        .order_by()
+    )
+    totals = {}
+    for cell in cells:
+        deltas = {'shipments': cell['n'], 'weight_kg': cell['weight'] or 0.0, 'volume_m3': cell['volume'] or 0.0,
+                  'value': _decimal(cell['total'] or 0)}
+        key = {field: cell[field] for field in ('day', 'client_id', 'destination_id', 'service_type_id')}
+        apply_delta(ShipmentDailyRollup, {**key, 'status': cell['status']},
+                    **{field: -value for field, value in deltas.items()})
+        apply_delta(ShipmentDailyRollup, {**key, 'status': status}, **deltas)
+        for cell_status, sign in ((cell['status'], -1), (status, 1)):
+            total = totals.setdefault((cell['day'], cell_status), dict.fromkeys(deltas, 0))
+            for field, value in deltas.items():
+                total[field] += sign * value
+    for (day, cell_status), deltas in totals.items():
+        apply_delta(ShipmentDailyTotal, {'day': day, 'status': cell_status}, **deltas)
+
+
+def release_shipment_key(field, key_id):
+    """
+    After a destination / service type delete: its shipments were set to
+    NULL by an UPDATE that sends no signals, so move its cells into the
+    matching NULL cells. Totals do not change.
+    """
+    cells = ShipmentDailyRollup.objects.filter(**{f'{field}_id': key_id})
+    for cell in cells:
+        apply_delta(ShipmentDailyRollup, {
+            'day': cell.day, 'client_id': cell.client_id, 'destination_id': cell.destination_id,
+            'service_type_id': cell.service_type_id, 'status': cell.status, f'{field}_id': None,
+        }, **{measure: getattr(cell, measure) for measure in ('shipments', 'weight_kg', 'volume_m3', 'value')})
+    cells.delete()
+
+
+def drop_client_rollups(client_id):
+    """After a client delete: its shipments / invoices / payments were deleted with signals, leaving empty cells"""
+    ShipmentDailyRollup.objects.filter(client_id=client_id).delete()
+    BillingDailyRollup.objects.filter(client_id=client_id).delete()
+
+
+def invoice_delta(values, sign):
+    _billing_delta(
+        values['date'], values['client_id'],
+        invoices=sign, amount_ht=sign * _decimal(values['amount_ht']), tva=sign * _decimal(values['tva']),
+        amount_ttc=sign * _decimal(values['amount_ttc']),
+    )
+
+
+def payment_delta(values, client_id, sign):
+    _billing_delta(values['date'], client_id, payments=sign, received=sign * _decimal(values['amount']))
+
+
+def _billing_delta(day, client_id, **deltas):
+    apply_delta(BillingDailyRollup, {'day': day, 'client_id': client_id}, **deltas)
+    apply_delta(BillingDailyTotal, {'day': day}, **deltas)
+
+
+def _decimal(value):
+    # Unsaved instances may still hold the raw str / float that was assigned
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def field_values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+# ----------------------------------------------------------------------
+# Rebuilds
+# ----------------------------------------------------------------------
+def rebuild_rollups(start, end, chunk_days=31, workers=1, on_chunk=None):
+    """
+    Recompute every rollup row with start <= day < end from the fact tables.
+    The range is split into `chunk_days` chunks rebuilt by `workers` threads,
+    each in its own transaction and DB connection (SQLite always runs
+    serially: it allows a single writer).
+    """
+    chunks = []
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days), end)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+
+    if workers <= 1 or connection.vendor == 'sqlite':
+        for chunk in chunks:
+            rebuild_chunk(*chunk)
+            if on_chunk:
+                on_chunk(*chunk)
+        return len(chunks)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in pool.map(lambda chunk: _rebuild_chunk_in_thread(*chunk), chunks):
+            if on_chunk:
+                on_chunk(*chunk)
+    return len(chunks)
+
+
+def _rebuild_chunk_in_thread(start, end):
+    try:
+        rebuild_chunk(start, end)
+    finally:
+        connection.close()  # Connections are per thread
+    return start, end
+
+
+def rebuild_chunk(start, end):
+    day_start = timezone.make_aware(datetime.combine(start, time.min))
+    day_end = timezone.make_aware(datetime.combine(end, time.min))
+
+    shipment_rows = (
+        Shipment.objects
+        .filter(created_at__gte=day_start, created_at__lt=day_end)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'client_id', 'destination_id', 'service_type_id', 'status')
+        .annotate(n=Count('id'), weight=Sum('weight_kg'), volume=Sum('volume_m3'), total=Sum('price'))
+    )
+    invoice_rows = (
+        Invoice.objects
+        .filter(date__gte=start, date__lt=end)
+        .values('date', 'client_id')
+        .annotate(n=Count('id'), ht=Sum('amount_ht'), vat=Sum('tva'), ttc=Sum('amount_ttc'))
+    )
+    payment_rows = (
+        PaymentRecord.objects
+        .filter(date__gte=start, date__lt=end)
+        .values('date', 'invoice__client_id')
+        .annotate(n=Count('id'), total=Sum('amount'))
+    )
+
+    with transaction.atomic():
+        for model in (ShipmentDailyRollup, ShipmentDailyTotal, BillingDailyRollup, BillingDailyTotal):
+            model.objects.filter(day__gte=start, day__lt=end).delete()
+
+        details, totals = [], {}
+        for row in shipment_rows:
+            measures = {'shipments': row['n'], 'weight_kg': row['weight'], 'volume_m3': row['volume'], 'value': row['total']}
+            details.append(ShipmentDailyRollup(
+                day=row['day'], client_id=row['client_id'], destination_id=row['destination_id'],
+                service_type_id=row['service_type_id'], status=row['status'], **measures,
+            ))
+            _add_measures(totals, ShipmentDailyTotal, {'day': row['day'], 'status': row['status']}, measures)
+        ShipmentDailyRollup.objects.bulk_create(details, batch_size=1000)
+        ShipmentDailyTotal.objects.bulk_create(totals.values(), batch_size=1000)
+
+        details, totals = {}, {}
+        for row in invoice_rows:
+            measures = {'invoices': row['n'], 'amount_ht': row['ht'], 'tva': row['vat'], 'amount_ttc': row['ttc']}
+            _add_measures(details, BillingDailyRollup, {'day': row['date'], 'client_id': row['client_id']}, measures)
+            _add_measures(totals, BillingDailyTotal, {'day': row['date']}, measures)
+        for row in payment_rows:
+            measures = {'payments': row['n'], 'received': row['total']}
+            _add_measures(details, BillingDailyRollup, {'day': row['date'], 'client_id': row['invoice__client_id']}, measures)
+            _add_measures(totals, BillingDailyTotal, {'day': row['date']}, measures)
+        BillingDailyRollup.objects.bulk_create(details.values(), batch_size=1000)
+        BillingDailyTotal.objects.bulk_create(totals.values(), batch_size=1000)
+
+
+def _add_measures(rows, model, key, measures):
+    """Accumulate `measures` into the unsaved `model` row for `key`"""
+    row = rows.get(tuple(key.values()))
+    if row is None:
+        row = rows[tuple(key.values())] = model(**key)
+    for field, value in measures.items():
+        setattr(row, field, getattr(row, field) + value)
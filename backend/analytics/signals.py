@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from billing.models import Invoice, PaymentRecord
+from destinations.models import Destination
+from service_types.models import ServiceType
+from shipments.models import Shipment
+from .rollups import (
+    SHIPMENT_FIELDS, INVOICE_FIELDS, PAYMENT_FIELDS,
+    shipment_delta, invoice_delta, payment_delta, field_values, release_shipment_key, drop_client_rollups,
+)
+
+# Each saved row moves its contribution out of the rollup cell it counted
+# in before the save and into the cell it belongs to now. The previous
+# values are read in pre_save (one indexed lookup); bulk_create/update()
+# bypass signals, so bulk loaders must run `manage.py rebuild_rollups`.
+#
+# Deleting a client cascades to its shipments, invoices and payments with
+# signals, which empty its cells; they are dropped afterwards. Deleting a
+# destination / service type sets its shipments' key to NULL with a plain
+# UPDATE, so its cells are moved to the NULL key in one step.
+
+
+def _previous(sender, instance, fields):
+    if instance.pk is None or instance._state.adding:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Shipment)
+def remember_shipment(sender, instance, **kwargs):
+    instance._rollup_previous = _previous(sender, instance, SHIPMENT_FIELDS)
+
+
+@receiver(post_save, sender=Shipment)
+def update_shipment_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    current = field_values(instance, SHIPMENT_FIELDS)
+    if previous == current:
+        return
+    if previous:
+        shipment_delta(previous, -1)
+    shipment_delta(current, +1)
+
+
+@receiver(post_delete, sender=Shipment)
+def remove_shipment_from_rollup(sender, instance, **kwargs):
+    shipment_delta(field_values(instance, SHIPMENT_FIELDS), -1)
+
+
+@receiver(pre_save, sender=Invoice)
+def remember_invoice(sender, instance, **kwargs):
+    instance._rollup_previous = _previous(sender, instance, INVOICE_FIELDS)
+
+
+@receiver(post_save, sender=Invoice)
+def update_invoice_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    current = field_values(instance, INVOICE_FIELDS)
+    if previous == current:
+        return  # e.g. only paid_amount / status changed
+    if previous:
+        invoice_delta(previous, -1)
+    invoice_delta(current, +1)
+
+
+@receiver(post_delete, sender=Invoice)
+def remove_invoice_from_rollup(sender, instance, **kwargs):
+    invoice_delta(field_values(instance, INVOICE_FIELDS), -1)
+
+
+def _payment_client_id(invoice_id):
+    return Invoice.objects.filter(pk=invoice_id).values_list('client_id', flat=True).first()
+
+
+@receiver(pre_save, sender=PaymentRecord)
+def remember_payment(sender, instance, **kwargs):
+    instance._rollup_previous = _previous(sender, instance, PAYMENT_FIELDS)
+
+
+@receiver(post_save, sender=PaymentRecord)
+def update_payment_rollup(sender, instance, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    current = field_values(instance, PAYMENT_FIELDS)
+    if previous == current:
+        return
+    if previous:
+        payment_delta(previous, _payment_client_id(previous['invoice_id']), -1)
+    payment_delta(current, _payment_client_id(current['invoice_id']), +1)
+
+
+@receiver(post_delete, sender=PaymentRecord)
+def remove_payment_from_rollup(sender, instance, **kwargs):
+    client_id = _payment_client_id(instance.invoice_id)
+    if client_id is not None:
+        payment_delta(field_values(instance, PAYMENT_FIELDS), client_id, -1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def remove_client_rollups(sender, instance, **kwargs):
+    drop_client_rollups(instance.pk)
+
+
+@receiver(post_delete, sender=Destination)
+def release_destination_rollups(sender, instance, **kwargs):
+    release_shipment_key('destination', instance.pk)
+
+
+@receiver(post_delete, sender=ServiceType)
+def release_service_type_rollups(sender, instance, **kwargs):
+    release_shipment_key('service_type', instance.pk)
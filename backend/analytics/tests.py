@@ -0,0 +1,110 @@
+import datetime
+import io
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from analytics.models import ShipmentDailyRollup, ShipmentDailyTotal, BillingDailyRollup, BillingDailyTotal
+from billing.models import Invoice, PaymentRecord
+from destinations.models import Destination
+from service_types.models import ServiceType
+from shipments.models import Shipment
+from users.models import User
+
+SHIPMENT_MEASURES = ('shipments', 'weight_kg', 'volume_m3', 'value')
+BILLING_MEASURES = ('invoices', 'amount_ht', 'tva', 'amount_ttc', 'payments', 'received')
+ROLLUP_FIELDS = {
+    ShipmentDailyRollup: ('day', 'client_id', 'destination_id', 'service_type_id', 'status', *SHIPMENT_MEASURES),
+    ShipmentDailyTotal: ('day', 'status', *SHIPMENT_MEASURES),
+    BillingDailyRollup: ('day', 'client_id', *BILLING_MEASURES),
+    BillingDailyTotal: ('day', *BILLING_MEASURES),
+}
+
+
+def rollup_rows(model):
+    # Cells emptied by deltas stay at zero; a rebuild does not recreate them
+    rows = model.objects.values_list(*ROLLUP_FIELDS[model])
+    if model in (ShipmentDailyRollup, ShipmentDailyTotal):
+        rows = rows.exclude(shipments=0)
+    else:
+        rows = rows.exclude(invoices=0, payments=0)
+    return sorted(rows, key=str)
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_a = User.objects.create_user(username='client_a', password='pass', role='client')
+        cls.client_b = User.objects.create_user(username='client_b', password='pass', role='client')
+        cls.destination = Destination.objects.create(name='Oran', country='DZ', city='Oran', delivery_zone='West',
+                                                     distance_km=400, type='Regular')
+
+    def test_signals_match_a_full_rebuild(self):
+        shipments = [
+            Shipment.objects.create(client=self.client_a, destination=self.destination, weight_kg=10, volume_m3=1,
+                                    price=Decimal('100.00'))
+            for _ in range(3)
+        ]
+        shipments[0].status = 'Delivered'
+        shipments[0].save()
+        shipments[1].client = self.client_b
+        shipments[1].price = Decimal('250.00')
+        shipments[1].save()
+        shipments[2].delete()
+
+        invoice = Invoice.objects.create(client=self.client_a, amount_ht=Decimal('100'), tva=Decimal('19'),
+                                         amount_ttc=Decimal('119'), date=datetime.date(2025, 5, 1))
+        payment = PaymentRecord.objects.create(invoice=invoice, amount=Decimal('50'), date=datetime.date(2025, 5, 3),
+                                               method='Cash')
+        payment.amount = Decimal('60')
+        payment.save()
+        invoice.amount_ttc = Decimal('120')
+        invoice.save()
+
+        self.assertEqual(
+            sorted(ShipmentDailyRollup.objects.filter(shipments__gt=0).values_list('client_id', 'status', 'value')),
+            sorted([(self.client_a.id, 'Delivered', Decimal('100.00')), (self.client_b.id, 'Pending', Decimal('250.00'))]),
+        )
+        incremental = {model: rollup_rows(model) for model in ROLLUP_FIELDS}
+
+        call_command('rebuild_rollups', start='2025-01-01', stdout=io.StringIO())
+        for model, rows in incremental.items():
+            self.assertEqual(rollup_rows(model), rows)
+        self.assertEqual(
+            BillingDailyRollup.objects.get(day=datetime.date(2025, 5, 3)).received, Decimal('60')
+        )
+
+    def test_deleting_keys_keeps_rollups_matching_the_facts(self):
+        service_type = ServiceType.objects.create(name='Express', description='', category='Delivery',
+                                                  base_price=Decimal('500'), estimated_delivery_time='24h')
+        other = Destination.objects.create(name='Blida', country='DZ', city='Blida', delivery_zone='Centre',
+                                           distance_km=50, type='Regular')
+        for client in (self.client_a, self.client_b):
+            for destination in (self.destination, other, None):
+                Shipment.objects.create(client=client, destination=destination, service_type=service_type,
+                                        weight_kg=10, volume_m3=1, price=Decimal('100.00'))
+        invoice = Invoice.objects.create(client=self.client_a, amount_ht=Decimal('100'), tva=Decimal('19'),
+                                         amount_ttc=Decimal('119'), date=datetime.date(2025, 5, 1))
+        PaymentRecord.objects.create(invoice=invoice, amount=Decimal('50'), date=datetime.date(2025, 5, 3),
+                                     method='Cash')
+
+        def assert_matches_a_rebuild():
+            incremental = {model: rollup_rows(model) for model in ROLLUP_FIELDS}
+            call_command('rebuild_rollups', start='2025-01-01', stdout=io.StringIO())
+            for model, rows in incremental.items():
+                self.assertEqual(rollup_rows(model), rows, model.__name__)
+
+        client_id = self.client_a.pk
+        self.client_a.delete()  # Cascades to its shipments, invoices and payments
+        self.assertFalse(ShipmentDailyRollup.objects.filter(client_id=client_id).exists())
+        self.assertFalse(BillingDailyRollup.objects.filter(client_id=client_id).exists())
+        assert_matches_a_rebuild()
+
+        other.delete()  # Shipments keep existing without a destination
+        self.assertEqual(ShipmentDailyRollup.objects.get(destination=None).shipments, 2)
+        assert_matches_a_rebuild()
+
+        service_type.delete()
+        self.assertEqual(ShipmentDailyRollup.objects.get(service_type=None, destination=None).shipments, 2)
+        assert_matches_a_rebuild()
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='paymentrecord',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
@@ -14,7 +14,7 @@ class Invoice(models.Model):
     tva = models.DecimalField(max_digits=10, decimal_places=2)
     amount_ttc = models.DecimalField(max_digits=10, decimal_places=2)
     paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Unpaid')
     
     def __str__(self):
@@ -23,7 +23,7 @@ class Invoice(models.Model):
 class PaymentRecord(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='payments')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     method = models.CharField(max_length=50)
     
     def __str__(self):
@@ -10,8 +10,12 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsManager]
+    cursor_ordering = ('-date', '-id')
     
     def get_queryset(self):
+        return self._get_scoped_queryset().select_related('client').prefetch_related('payments', 'shipments')
+
+    def _get_scoped_queryset(self):
         """Clients see only their own invoices"""
         user = self.request.user
         if user.role in ['admin', 'manager']:
@@ -28,3 +32,4 @@ class PaymentRecordViewSet(viewsets.ModelViewSet):
     queryset = PaymentRecord.objects.all()
     serializer_class = PaymentRecordSerializer
     permission_classes = [IsManager]
+    cursor_ordering = ('-date', '-id')
@@ -17,4 +17,10 @@ python manage.py migrate
 echo "Step 4: Seeding test accounts..."
 python manage.py seed_accounts
 
+echo "Step 5: Backfilling analytics rollups (first deploy only)..."
+python manage.py rebuild_rollups --if-empty
+
+echo "Step 6: Building the destination distance matrix (when missing or stale)..."
+python manage.py build_distance_matrix --if-stale
+
 echo "Build successful!"
@@ -11,7 +11,7 @@ class ClientViewSet(AuditLogMixin, viewsets.ModelViewSet):
     Clients: Manager-only access for client management
     Clients can access their own record via /clients/me/
     """
-    queryset = Client.objects.filter(user__role='client')
+    queryset = Client.objects.filter(user__role='client').select_related('user')
     serializer_class = ClientSerializer
     permission_classes = [IsManager]
     
@@ -22,7 +22,7 @@ class ClientViewSet(AuditLogMixin, viewsets.ModelViewSet):
         Allows clients to access their own client profile.
         """
         try:
-            client = Client.objects.get(user=request.user)
+            client = Client.objects.select_related('user').get(user=request.user)
             serializer = self.get_serializer(client)
             return Response(serializer.data)
         except Client.DoesNotExist:
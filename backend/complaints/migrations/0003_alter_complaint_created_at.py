@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='complaint',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -20,7 +20,7 @@ class Complaint(models.Model):
     date = models.DateField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Open')
     priority = models.CharField(max_length=20, choices=PRIORITY_CHOICES, default='Medium')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     
     def __str__(self):
         return f"Complaint {self.id} - {self.client.username}"
@@ -10,6 +10,7 @@ class ComplaintViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     queryset = Complaint.objects.all().order_by('-date')
     serializer_class = ComplaintSerializer
+    cursor_ordering = ('-created_at', '-id')
     
     def get_permissions(self):
         if self.action == 'create':
@@ -18,6 +19,7 @@ class ComplaintViewSet(AuditLogMixin, viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Complaint.objects.select_related('client').prefetch_related('related_items').order_by('-date')
         if user.role in ['admin', 'manager']:
-            return Complaint.objects.all().order_by('-date')
-        return Complaint.objects.filter(client=user).order_by('-date')
+            return queryset
+        return queryset.filter(client=user)
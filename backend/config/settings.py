@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -62,6 +64,8 @@ INSTALLED_APPS = [
     'incidents',
     'complaints',
     'billing',
+    'stats',
+    'analytics',
 ]
 
 REST_FRAMEWORK = {
@@ -76,6 +80,9 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'users.exception_handlers.custom_exception_handler',
     # Don't leak information about non-existent resources
     'NON_FIELD_ERRORS_KEY': 'detail',
+    # Opt-in keyset pagination: lists stay unpaginated unless ?page_size= or ?cursor= is sent
+    'DEFAULT_PAGINATION_CLASS': 'users.pagination.OptInCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 MIDDLEWARE = [
@@ -171,6 +178,80 @@ CORS_ALLOW_ALL_ORIGINS = True # Temporary for debugging if empty
 CSRF_TRUSTED_ORIGINS = [origin.rstrip('/') for origin in os.environ.get('CSRF_TRUSTED_ORIGINS', 'https://routemind-blush.vercel.app http://localhost:5173 http://localhost:3000').split(' ') if origin]
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
+# Audit logging: AuditLog.log() hands entries to a background thread that
+# bulk-inserts them. Synchronous under the test runner so tests see the rows.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+AUDIT_LOG_ASYNC = os.environ.get('AUDIT_LOG_ASYNC', str(not TESTING)).lower() == 'true'
+AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', '200'))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', '2.0'))  # seconds
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', '10000'))
+# Failed batches are retried this many times (0.5 s, 1 s, 2 s... apart),
+# then written row by row; rows that still fail are spooled or dropped
+AUDIT_LOG_FLUSH_RETRIES = int(os.environ.get('AUDIT_LOG_FLUSH_RETRIES', '3'))
+# Optional crash-safe spool for queued entries (one NDJSON file per worker)
+AUDIT_LOG_SPOOL_DIR = os.environ.get('AUDIT_LOG_SPOOL_DIR', '')
+
+# Permission-denied auditing: identical denials (user/IP, endpoint, method)
+# are coalesced into one summary row per window. SAMPLE_RATE is the chance
+# that the first denial of a window is also written on its own. Closed
+# windows are swept every SWEEP_INTERVAL seconds (0 = only on the next
+# denial and at shutdown; the default under the test runner).
+AUDIT_DENIAL_WINDOW_SECONDS = int(os.environ.get('AUDIT_DENIAL_WINDOW_SECONDS', '60'))
+AUDIT_DENIAL_SWEEP_INTERVAL = float(os.environ.get('AUDIT_DENIAL_SWEEP_INTERVAL', '0' if TESTING else '5'))
+AUDIT_DENIAL_SAMPLE_RATE = float(os.environ.get('AUDIT_DENIAL_SAMPLE_RATE', '1.0'))
+AUDIT_DENIAL_MAX_KEYS = int(os.environ.get('AUDIT_DENIAL_MAX_KEYS', '10000'))
+
+# Audit retention: `manage.py archive_audit_logs` moves rows older than
+# RETENTION_DAYS into gzip NDJSON files (one per day) under ARCHIVE_DIR.
+# Point ARCHIVE_DIR at persistent storage in production.
+AUDIT_LOG_RETENTION_DAYS = int(os.environ.get('AUDIT_LOG_RETENTION_DAYS', '90'))
+AUDIT_LOG_ARCHIVE_DIR = os.environ.get('AUDIT_LOG_ARCHIVE_DIR', str(BASE_DIR / 'audit_archive'))
+
+# Quote engine: compiled pricing tables are invalidated by signals in the
+# process that changed a rule; other workers recompile after MAX_AGE seconds.
+PRICING_TABLE_MAX_AGE = float(os.environ.get('PRICING_TABLE_MAX_AGE', '30'))
+# What-if simulations (POST /pricing-rules/simulate/) price shipment chunks
+# in this many worker processes; 1 prices inline in the request process.
+PRICING_SIMULATION_WORKERS = int(os.environ.get('PRICING_SIMULATION_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Route planner (POST /routes/plan/): solver time budget in seconds, local
+# search processes, and the speed / per-stop handling time used for ETAs.
+ROUTE_PLANNING_TIME_BUDGET = float(os.environ.get('ROUTE_PLANNING_TIME_BUDGET', '10'))
+ROUTE_PLANNING_WORKERS = int(os.environ.get('ROUTE_PLANNING_WORKERS', str(min(4, os.cpu_count() or 1))))
+ROUTE_AVERAGE_SPEED_KMH = float(os.environ.get('ROUTE_AVERAGE_SPEED_KMH', '60'))
+ROUTE_STOP_MINUTES = float(os.environ.get('ROUTE_STOP_MINUTES', '10'))
+# Live dispatch (routes/dispatch.py): with DISPATCH_ON_CREATE (opt-in), new
+# shipments are inserted into nearby Planned routes (stops within RADIUS) when
+# the detour is at most MAX_DETOUR km; otherwise managers get the SUGGESTIONS
+# cheapest insertions. POST /shipments/<id>/dispatch/ works either way.
+DISPATCH_ON_CREATE = os.environ.get('DISPATCH_ON_CREATE', 'False').lower() == 'true'
+DISPATCH_CANDIDATE_RADIUS_KM = float(os.environ.get('DISPATCH_CANDIDATE_RADIUS_KM', '50'))
+DISPATCH_MAX_DETOUR_KM = float(os.environ.get('DISPATCH_MAX_DETOUR_KM', '30'))
+DISPATCH_SUGGESTIONS = int(os.environ.get('DISPATCH_SUGGESTIONS', '5'))
+# Driver / vehicle assignment (POST /routes/assign/): driving hours and
+# incidents over these many past days weigh in the assignment costs.
+ASSIGNMENT_WORKLOAD_DAYS = int(os.environ.get('ASSIGNMENT_WORKLOAD_DAYS', '7'))
+ASSIGNMENT_INCIDENT_DAYS = int(os.environ.get('ASSIGNMENT_INCIDENT_DAYS', '90'))
+# Availability (routes/availability.py): a route books its driver and vehicle
+# from DAY_START_HOUR on its date for its estimated duration (DEFAULT_DURATION
+# when unknown); the interval index is rebuilt on change, elsewhere after MAX_AGE.
+ROUTE_DAY_START_HOUR = float(os.environ.get('ROUTE_DAY_START_HOUR', '8'))
+ROUTE_DEFAULT_DURATION_HOURS = float(os.environ.get('ROUTE_DEFAULT_DURATION_HOURS', '8'))
+ROUTE_AVAILABILITY_MAX_AGE = float(os.environ.get('ROUTE_AVAILABILITY_MAX_AGE', '30'))
+
+# Destination distance matrix (destinations/geo.py): memory-mapped files
+# under DIR, rebuilt by `manage.py build_distance_matrix [--if-stale]`. Haversine
+# distances are multiplied by ROAD_FACTOR unless a road distance is imported.
+# The test runner gets a throwaway directory.
+DISTANCE_MATRIX_DIR = os.environ.get(
+    'DISTANCE_MATRIX_DIR',
+    tempfile.mkdtemp(prefix='distance-matrix-') if TESTING else str(BASE_DIR / 'distance_matrix'),
+)
+DISTANCE_ROAD_FACTOR = float(os.environ.get('DISTANCE_ROAD_FACTOR', '1.3'))
+# Nearest / nearby destination lookups (destinations/spatial.py): the grid
+# index is rebuilt on change in the changing process, in others after MAX_AGE.
+DESTINATION_INDEX_MAX_AGE = float(os.environ.get('DESTINATION_INDEX_MAX_AGE', '30'))
+
 # Google OAuth Settings
 # Get your Client ID from https://console.cloud.google.com/apis/credentials
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', '490153297375-nr0jsbknki9nqou59b9smv8nrdahoi7k.apps.googleusercontent.com')
@@ -11,13 +11,14 @@ from destinations.views import DestinationViewSet
 from service_types.views import ServiceTypeViewSet
 from shipments.views import ShipmentViewSet
 from routes.views import RouteViewSet
-from pricing.views import PricingRuleViewSet
+from pricing.views import PricingRuleViewSet, QuoteViewSet
 from vehicles.views import VehicleViewSet
 from drivers.views import DriverViewSet
 from incidents.views import IncidentViewSet
 from billing.views import InvoiceViewSet, PaymentRecordViewSet
 from complaints.views import ComplaintViewSet
 from clients.views import ClientViewSet
+from stats.views import StatsViewSet
 
 router = DefaultRouter()
 router.register(r'audit-logs', AuditLogViewSet, basename='auditlog')
@@ -33,7 +34,9 @@ router.register(r'invoices', InvoiceViewSet)
 router.register(r'payments', PaymentRecordViewSet)
 router.register(r'complaints', ComplaintViewSet)
 router.register(r'pricing-rules', PricingRuleViewSet)
+router.register(r'quotes', QuoteViewSet, basename='quote')
 router.register(r'clients', ClientViewSet)
+router.register(r'stats', StatsViewSet, basename='stats')
 
 from django.http import JsonResponse
 
@@ -1,8 +1,14 @@
 from django.contrib import admin
-from .models import Destination
+from .models import Destination, RoadDistance
 
 @admin.register(Destination)
 class DestinationAdmin(admin.ModelAdmin):
     list_display = ('name', 'city', 'country', 'type', 'destination_type', 'is_active')
     list_filter = ('type', 'destination_type', 'is_active')
     search_fields = ('name', 'city', 'country')
+
+
+@admin.register(RoadDistance)
+class RoadDistanceAdmin(admin.ModelAdmin):
+    list_display = ('origin', 'destination', 'distance_km', 'duration_hours')
+    raw_id_fields = ('origin', 'destination')
@@ -0,0 +1,371 @@
+"""
+Destination Geography
+=====================
+Coordinates come from an offline gazetteer (destinations/data/gazetteer.csv),
+no network lookups.
+
+Pairwise distances / driving times between destinations live in a
+memory-mapped NumPy matrix under DISTANCE_MATRIX_DIR, so any process can
+look a pair up in O(1) without loading it:
+
+    meta.json            {"version", "size", "capacity"}
+    v<version>/ids.i8    destination id per row (0 = free / removed)
+    v<version>/coords.f8 latitude, longitude per row
+    v<version>/distance.f4, duration.f4   capacity x capacity
+
+Distances are great-circle (vectorized haversine) times DISTANCE_ROAD_FACTOR,
+durations distance / ROUTE_AVERAGE_SPEED_KMH; imported RoadDistance rows
+override both. A new destination is appended in place (one row and column)
+while there is spare capacity (a quarter of the size, at least MIN_CAPACITY
+rows). Saves never rebuild: a destination that does not fit, or arrives
+before the first build, only marks the matrix stale (a `stale` file), and
+`manage.py build_distance_matrix --if-stale` rebuilds it - run it from cron.
+Until then planning falls back to its corridor estimates for the missing
+pairs. A rebuild writes a new version directory and then switches
+meta.json, so readers never see a half-written matrix.
+Writers serialize on a file lock (flock on POSIX, msvcrt.locking on Windows).
+"""
+import csv
+import json
+import os
+import shutil
+import threading
+import unicodedata
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+EARTH_RADIUS_KM = 6371.0088
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+MIN_CAPACITY = 64
+
+
+def matrix_capacity(size):
+    """Rows to allocate for `size` destinations: 25% headroom, at least MIN_CAPACITY spare rows"""
+    return size + max(size // 4, MIN_CAPACITY)
+
+
+def _normalize(name):
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode()
+    return ' '.join(name.replace('-', ' ').replace("'", ' ').casefold().split())
+
+
+@lru_cache(maxsize=4)
+def load_gazetteer(path=GAZETTEER_PATH):
+    """({(city, country): (lat, lon)}, {city: (lat, lon) or None if ambiguous}) with normalized names"""
+    by_city_country, by_city = {}, {}
+    with open(path, newline='', encoding='utf-8') as gazetteer:
+        for row in csv.DictReader(gazetteer):
+            city, country = _normalize(row['city']), _normalize(row['country'])
+            coordinates = (float(row['latitude']), float(row['longitude']))
+            by_city_country[city, country] = coordinates
+            by_city[city] = None if city in by_city and by_city[city] != coordinates else coordinates
+    return by_city_country, by_city
+
+
+def geocode(city, country=''):
+    """(latitude, longitude) of a city from the gazetteer, or None"""
+    by_city_country, by_city = load_gazetteer()
+    city = _normalize(city)
+    return by_city_country.get((city, _normalize(country))) or by_city.get(city)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distances; arguments broadcast like NumPy arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def estimate(lat1, lon1, lat2, lon2):
+    """(road distance km, driving hours) estimates from coordinates"""
+    distance = haversine_km(lat1, lon1, lat2, lon2) * settings.DISTANCE_ROAD_FACTOR
+    return distance, distance / settings.ROUTE_AVERAGE_SPEED_KMH
+
+
+@contextmanager
+def _file_lock(lock_file):
+    """Exclusive lock on an open file for the block: flock on POSIX, msvcrt.locking on Windows"""
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            break
+        except OSError:  # LK_LOCK gives up after ~10 s of retries; keep waiting like flock
+            continue
+    try:
+        yield
+    finally:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DistanceMatrix:
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._state = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return Path(self._directory or settings.DISTANCE_MATRIX_DIR)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _meta(self):
+        try:
+            with open(self.directory / 'meta.json') as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            return None
+
+    def _current(self):
+        """Open memmaps for the published version; reopened when meta.json changes"""
+        try:
+            stamp = os.stat(self.directory / 'meta.json').st_mtime_ns
+        except FileNotFoundError:
+            self._state = None
+            return None
+        state = self._state
+        if state is not None and state['stamp'] == stamp:
+            return state
+        with self._lock:
+            meta = self._meta()
+            if meta is None:
+                return None
+            files = self._open(meta['version'], meta['capacity'], mode='r')
+            size = meta['size']
+            ids = files['ids'][:size]
+            self._state = state = {
+                'stamp': stamp,
+                'size': size,
+                'index': {dest_id: row for row, dest_id in enumerate(ids.tolist()) if dest_id},
+                **files,
+            }
+            return state
+
+    def _open(self, version, capacity, mode):
+        folder = self.directory / f'v{version}'
+        return {
+            'ids': np.memmap(folder / 'ids.i8', dtype=np.int64, mode=mode, shape=(capacity,)),
+            'coords': np.memmap(folder / 'coords.f8', dtype=np.float64, mode=mode, shape=(capacity, 2)),
+            'distance': np.memmap(folder / 'distance.f4', dtype=np.float32, mode=mode, shape=(capacity, capacity)),
+            'duration': np.memmap(folder / 'duration.f4', dtype=np.float32, mode=mode, shape=(capacity, capacity)),
+        }
+
+    def exists(self):
+        return self._current() is not None
+
+    def is_stale(self):
+        """Missing, or marked stale by a destination the matrix could not take in place"""
+        return not self.exists() or (self.directory / 'stale').exists()
+
+    def __len__(self):
+        state = self._current()
+        return len(state['index']) if state else 0
+
+    def pair(self, origin_id, destination_id):
+        """(distance_km, duration_hours) between two destinations, or None if either is unknown"""
+        state = self._current()
+        if state is None:
+            return None
+        origin, destination = state['index'].get(origin_id), state['index'].get(destination_id)
+        if origin is None or destination is None:
+            return None
+        return float(state['distance'][origin, destination]), float(state['duration'][origin, destination])
+
+    def submatrix(self, destination_ids):
+        """(distance, duration) float64 matrices for `destination_ids`; NaN for unknown ids"""
+        count = len(destination_ids)
+        distance = np.full((count, count), np.nan)
+        duration = np.full((count, count), np.nan)
+        state = self._current()
+        if state is None or not count:
+            return distance, duration
+        rows = np.array([state['index'].get(dest_id, -1) for dest_id in destination_ids], dtype=np.int64)
+        known = np.flatnonzero(rows >= 0)
+        grid = np.ix_(rows[known], rows[known])
+        distance[np.ix_(known, known)] = state['distance'][grid]
+        duration[np.ix_(known, known)] = state['duration'][grid]
+        return distance, duration
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _write_lock(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'a+') as lock_file, _file_lock(lock_file):
+            yield
+
+    def _publish(self, meta, previous_version=None):
+        tmp = self.directory / 'meta.json.tmp'
+        with open(tmp, 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp, self.directory / 'meta.json')
+        if previous_version is not None and previous_version != meta['version']:
+            # Readers still mapping the old files keep them alive until they reopen
+            shutil.rmtree(self.directory / f'v{previous_version}', ignore_errors=True)
+
+    def _allocate(self, version, capacity):
+        folder = self.directory / f'v{version}'
+        shutil.rmtree(folder, ignore_errors=True)
+        folder.mkdir(parents=True)
+        files = self._open(version, capacity, mode='w+')
+        files['distance'][:] = np.nan
+        files['duration'][:] = np.nan
+        return files
+
+    def build(self, rows, overrides=(), block_rows=512):
+        """
+        Rebuild from scratch. `rows`: [(destination_id, latitude, longitude)],
+        `overrides`: [(origin_id, destination_id, distance_km, duration_hours)].
+        """
+        rows = list(rows)
+        size = len(rows)
+        capacity = matrix_capacity(size)
+        with self._write_lock():
+            previous = self._meta()
+            version = (previous['version'] + 1) if previous else 1
+            files = self._allocate(version, capacity)
+            if size:
+                ids, lats, lons = (np.array(column) for column in zip(*rows))
+                files['ids'][:size] = ids
+                files['coords'][:size] = np.column_stack([lats, lons])
+                for start in range(0, size, block_rows):
+                    end = min(start + block_rows, size)
+                    distance, duration = estimate(lats[start:end, None], lons[start:end, None], lats[None, :], lons[None, :])
+                    files['distance'][start:end, :size] = distance
+                    files['duration'][start:end, :size] = duration
+                index = {dest_id: row for row, dest_id in enumerate(ids.tolist())}
+                self._apply(files, index, overrides)
+            for array in files.values():
+                array.flush()
+            self._publish({'version': version, 'size': size, 'capacity': capacity},
+                          previous['version'] if previous else None)
+
+    def upsert(self, destination_id, latitude, longitude, overrides=()):
+        """Add or move one destination: recompute its row and column only"""
+        with self._write_lock():
+            meta = self._meta()
+            if meta is None:
+                return False
+            files = self._open(meta['version'], meta['capacity'], mode='r+')
+            size = meta['size']
+            ids = files['ids'][:size]
+            existing = np.flatnonzero(ids == destination_id)
+            if len(existing):
+                row = int(existing[0])
+            elif size < meta['capacity']:
+                row, size = size, size + 1
+            else:
+                return False  # Full: needs a rebuild with a larger capacity
+
+            files['ids'][row] = destination_id
+            files['coords'][row] = (latitude, longitude)
+            live = files['ids'][:size] != 0
+            distance, duration = estimate(latitude, longitude, files['coords'][:size, 0], files['coords'][:size, 1])
+            distance[~live] = np.nan
+            duration[~live] = np.nan
+            files['distance'][row, :size] = files['distance'][:size, row] = distance
+            files['duration'][row, :size] = files['duration'][:size, row] = duration
+            index = {dest_id: position for position, dest_id in enumerate(files['ids'][:size].tolist()) if dest_id}
+            self._apply(files, index, overrides)
+            for array in files.values():
+                array.flush()
+            self._publish(dict(meta, size=size))
+            return True
+
+    def mark_stale(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / 'stale').touch()
+
+    def clear_stale(self):
+        (self.directory / 'stale').unlink(missing_ok=True)
+
+    def remove(self, destination_id):
+        with self._write_lock():
+            meta = self._meta()
+            if meta is None:
+                return
+            files = self._open(meta['version'], meta['capacity'], mode='r+')
+            rows = np.flatnonzero(files['ids'][:meta['size']] == destination_id)
+            if len(rows):
+                files['ids'][rows] = 0
+                files['ids'].flush()
+                self._publish(meta)
+
+    def set_overrides(self, overrides):
+        """Write imported road distances into the current matrix in place"""
+        with self._write_lock():
+            meta = self._meta()
+            if meta is None:
+                return
+            files = self._open(meta['version'], meta['capacity'], mode='r+')
+            ids = files['ids'][:meta['size']].tolist()
+            self._apply(files, {dest_id: row for row, dest_id in enumerate(ids) if dest_id}, overrides)
+            files['distance'].flush()
+            files['duration'].flush()
+            self._publish(meta)
+
+    @staticmethod
+    def _apply(files, index, overrides):
+        for origin_id, destination_id, distance_km, duration_hours in overrides:
+            origin, destination = index.get(origin_id), index.get(destination_id)
+            if origin is None or destination is None:
+                continue
+            files['distance'][origin, destination] = distance_km
+            files['duration'][origin, destination] = (
+                duration_hours if duration_hours is not None else distance_km / settings.ROUTE_AVERAGE_SPEED_KMH
+            )
+
+
+distance_matrix = DistanceMatrix()
+
+
+def road_overrides(destination_id=None):
+    """RoadDistance rows as override tuples, optionally only those touching one destination"""
+    from django.db.models import Q
+    from .models import RoadDistance
+
+    rows = RoadDistance.objects.all()
+    if destination_id is not None:
+        rows = rows.filter(Q(origin_id=destination_id) | Q(destination_id=destination_id))
+    return rows.values_list('origin_id', 'destination_id', 'distance_km', 'duration_hours').iterator(chunk_size=5000)
+
+
+def rebuild_distance_matrix():
+    """Full rebuild from every destination with coordinates (active or not)"""
+    from .models import Destination
+
+    # Cleared before reading, so a destination saved meanwhile marks it again
+    distance_matrix.clear_stale()
+    rows = Destination.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by('id').values_list(
+        'id', 'latitude', 'longitude'
+    )
+    distance_matrix.build(rows, road_overrides())
+
+
+def update_destination_geo(destination_id, latitude, longitude):
+    """Incremental update after a destination is added or moved; marks the matrix stale when it does not fit"""
+    if latitude is None or longitude is None:
+        distance_matrix.remove(destination_id)
+    elif not distance_matrix.upsert(destination_id, latitude, longitude, road_overrides(destination_id)):
+        distance_matrix.mark_stale()
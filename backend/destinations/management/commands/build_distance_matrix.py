@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from destinations.geo import distance_matrix, rebuild_distance_matrix
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the memory-mapped destination distance / driving time matrix (DISTANCE_MATRIX_DIR).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-missing', action='store_true', help='Only build when no matrix exists yet')
+        parser.add_argument('--if-stale', action='store_true',
+                            help='Only build when missing or when new destinations did not fit (for cron)')
+
+    def handle(self, *args, **options):
+        if options['if_missing'] and distance_matrix.exists():
+            self.stdout.write('Distance matrix already exists.')
+            return
+        if options['if_stale'] and not distance_matrix.is_stale():
+            self.stdout.write('Distance matrix is up to date.')
+            return
+        rebuild_distance_matrix()
+        self.stdout.write(self.style.SUCCESS(
+            f'Distance matrix built for {len(distance_matrix)} destinations in {distance_matrix.directory}'
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from destinations.geo import geocode, rebuild_distance_matrix
+from destinations.models import Destination
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill destination latitude / longitude from the offline gazetteer (city, country) '
+        'and rebuild the distance matrix.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Also replace coordinates already set')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per bulk update')
+
+    def handle(self, *args, **options):
+        destinations = Destination.objects.only('id', 'city', 'country', 'latitude', 'longitude').order_by('id')
+        if not options['overwrite']:
+            destinations = destinations.filter(latitude__isnull=True) | destinations.filter(longitude__isnull=True)
+
+        updated, missing = [], set()
+        for destination in destinations.iterator(chunk_size=options['chunk_size']):
+            coordinates = geocode(destination.city, destination.country)
+            if coordinates is None:
+                missing.add(f'{destination.city}, {destination.country}')
+                continue
+            destination.latitude, destination.longitude = coordinates
+            updated.append(destination)
+        Destination.objects.bulk_update(updated, ['latitude', 'longitude'], batch_size=options['chunk_size'])
+        rebuild_distance_matrix()
+
+        for place in sorted(missing):
+            self.stdout.write(f'  not in gazetteer: {place}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Geocoded {len(updated)} destinations ({len(missing)} places not found); distance matrix rebuilt'
+        ))
@@ -0,0 +1,58 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from destinations.geo import distance_matrix
+from destinations.models import Destination, RoadDistance
+
+
+class Command(BaseCommand):
+    help = (
+        'Import road distances from a CSV file with columns origin_id, destination_id, distance_km '
+        'and optionally duration_hours. They override the haversine estimates in the distance matrix.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file')
+        parser.add_argument('--symmetric', action='store_true', help='Also apply each row in the reverse direction')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk write')
+
+    def handle(self, *args, **options):
+        known = set(Destination.objects.values_list('id', flat=True))
+        rows, skipped = {}, 0
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as source:
+                for line in csv.DictReader(source):
+                    try:
+                        origin, destination = int(line['origin_id']), int(line['destination_id'])
+                        distance = float(line['distance_km'])
+                        duration = float(line['duration_hours']) if line.get('duration_hours') else None
+                    except (KeyError, TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    if origin not in known or destination not in known or origin == destination or distance < 0:
+                        skipped += 1
+                        continue
+                    rows[origin, destination] = (distance, duration)
+                    if options['symmetric']:
+                        rows[destination, origin] = (distance, duration)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        with transaction.atomic():
+            RoadDistance.objects.bulk_create(
+                [
+                    RoadDistance(origin_id=origin, destination_id=destination, distance_km=distance,
+                                 duration_hours=duration)
+                    for (origin, destination), (distance, duration) in rows.items()
+                ],
+                batch_size=options['chunk_size'],
+                update_conflicts=True,
+                unique_fields=['origin', 'destination'],
+                update_fields=['distance_km', 'duration_hours'],
+            )
+        distance_matrix.set_overrides(
+            (origin, destination, distance, duration) for (origin, destination), (distance, duration) in rows.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(rows)} road distances ({skipped} rows skipped)'))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from destinations.geo import geocode
+
+
+def geocode_existing(apps, schema_editor):
+    Destination = apps.get_model('destinations', 'Destination')
+    batch = []
+    for destination in Destination.objects.only('id', 'city', 'country').iterator(chunk_size=1000):
+        coordinates = geocode(destination.city, destination.country)
+        if coordinates:
+            destination.latitude, destination.longitude = coordinates
+            batch.append(destination)
+    Destination.objects.bulk_update(batch, ['latitude', 'longitude'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destination',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='destination',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='RoadDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField()),
+                ('duration_hours', models.FloatField(blank=True, null=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='destinations.destination')),
+                ('origin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='destinations.destination')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination'), name='unique_road_distance_pair')],
+            },
+        ),
+        migrations.RunPython(geocode_existing, migrations.RunPython.noop),
+    ]
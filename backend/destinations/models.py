@@ -22,6 +22,26 @@ class Destination(models.Model):
     destination_type = models.CharField(max_length=20, choices=destination_type_choices, default='Domestic')
     
     is_active = models.BooleanField(default=True)
+
+    # WGS84 coordinates (filled from the offline gazetteer when not given)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.name} ({self.city}) - {self.destination_type}"
+
+
+class RoadDistance(models.Model):
+    """Imported road distance / driving time overriding the haversine estimate for a pair"""
+    origin = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='+')
+    destination = models.ForeignKey(Destination, on_delete=models.CASCADE, related_name='+')
+    distance_km = models.FloatField()
+    duration_hours = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['origin', 'destination'], name='unique_road_distance_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.origin_id} -> {self.destination_id}: {self.distance_km} km"
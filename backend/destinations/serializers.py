@@ -1,6 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
+from .geo import geocode
 from .models import Destination
-from pricing.models import PricingRule
+from pricing.rules import materialize_pricing_rules
 from service_types.models import ServiceType
 
 class DestinationSerializer(serializers.ModelSerializer):
@@ -9,10 +11,14 @@ class DestinationSerializer(serializers.ModelSerializer):
     distanceKm = serializers.FloatField(source='distance_km', required=False)
     destinationType = serializers.CharField(source='destination_type', required=False)
     isActive = serializers.BooleanField(source='is_active', required=False)
+    # Optional: looked up in the offline gazetteer from city / country when omitted
+    latitude = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
     
     class Meta:
         model = Destination
-        fields = ('id', 'name', 'country', 'city', 'deliveryZone', 'distanceKm', 'type', 'destinationType', 'isActive')
+        fields = ('id', 'name', 'country', 'city', 'deliveryZone', 'distanceKm', 'type', 'destinationType', 'isActive',
+                  'latitude', 'longitude')
         read_only_fields = ('id',)
 
     def create(self, validated_data):
@@ -21,42 +27,49 @@ class DestinationSerializer(serializers.ModelSerializer):
         validated_data.setdefault('distance_km', 0.0)
         validated_data.setdefault('destination_type', 'Domestic')
         validated_data.setdefault('is_active', True)
-        destination = super().create(validated_data)
-        
-        # Automatically create pricing rules for all active service types
-        self._create_default_pricing_rules(destination)
-        
+        with transaction.atomic():
+            destination = super().create(validated_data)
+            # Default pricing rules for all active service types
+            materialize_pricing_rules(ServiceType.objects.filter(is_active=True), [destination])
         return destination
-    
-    def _create_default_pricing_rules(self, destination):
-        """Create default pricing rules for the new destination with all service types"""
-        try:
-            # Get all active service types
-            service_types = ServiceType.objects.filter(is_active=True)
-            
-            # Define default pricing based on destination type
-            if destination.destination_type == 'International':
-                base_price_multiplier = 2.0
-                price_per_km_multiplier = 2.0
-            else:
-                base_price_multiplier = 1.0
-                price_per_km_multiplier = 1.0
-            
-            for service_type in service_types:
-                # Calculate default prices based on service type and destination type
-                base_price = service_type.base_price * base_price_multiplier
-                price_per_km = (service_type.price_per_km or 15) * price_per_km_multiplier
-                
-                # Create pricing rule
-                PricingRule.objects.update_or_create(
-                    service_type=service_type,
-                    destination=destination,
-                    defaults={
-                        'base_price': base_price,
-                        'price_per_km': price_per_km,
-                        'is_active': True
-                    }
-                )
-        except Exception as e:
-            # Fail silently if pricing rule creation fails
-            print(f"Warning: Could not create pricing rules for destination {destination.id}: {e}")
+
+
+class SpatialQuerySerializer(serializers.Serializer):
+    """Query point (lat/lon, or a gazetteer city) and comma-separated type filters"""
+    lat = serializers.FloatField(required=False, min_value=-90, max_value=90)
+    lon = serializers.FloatField(required=False, min_value=-180, max_value=180)
+    city = serializers.CharField(required=False)
+    country = serializers.CharField(required=False, default='')
+    type = serializers.CharField(required=False)
+    destination_type = serializers.CharField(required=False)
+
+    def _choices(self, value, choices, field):
+        values = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = [item for item in values if item not in dict(choices)]
+        if unknown:
+            raise serializers.ValidationError({field: f'Unknown value(s): {", ".join(unknown)}.'})
+        return values
+
+    def validate(self, attrs):
+        if attrs.get('lat') is None or attrs.get('lon') is None:
+            if not attrs.get('city'):
+                raise serializers.ValidationError('Give lat and lon, or a city.')
+            coordinates = geocode(attrs['city'], attrs['country'])
+            if coordinates is None:
+                raise serializers.ValidationError({'city': 'City not found in the gazetteer.'})
+            attrs['lat'], attrs['lon'] = coordinates
+        attrs['types'] = self._choices(attrs.get('type', ''), Destination.type_choices, 'type')
+        attrs['destination_types'] = self._choices(
+            attrs.get('destination_type', ''), Destination.destination_type_choices, 'destination_type'
+        )
+        return attrs
+
+
+class NearestQuerySerializer(SpatialQuerySerializer):
+    k = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    max_km = serializers.FloatField(min_value=0, required=False)
+
+
+class NearbyQuerySerializer(SpatialQuerySerializer):
+    radius_km = serializers.FloatField(min_value=0, max_value=20000)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .geo import distance_matrix, geocode, update_destination_geo
+from .models import Destination
+from .spatial import spatial_index
+
+
+@receiver(pre_save, sender=Destination)
+def fill_destination_coordinates(sender, instance, raw=False, **kwargs):
+    if raw or (instance.latitude is not None and instance.longitude is not None):
+        return
+    coordinates = geocode(instance.city, instance.country)
+    if coordinates:
+        instance.latitude, instance.longitude = coordinates
+
+
+@receiver(post_save, sender=Destination)
+def update_distance_matrix(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    destination_id, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(lambda: update_destination_geo(destination_id, latitude, longitude))
+
+
+@receiver(post_delete, sender=Destination)
+def remove_from_distance_matrix(sender, instance, **kwargs):
+    destination_id = instance.pk
+    transaction.on_commit(lambda: distance_matrix.remove(destination_id))
+
+
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_spatial_index(sender, **kwargs):
+    """Drop the index now and again once the change commits (see invalidate_pricing_table)"""
+    spatial_index.invalidate()
+    transaction.on_commit(spatial_index.invalidate)
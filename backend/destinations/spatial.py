@@ -0,0 +1,173 @@
+"""
+Destination Spatial Index
+=========================
+In-memory grid index over active destinations with coordinates, for
+"nearest hub to this point" and "destinations within R km" lookups
+without touching the database.
+
+Points are bucketed into CELL_DEGREES x CELL_DEGREES latitude/longitude
+cells, one grid per (type, destination_type) partition so that a filter
+like type=Main Hub never scans the dense Regular cells. Each grid keeps
+its points sorted by cell key: a query turns its bounding box into one
+key range per cell row (two when crossing the antimeridian), slices them
+out with searchsorted and filters the candidates with a vectorized
+haversine. Nearest-k queries widen the box until k points are inside
+the searched radius.
+
+Like the pricing table, the index is dropped by signals in the process
+that changed a destination and rebuilt lazily on the next query; other
+workers rebuild after DESTINATION_INDEX_MAX_AGE seconds.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .geo import EARTH_RADIUS_KM, haversine_km
+
+CELL_DEGREES = 0.25
+LON_CELLS = int(360 / CELL_DEGREES)
+LAT_CELLS = int(180 / CELL_DEGREES)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def _cell_rows(lat):
+    return np.clip(np.floor((np.asarray(lat) + 90) / CELL_DEGREES).astype(np.int64), 0, LAT_CELLS - 1)
+
+
+def _cell_cols(lon):
+    return np.floor((np.asarray(lon) + 180) / CELL_DEGREES).astype(np.int64) % LON_CELLS
+
+
+class _Grid:
+    """Points of one partition sorted by cell key (row * LON_CELLS + col)"""
+
+    def __init__(self, positions, lat, lon):
+        keys = _cell_rows(lat) * LON_CELLS + _cell_cols(lon)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.positions = positions[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+
+    def candidates(self, lat, lon, radius_km):
+        """Indexes into this grid of points in the bounding box of the circle"""
+        if radius_km >= HALF_CIRCUMFERENCE_KM:
+            return np.arange(len(self.keys))
+        lat_span = radius_km / KM_PER_DEGREE
+        low, high = lat - lat_span, lat + lat_span
+        rows = np.arange(_cell_rows(max(low, -90.0)), _cell_rows(min(high, 90.0)) + 1)
+        # Widest longitude span over the box (at the latitude closest to a pole)
+        widest = min(max(abs(low), abs(high)), 90.0)
+        cos_lat = math.cos(math.radians(widest))
+        if high >= 90 or low <= -90 or cos_lat < 1e-9 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            starts, ends = rows * LON_CELLS, rows * LON_CELLS + LON_CELLS - 1
+        else:
+            lon_span = radius_km / (KM_PER_DEGREE * cos_lat)
+            first, last = int(_cell_cols(lon - lon_span)), int(_cell_cols(lon + lon_span))
+            if first <= last:
+                starts, ends = rows * LON_CELLS + first, rows * LON_CELLS + last
+            else:  # Wraps around the antimeridian
+                starts = np.concatenate((rows * LON_CELLS + first, rows * LON_CELLS))
+                ends = np.concatenate((rows * LON_CELLS + LON_CELLS - 1, rows * LON_CELLS + last))
+        lo = np.searchsorted(self.keys, starts, side='left')
+        hi = np.searchsorted(self.keys, ends, side='right')
+        spans = [np.arange(a, b) for a, b in zip(lo.tolist(), hi.tolist()) if b > a]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def within(self, lat, lon, radius_km):
+        """(positions, distances) of the points within radius_km"""
+        index = self.candidates(lat, lon, radius_km)
+        distance = haversine_km(lat, lon, self.lat[index], self.lon[index])
+        keep = distance <= radius_km
+        return self.positions[index[keep]], distance[keep]
+
+
+class SpatialIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._built = None
+
+    def built(self):
+        """Current snapshot: {'rows', 'grids': {(type, destination_type): _Grid}}"""
+        built = self._built
+        max_age = getattr(settings, 'DESTINATION_INDEX_MAX_AGE', 30)
+        if built is not None and time.monotonic() - self._built_at < max_age:
+            return built
+        with self._lock:
+            if self._built is not None and time.monotonic() - self._built_at < max_age:
+                return self._built
+            generation = self._generation
+            built = build_spatial_index()
+            # Only publish if nothing was invalidated while building
+            if generation == self._generation:
+                self._built, self._built_at = built, time.monotonic()
+            return built
+
+    def _grids(self, built, types=None, destination_types=None):
+        return [
+            grid for (dest_type, destination_type), grid in built['grids'].items()
+            if (not types or dest_type in types) and (not destination_types or destination_type in destination_types)
+        ]
+
+    def within(self, lat, lon, radius_km, types=None, destination_types=None, limit=None):
+        """Destinations within `radius_km`, nearest first: [(row dict, distance_km)]"""
+        built = self.built()
+        found = [grid.within(lat, lon, radius_km) for grid in self._grids(built, types, destination_types)]
+        return self._results(built, found, limit)
+
+    def nearest(self, lat, lon, k=1, types=None, destination_types=None, max_km=None):
+        """The `k` nearest destinations (within `max_km` if given): [(row dict, distance_km)]"""
+        built = self.built()
+        grids = self._grids(built, types, destination_types)
+        available = sum(len(grid.keys) for grid in grids)
+        limit = HALF_CIRCUMFERENCE_KM if max_km is None else max_km
+        radius = min(CELL_DEGREES * KM_PER_DEGREE, limit)
+        while True:
+            found = [grid.within(lat, lon, radius) for grid in grids]
+            if sum(len(positions) for positions, _ in found) >= min(k, available) or radius >= limit:
+                return self._results(built, found, k)
+            radius = min(radius * 4, limit)
+
+    @staticmethod
+    def _results(built, found, limit):
+        if not found:
+            return []
+        positions = np.concatenate([positions for positions, _ in found])
+        distances = np.concatenate([distances for _, distances in found])
+        order = np.argsort(distances, kind='stable')[:limit]
+        rows = built['rows']
+        return [(rows[position], float(distance)) for position, distance in
+                zip(positions[order].tolist(), distances[order].tolist())]
+
+
+def build_spatial_index():
+    from .models import Destination
+
+    values = list(
+        Destination.objects.filter(is_active=True, latitude__isnull=False, longitude__isnull=False)
+        .order_by('id')
+        .values('id', 'name', 'city', 'country', 'type', 'destination_type', 'latitude', 'longitude')
+    )
+    lat = np.array([row['latitude'] for row in values], dtype=np.float64)
+    lon = np.array([row['longitude'] for row in values], dtype=np.float64)
+    partitions = {}
+    for position, row in enumerate(values):
+        partitions.setdefault((row['type'], row['destination_type']), []).append(position)
+    grids = {}
+    for key, positions in partitions.items():
+        positions = np.array(positions, dtype=np.int64)
+        grids[key] = _Grid(positions, lat[positions], lon[positions])
+    return {'rows': values, 'grids': grids}
+
+
+spatial_index = SpatialIndex()
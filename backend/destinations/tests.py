@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import math
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from destinations.geo import distance_matrix, geocode, haversine_km, matrix_capacity
+from destinations.models import Destination, RoadDistance
+from destinations.spatial import spatial_index
+from users.models import User
+
+
+class DistanceMatrixTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(DISTANCE_MATRIX_DIR=directory.name, DISTANCE_ROAD_FACTOR=1.0,
+                                            ROUTE_AVERAGE_SPEED_KMH=50))
+        distance_matrix._state = None
+
+    def create(self, **fields):
+        fields = {'name': 'Point', 'country': 'Algeria', 'delivery_zone': 'A', 'distance_km': 10,
+                  'type': 'Regular', **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            return Destination.objects.create(**fields)
+
+    def test_gazetteer_and_haversine(self):
+        self.assertEqual(geocode('Algiers', 'Algeria'), geocode('ALGIERS'))
+        self.assertIsNotNone(geocode('Tizi Ouzou', 'DZ'))  # Unknown country spelling falls back to the city
+        self.assertIsNone(geocode('Atlantis'))
+        # Paris - London is about 344 km
+        self.assertAlmostEqual(float(haversine_km(48.8566, 2.3522, 51.5074, -0.1278)), 344, delta=2)
+        grid = haversine_km(np.zeros((3, 1)), np.zeros((3, 1)), np.zeros((1, 4)), np.arange(4)[None, :])
+        self.assertEqual(grid.shape, (3, 4))
+
+    def test_incremental_updates_and_overrides(self):
+        algiers = self.create(city='Algiers')
+        oran = self.create(city='Oran')
+        self.assertIsNotNone(algiers.latitude)
+        self.assertEqual((algiers.latitude, algiers.longitude), geocode('Algiers'))
+        # Saves never build the matrix, the command does
+        self.assertTrue(distance_matrix.is_stale())
+        call_command('build_distance_matrix', '--if-stale', stdout=io.StringIO())
+        self.assertFalse(distance_matrix.is_stale())
+
+        distance, hours = distance_matrix.pair(algiers.id, oran.id)
+        expected = float(haversine_km(algiers.latitude, algiers.longitude, oran.latitude, oran.longitude))
+        self.assertAlmostEqual(distance, expected, places=2)
+        self.assertAlmostEqual(hours, expected / 50, places=3)
+        version = json.loads((self.directory / 'meta.json').read_text())['version']
+
+        # A new destination is appended in place, no rebuild
+        nowhere = self.create(city='Atlantis', latitude=36.0, longitude=3.0)
+        self.assertEqual(json.loads((self.directory / 'meta.json').read_text())['version'], version)
+        self.assertEqual(len(distance_matrix), 3)
+        distance, hours = distance_matrix.submatrix([algiers.id, nowhere.id, 999999])
+        self.assertAlmostEqual(distance[0, 1], distance[1, 0], places=3)
+        self.assertTrue(np.isnan(distance[2]).all())
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            writer = csv.writer(source)
+            writer.writerows([('origin_id', 'destination_id', 'distance_km', 'duration_hours'),
+                              (algiers.id, oran.id, 432.5, 5.5), (algiers.id, 0, 1, '')])
+        self.addCleanup(Path(source.name).unlink)
+        call_command('import_road_distances', source.name, '--symmetric', stdout=io.StringIO())
+        self.assertEqual(RoadDistance.objects.count(), 2)
+        self.assertEqual(distance_matrix.pair(oran.id, algiers.id), (432.5, 5.5))
+
+        # Overrides survive a rebuild; deleted destinations drop out
+        with self.captureOnCommitCallbacks(execute=True):
+            nowhere.delete()
+        self.assertIsNone(distance_matrix.pair(algiers.id, nowhere.id))
+        call_command('build_distance_matrix', stdout=io.StringIO())
+        self.assertEqual(distance_matrix.pair(algiers.id, oran.id), (432.5, 5.5))
+        self.assertEqual(len(distance_matrix), 2)
+
+    def test_matrix_grows_past_its_capacity(self):
+        call_command('build_distance_matrix', stdout=io.StringIO())
+        created = [self.create(city='Grid', latitude=30 + index / 10, longitude=2.0) for index in range(70)]
+        # The first MIN_CAPACITY fit in place, the rest only mark the matrix stale
+        self.assertEqual(len(distance_matrix), 64)
+        self.assertTrue(distance_matrix.is_stale())
+        self.assertIsNone(distance_matrix.pair(created[0].id, created[-1].id))
+
+        call_command('build_distance_matrix', '--if-stale', stdout=io.StringIO())
+        self.assertFalse(distance_matrix.is_stale())
+        self.assertEqual(len(distance_matrix), 70)
+        self.assertEqual(json.loads((self.directory / 'meta.json').read_text())['capacity'], 70 + 64)
+        distance, _ = distance_matrix.pair(created[0].id, created[-1].id)
+        self.assertAlmostEqual(distance, 6.9 * math.pi / 180 * 6371.0088, delta=1)
+        self.assertEqual([matrix_capacity(size) for size in (0, 1000, 100000)], [64, 1250, 125000])
+
+    def test_api_exposes_coordinates(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username='admin', password='pass', role='admin'))
+        response = api.post('/api/v1/destinations/', {'name': 'Sfax depot', 'country': 'Tunisia', 'city': 'Sfax',
+                                                       'type': 'Regular'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['latitude'], response.data['longitude']), geocode('Sfax', 'Tunisia'))
+
+
+class SpatialIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = np.random.default_rng(3)
+        types = ['Regular'] * 6 + ['Main Hub', 'Stock Warehouse']
+        Destination.objects.bulk_create([
+            Destination(name=f'P{index}', country='Algeria', city='Grid', delivery_zone='A', distance_km=10,
+                        type=types[index % len(types)],
+                        destination_type='International' if index % 5 == 0 else 'Domestic',
+                        is_active=index % 11 != 0,
+                        latitude=float(rng.uniform(20, 45)), longitude=float(rng.uniform(-10, 15)))
+            for index in range(2000)
+        ] + [
+            # Either side of the antimeridian
+            Destination(name='East', country='Fiji', city='East', delivery_zone='A', distance_km=10,
+                        type='Main Hub', latitude=-17.0, longitude=179.95),
+            Destination(name='West', country='Fiji', city='West', delivery_zone='A', distance_km=10,
+                        type='Main Hub', latitude=-17.0, longitude=-179.95),
+        ])
+        cls.points = list(Destination.objects.filter(is_active=True).values(
+            'id', 'type', 'destination_type', 'latitude', 'longitude'
+        ))
+
+    def setUp(self):
+        spatial_index.invalidate()
+
+    def brute_force(self, lat, lon, radius_km, types=(), destination_types=()):
+        found = [
+            (point['id'], float(haversine_km(lat, lon, point['latitude'], point['longitude'])))
+            for point in self.points
+            if (not types or point['type'] in types)
+            and (not destination_types or point['destination_type'] in destination_types)
+        ]
+        return sorted((distance, dest_id) for dest_id, distance in found if distance <= radius_km)
+
+    def test_matches_a_linear_scan(self):
+        rng = np.random.default_rng(5)
+        for lat, lon in rng.uniform((20, -10), (45, 15), size=(25, 2)):
+            for radius, types, destination_types in [(50, [], []), (400, ['Main Hub', 'Stock Warehouse'], []),
+                                                     (250, ['Regular'], ['International'])]:
+                expected = self.brute_force(lat, lon, radius, types, destination_types)
+                found = spatial_index.within(lat, lon, radius, types, destination_types)
+                self.assertEqual([row['id'] for row, _ in found], [dest_id for _, dest_id in expected])
+            hubs = self.brute_force(lat, lon, 1e6, ['Main Hub'])[:3]
+            nearest = spatial_index.nearest(lat, lon, k=3, types=['Main Hub'])
+            self.assertEqual([row['id'] for row, _ in nearest], [dest_id for _, dest_id in hubs])
+
+        found = spatial_index.within(-17.0, 179.99, 20)
+        self.assertEqual({row['name'] for row, _ in found}, {'East', 'West'})
+        self.assertEqual(spatial_index.nearest(0, 0, k=1, max_km=1), [])
+
+    def test_index_is_rebuilt_on_change(self):
+        row, _ = spatial_index.nearest(36.0, 3.0)[0]
+        Destination.objects.filter(id=row['id']).update(is_active=False)
+        self.assertEqual(spatial_index.nearest(36.0, 3.0)[0][0]['id'], row['id'])  # Cached
+        Destination.objects.get(id=row['id']).save()
+        self.assertNotEqual(spatial_index.nearest(36.0, 3.0)[0][0]['id'], row['id'])
+
+    def test_queries_are_sub_millisecond(self):
+        spatial_index.built()
+        started = time.perf_counter()
+        for index in range(200):
+            spatial_index.nearest(30 + index / 20, 0, k=1, types=['Main Hub'])
+            spatial_index.within(30 + index / 20, 0, 50)
+        self.assertLess((time.perf_counter() - started) / 400, 0.001)
+
+    def test_api(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username='client', password='pass', role='client'))
+        response = api.get('/api/v1/destinations/nearest/', {'city': 'Algiers', 'type': 'Main Hub,Stock Warehouse',
+                                                             'k': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertLessEqual(response.data['results'][0]['distanceKm'], response.data['results'][1]['distanceKm'])
+        self.assertIn(response.data['results'][0]['type'], ('Main Hub', 'Stock Warehouse'))
+
+        response = api.get('/api/v1/destinations/nearby/', {'lat': 36, 'lon': 3, 'radius_km': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.brute_force(36, 3, 100)))
+
+        self.assertEqual(api.get('/api/v1/destinations/nearby/', {'lat': 36, 'lon': 3}).status_code, 400)
+        self.assertEqual(api.get('/api/v1/destinations/nearest/', {'lat': 36, 'lon': 3, 'type': 'Port'}).status_code,
+                         400)
@@ -1,6 +1,9 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import Destination
-from .serializers import DestinationSerializer
+from .serializers import DestinationSerializer, NearestQuerySerializer, NearbyQuerySerializer
+from .spatial import spatial_index
 from users.permissions import IsManagerOrReadOnly
 from users.audit import AuditLogMixin
 
@@ -11,3 +14,51 @@ class DestinationViewSet(AuditLogMixin, viewsets.ModelViewSet):
     queryset = Destination.objects.all()
     serializer_class = DestinationSerializer
     permission_classes = [IsManagerOrReadOnly]
+
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """
+        The k nearest active destinations to a point, from the in-memory spatial index.
+        GET /destinations/nearest/?lat=&lon=|city=[&country=][&type=Main Hub,Stock Warehouse]
+            [&destination_type=Domestic][&k=1][&max_km=]
+        """
+        params = NearestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        found = spatial_index.nearest(query['lat'], query['lon'], k=query['k'], types=query['types'],
+                                      destination_types=query['destination_types'], max_km=query.get('max_km'))
+        return self._spatial_response(query, found)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Active destinations within radius_km of a point, nearest first.
+        GET /destinations/nearby/?lat=&lon=|city=&radius_km=[&type=][&destination_type=][&limit=100]
+        """
+        params = NearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        found = spatial_index.within(query['lat'], query['lon'], query['radius_km'], types=query['types'],
+                                     destination_types=query['destination_types'], limit=query['limit'])
+        return self._spatial_response(query, found)
+
+    def _spatial_response(self, query, found):
+        return Response({
+            'latitude': query['lat'],
+            'longitude': query['lon'],
+            'count': len(found),
+            'results': [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'city': row['city'],
+                    'country': row['country'],
+                    'type': row['type'],
+                    'destinationType': row['destination_type'],
+                    'latitude': row['latitude'],
+                    'longitude': row['longitude'],
+                    'distanceKm': round(distance, 3),
+                }
+                for row, distance in found
+            ],
+        })
@@ -8,6 +8,6 @@ class DriverViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     Drivers: Manager-only access for driver management
     """
-    queryset = Driver.objects.all()
+    queryset = Driver.objects.select_related('user')
     serializer_class = DriverSerializer
     permission_classes = [IsManager]
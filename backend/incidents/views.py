@@ -10,6 +10,7 @@ class IncidentViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     queryset = Incident.objects.all().order_by('-date')
     serializer_class = IncidentSerializer
+    cursor_ordering = ('-created_at', '-id')
     
     def perform_create(self, serializer):
         user = self.request.user
@@ -37,10 +38,11 @@ class IncidentViewSet(AuditLogMixin, viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        queryset = Incident.objects.select_related('driver__user', 'vehicle').order_by('-date')
         
         if user.role in ['admin', 'manager']:
-            return Incident.objects.all().order_by('-date')
+            return queryset
         elif user.role == 'driver':
-            return Incident.objects.filter(driver__user=user).order_by('-date')
+            return queryset.filter(driver__user=user)
         
         return Incident.objects.none()
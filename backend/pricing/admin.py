@@ -1,7 +1,13 @@
 from django.contrib import admin
-from .models import PricingRule
+from .models import PricingRule, PricingRuleVersion
 
 @admin.register(PricingRule)
 class PricingRuleAdmin(admin.ModelAdmin):
-    list_display = ('service_type', 'destination', 'base_price', 'is_active')
+    list_display = ('service_type', 'destination', 'base_price', 'is_active', 'effective_from')
     list_filter = ('is_active', 'service_type', 'destination')
+
+
+@admin.register(PricingRuleVersion)
+class PricingRuleVersionAdmin(admin.ModelAdmin):
+    list_display = ('service_type', 'destination', 'base_price', 'price_per_km', 'is_active', 'effective_from', 'effective_to')
+    list_filter = ('service_type', 'destination')
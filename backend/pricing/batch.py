@@ -0,0 +1,267 @@
+"""
+Batch Quoting
+=============
+Vectorized version of `PricingTable.quote` for thousands of lines at once.
+
+The compiled pricing table is turned into dense NumPy matrices indexed by
+(service type, destination) position, then a whole batch is priced with a
+handful of array operations. Money is kept in integer units so rounding is
+exact and matches the Decimal engine line for line:
+
+    base, per-km and fee rates in cents, distances in 1/100 km (rounded
+    half up from their decimal string, like the engine: 2.675 -> 268)
+    total = base*100 + per_km*distance + fees*100    (1/10000 currency units)
+    price = (total + 50) // 100                       (cents, ROUND_HALF_UP)
+
+Lines priced at a past time look their rule period up in the flattened
+rule history: periods sorted by (pair, start), searched for all lines at
+once with np.searchsorted on a combined (pair, start rank) key.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import ROUND_HALF_UP
+
+import numpy as np
+
+from .engine import pricing_table, to_cents, INTERNATIONAL_MULTIPLIER
+
+SOURCE_SERVICE_TYPE, SOURCE_RULE = 0, 1
+SOURCES = {SOURCE_SERVICE_TYPE: 'service_type', SOURCE_RULE: 'rule'}
+# `at` entry for lines priced with the current rules
+CURRENT = np.iinfo(np.int64).min
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+# Scaled floats this close to a half cent may be a decimal half cent
+# (1.015 * 100 == 101.49999999999999): those are settled on their str
+HALF_CENT_TOLERANCE = 1e-6
+
+
+def _cents(value):
+    return int((value * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def distance_cents(distances_km):
+    """Float km -> int64 1/100 km, rounded half up exactly as `to_cents` does"""
+    distances_km = np.asarray(distances_km, dtype=np.float64)
+    scaled = np.abs(distances_km) * 100
+    cents = np.floor(scaled + 0.5)
+    near_half = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < HALF_CENT_TOLERANCE)
+    for index in near_half.tolist():
+        cents[index] = abs(to_cents(float(distances_km[index])) * 100)
+    return (np.sign(distances_km) * cents).astype(np.int64)
+
+
+def to_microseconds(datetimes):
+    """Aware datetimes (None: current pricing) -> int64 array for `quote_batch(at=...)`"""
+    return np.array(
+        [CURRENT if value is None else (value - EPOCH) // MICROSECOND for value in datetimes], dtype=np.int64
+    )
+
+
+def compile_matrices(compiled):
+    st_ids = np.array(sorted(compiled['service_types']), dtype=np.int64)
+    dest_ids = np.array(sorted(compiled['destinations']), dtype=np.int64)
+    service_types = [compiled['service_types'][st_id] for st_id in st_ids.tolist()]
+    destinations = [compiled['destinations'][dest_id] for dest_id in dest_ids.tolist()]
+
+    st_base = np.array([_cents(base) for base, _, _ in service_types], dtype=np.int64)
+    st_per_km = np.array([_cents(per_km) for _, per_km, _ in service_types], dtype=np.int64)
+    fees = np.array([_cents(fee) for _, _, fee in service_types], dtype=np.int64)
+    distance = np.array([_cents(distance_km) for distance_km, _ in destinations], dtype=np.int64)
+    multiplier = np.array(
+        [int(INTERNATIONAL_MULTIPLIER) if international else 1 for _, international in destinations], dtype=np.int64
+    )
+
+    # Service type fallback everywhere, then overlay the active rules
+    base = np.outer(st_base, multiplier)
+    per_km = np.outer(st_per_km, multiplier)
+    source = np.full(base.shape, SOURCE_SERVICE_TYPE, dtype=np.int8)
+    st_index = {st_id: i for i, st_id in enumerate(st_ids.tolist())}
+    dest_index = {dest_id: j for j, dest_id in enumerate(dest_ids.tolist())}
+    for (st_id, dest_id), (rule_base, rule_per_km) in compiled['rules'].items():
+        i, j = st_index.get(st_id), dest_index.get(dest_id)
+        if i is None or j is None:
+            continue  # Rule for an inactive service type / destination
+        base[i, j] = _cents(rule_base)
+        if rule_per_km is not None:
+            per_km[i, j] = _cents(rule_per_km)
+        source[i, j] = SOURCE_RULE
+
+    return {
+        'st_ids': st_ids, 'dest_ids': dest_ids, 'fees': fees, 'distance': distance,
+        'base': base, 'per_km': per_km, 'source': source,
+        'st_base': st_base, 'st_per_km': st_per_km, 'multiplier': multiplier,
+    }
+
+
+def compile_history_matrices(history, matrices):
+    """Rule periods of active pairs as flat arrays sorted by (pair code, start)"""
+    st_index = {st_id: i for i, st_id in enumerate(matrices['st_ids'].tolist())}
+    dest_index = {dest_id: j for j, dest_id in enumerate(matrices['dest_ids'].tolist())}
+    n_dest = len(dest_index)
+    rows = []
+    for (st_id, dest_id), (starts, ends, rules) in history.items():
+        i, j = st_index.get(st_id), dest_index.get(dest_id)
+        if i is None or j is None:
+            continue
+        fallback_per_km = int(matrices['st_per_km'][i] * matrices['multiplier'][j])
+        for start, end, rule in zip(starts, ends, rules):
+            if rule is None:
+                base, per_km, active = 0, 0, False  # Rule existed but was inactive: service type rates
+            else:
+                base = _cents(rule[0])
+                per_km = fallback_per_km if rule[1] is None else _cents(rule[1])
+                active = True
+            rows.append((i * n_dest + j, (start - EPOCH) // MICROSECOND, (end - EPOCH) // MICROSECOND,
+                         base, per_km, active))
+    columns = list(zip(*rows)) or [[]] * 6
+    codes, starts, ends, base, per_km = (np.array(column, dtype=np.int64) for column in columns[:5])
+    active = np.array(columns[5], dtype=bool)
+    order = np.lexsort((starts, codes))
+    return {
+        'codes': codes[order], 'starts': starts[order], 'ends': ends[order],
+        'base': base[order], 'per_km': per_km[order], 'active': active[order],
+    }
+
+
+def get_matrices():
+    """Matrices for the current compiled table (built once per compilation)"""
+    compiled = pricing_table.compiled()
+    matrices = compiled.get('matrices')
+    if matrices is None:
+        matrices = compiled['matrices'] = compile_matrices(compiled)
+    return matrices
+
+
+def get_history_matrices():
+    compiled = pricing_table.compiled()
+    matrices = compiled.get('history_matrices')
+    if matrices is None:
+        matrices = compiled['history_matrices'] = compile_history_matrices(pricing_table.history(), get_matrices())
+    return matrices
+
+
+def _find_periods(history, codes, times):
+    """Index of the period of each (pair code, time) line in `history`, -1 if none"""
+    count = len(history['codes'])
+    if not count:
+        return np.full(len(codes), -1, dtype=np.int64)
+    # Ranks of all times make one sortable integer key per (pair, time)
+    _, ranks = np.unique(np.concatenate([history['starts'], times]), return_inverse=True)
+    span = int(ranks.max()) + 1
+    period_keys = history['codes'] * span + ranks[:count]
+    line_keys = codes * span + ranks[count:]
+    period = np.searchsorted(period_keys, line_keys, side='right') - 1
+    candidate = np.maximum(period, 0)
+    found = (period >= 0) & (history['codes'][candidate] == codes) & (times < history['ends'][candidate])
+    return np.where(found, period, -1)
+
+
+def _lookup(ids, values):
+    """Positions of `values` in the sorted `ids`, and which were found"""
+    if not len(ids):
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(ids, values), len(ids) - 1)
+    return positions, ids[positions] == values
+
+
+def quote_batch(service_type_ids, destination_ids, distances_km=None, at=None, matrices=None):
+    """
+    Price every line in one pass. `distances_km` entries may be NaN to use
+    the destination's distance. `at` (see `to_microseconds`) prices lines
+    with the rules in effect at that time; CURRENT entries use today's.
+    `matrices` prices with another table than the live one (simulations);
+    without `at` no database access is needed then.
+    Returns a dict of arrays:
+
+    - price_cents (int64), distance_cents (int64, 1/100 km), source (int8)
+    - st_found / dest_found (bool): lines with either False have no price
+    """
+    if matrices is None:
+        matrices = get_matrices()
+    st = np.asarray(service_type_ids, dtype=np.int64)
+    dest = np.asarray(destination_ids, dtype=np.int64)
+    i, st_found = _lookup(matrices['st_ids'], st)
+    j, dest_found = _lookup(matrices['dest_ids'], dest)
+    valid = st_found & dest_found
+    i, j = np.where(valid, i, 0), np.where(valid, j, 0)
+
+    if len(matrices['st_ids']) and len(matrices['dest_ids']):
+        distance = matrices['distance'][j]
+        if distances_km is not None:
+            requested = np.asarray(distances_km, dtype=np.float64)
+            given = ~np.isnan(requested)
+            distance = np.where(given, distance_cents(np.where(given, requested, 0)), distance)
+        base, per_km, source = matrices['base'][i, j], matrices['per_km'][i, j], matrices['source'][i, j]
+        if at is not None:
+            base, per_km, source = _apply_history(matrices, i, j, valid, np.asarray(at, dtype=np.int64),
+                                                  base, per_km, source)
+        total = base * 100 + per_km * distance + matrices['fees'][i] * 100
+        price = (total + 50) // 100
+    else:
+        distance = price = np.zeros(len(st), dtype=np.int64)
+        source = np.zeros(len(st), dtype=np.int8)
+
+    return {
+        'price_cents': np.where(valid, price, 0),
+        'distance_cents': distance,
+        'source': source,
+        'st_found': st_found,
+        'dest_found': dest_found,
+    }
+
+
+def _apply_history(matrices, i, j, valid, at, base, per_km, source):
+    """Swap in the rule (or service type fallback) in effect at `at` for dated lines"""
+    dated = np.flatnonzero(valid & (at != CURRENT))
+    if not len(dated):
+        return base, per_km, source
+    history = get_history_matrices()
+    line_i, line_j = i[dated], j[dated]
+    period = _find_periods(history, line_i * len(matrices['dest_ids']) + line_j, at[dated])
+    candidate = np.maximum(period, 0)
+    ruled = (period >= 0) & history['active'][candidate]
+    multiplier = matrices['multiplier'][line_j]
+    base, per_km, source = base.copy(), per_km.copy(), source.copy()
+    base[dated] = np.where(ruled, history['base'][candidate], matrices['st_base'][line_i] * multiplier)
+    per_km[dated] = np.where(ruled, history['per_km'][candidate], matrices['st_per_km'][line_i] * multiplier)
+    source[dated] = np.where(ruled, SOURCE_RULE, SOURCE_SERVICE_TYPE)
+    return base, per_km, source
+
+
+def format_cents(value):
+    """Exact decimal string for an integer amount of cents"""
+    sign = '-' if value < 0 else ''
+    value = abs(value)
+    return f'{sign}{value // 100}.{value % 100:02d}'
+
+
+def requote_shipments(shipments, chunk_size=10000):
+    """
+    Re-price `shipments` (a queryset) with the rules in effect when each was
+    created, one query and one vectorized pass per chunk. Yields
+    (shipment_id, stored price cents, quoted price cents or None) - None for
+    shipments without a service type or an active service type/destination.
+    """
+    rows = shipments.order_by().values_list('id', 'service_type_id', 'destination_id', 'created_at', 'price')
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _requote_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield from _requote_chunk(chunk)
+
+
+def _requote_chunk(rows):
+    ids, service_types, destinations, created, stored = zip(*rows)
+    result = quote_batch(
+        [st_id or 0 for st_id in service_types],
+        [dest_id or 0 for dest_id in destinations],
+        at=to_microseconds(created),
+    )
+    priced = (result['st_found'] & result['dest_found']).tolist()
+    for shipment_id, price, ok, quoted in zip(ids, stored, priced, result['price_cents'].tolist()):
+        yield shipment_id, _cents(price), quoted if ok else None
@@ -0,0 +1,195 @@
+"""
+Pricing Quote Engine
+====================
+Compiles active PricingRule / ServiceType / Destination rows into plain
+in-process dicts so quotes are computed without touching the database.
+
+Price of a shipment for (service type, destination):
+
+    rule base_price + rule price_per_km * distance_km + service additional_fees
+
+When no active rule exists for the pair, the service type's own rates are
+used, multiplied by INTERNATIONAL_MULTIPLIER for International destinations
+(the same defaults new rules are created with).
+
+The table is rebuilt lazily on first use after an invalidation. Signals
+(pricing/signals.py) invalidate it in the process that made the change;
+other worker processes pick the change up after PRICING_TABLE_MAX_AGE
+seconds.
+
+Quotes at a past timestamp (`at=`) resolve the rule in effect then from
+the rule history: per pair, the sorted period starts of its
+PricingRuleVersions plus the current rule, searched with bisect. The
+history is compiled on first use alongside the current table. Service
+type rates are not versioned: fallbacks always use the current ones.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+
+DEFAULT_PRICE_PER_KM = Decimal('15')
+INTERNATIONAL_MULTIPLIER = Decimal('2')
+CENTS = Decimal('0.01')
+# Open ends of rule periods (null effective_from / current rule)
+BEGINNING_OF_TIME = datetime.min.replace(tzinfo=dt_timezone.utc)
+END_OF_TIME = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+
+def to_cents(value):
+    """Decimal amount / distance rounded half up to 2 places, from its shortest str (1.015 -> 1.02)"""
+    return Decimal(str(value)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+class QuoteError(Exception):
+    """Raised for a service type / destination the table cannot price"""
+
+
+class PricingTable:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._compiled_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._compiled = None
+
+    def compiled(self):
+        """Current snapshot: {'rules', 'service_types', 'destinations'} dicts"""
+        compiled = self._compiled
+        max_age = getattr(settings, 'PRICING_TABLE_MAX_AGE', 30)
+        if compiled is not None and time.monotonic() - self._compiled_at < max_age:
+            return compiled
+        with self._lock:
+            if self._compiled is not None and time.monotonic() - self._compiled_at < max_age:
+                return self._compiled
+            generation = self._generation
+            compiled = compile_pricing_table()
+            # Only publish if nothing was invalidated while compiling
+            if generation == self._generation:
+                self._compiled, self._compiled_at = compiled, time.monotonic()
+            return compiled
+
+    def history(self):
+        """{(service_type_id, destination_id): (starts, ends, rules)} for the current snapshot"""
+        compiled = self.compiled()
+        history = compiled.get('history')
+        if history is None:
+            history = compiled['history'] = compile_pricing_history()
+        return history
+
+    def rule_at(self, service_type_id, destination_id, at):
+        """(base_price, price_per_km) of the rule in effect at `at`, or None"""
+        periods = self.history().get((service_type_id, destination_id))
+        if periods is None:
+            return None
+        starts, ends, rules = periods
+        index = bisect_right(starts, at) - 1
+        if index < 0 or at >= ends[index]:
+            return None
+        return rules[index]
+
+    def tariff(self, service_type_id, destination_id, at=None):
+        """
+        (base_price, price_per_km, additional_fees, distance_km, source) for a
+        pair, where source is 'rule' or 'service_type'. `at` (aware datetime)
+        prices with the rule in effect at that time instead of the current one.
+        """
+        compiled = self.compiled()
+        service_type = compiled['service_types'].get(service_type_id)
+        if service_type is None:
+            raise QuoteError(f'Unknown or inactive service type {service_type_id}.')
+        destination = compiled['destinations'].get(destination_id)
+        if destination is None:
+            raise QuoteError(f'Unknown or inactive destination {destination_id}.')
+
+        st_base, st_per_km, fees = service_type
+        distance_km, international = destination
+        multiplier = INTERNATIONAL_MULTIPLIER if international else Decimal('1')
+        if at is None:
+            rule = compiled['rules'].get((service_type_id, destination_id))
+        else:
+            rule = self.rule_at(service_type_id, destination_id, at)
+        if rule is not None:
+            base_price, per_km = rule
+            if per_km is None:
+                per_km = st_per_km * multiplier
+            return base_price, per_km, fees, distance_km, 'rule'
+        return st_base * multiplier, st_per_km * multiplier, fees, distance_km, 'service_type'
+
+    def quote(self, service_type_id, destination_id, distance_km=None, at=None):
+        base_price, per_km, fees, default_distance, source = self.tariff(service_type_id, destination_id, at)
+        distance = default_distance if distance_km is None else to_cents(distance_km)
+        price = (base_price + per_km * distance + fees).quantize(CENTS, rounding=ROUND_HALF_UP)
+        return {
+            'service_type': service_type_id,
+            'destination': destination_id,
+            'distance_km': distance,
+            'base_price': base_price,
+            'price_per_km': per_km,
+            'additional_fees': fees,
+            'price': price,
+            'source': source,
+        }
+
+
+def compile_pricing_table():
+    """Three queries; everything after this is dict lookups"""
+    from destinations.models import Destination
+    from service_types.models import ServiceType
+    from .models import PricingRule
+
+    service_types = {
+        st_id: (base_price, price_per_km if price_per_km is not None else DEFAULT_PRICE_PER_KM, fees or Decimal('0'))
+        for st_id, base_price, price_per_km, fees in ServiceType.objects.filter(is_active=True).values_list(
+            'id', 'base_price', 'price_per_km', 'additional_fees'
+        )
+    }
+    destinations = {
+        dest_id: (to_cents(distance_km), destination_type == 'International')
+        for dest_id, distance_km, destination_type in Destination.objects.filter(is_active=True).values_list(
+            'id', 'distance_km', 'destination_type'
+        )
+    }
+    rules = {
+        (st_id, dest_id): (base_price, price_per_km)
+        for st_id, dest_id, base_price, price_per_km in PricingRule.objects.filter(is_active=True).values_list(
+            'service_type_id', 'destination_id', 'base_price', 'price_per_km'
+        )
+    }
+    return {'rules': rules, 'service_types': service_types, 'destinations': destinations}
+
+
+def compile_pricing_history():
+    """Two queries: closed periods and current rules, grouped and sorted per pair"""
+    from .models import PricingRule, PricingRuleVersion
+
+    fields = ('service_type_id', 'destination_id', 'base_price', 'price_per_km', 'is_active', 'effective_from')
+    periods = defaultdict(list)
+    for st_id, dest_id, base_price, price_per_km, is_active, start, end in (
+        PricingRuleVersion.objects.values_list(*fields, 'effective_to').iterator(chunk_size=5000)
+    ):
+        periods[st_id, dest_id].append(
+            (start or BEGINNING_OF_TIME, end, (base_price, price_per_km) if is_active else None)
+        )
+    for st_id, dest_id, base_price, price_per_km, is_active, start in (
+        PricingRule.objects.values_list(*fields).iterator(chunk_size=5000)
+    ):
+        periods[st_id, dest_id].append(
+            (start or BEGINNING_OF_TIME, END_OF_TIME, (base_price, price_per_km) if is_active else None)
+        )
+
+    history = {}
+    for pair, rows in periods.items():
+        rows.sort(key=lambda row: row[0])
+        history[pair] = tuple(list(column) for column in zip(*rows))
+    return history
+
+
+pricing_table = PricingTable()
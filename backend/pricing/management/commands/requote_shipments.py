@@ -0,0 +1,56 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from pricing.batch import requote_shipments, format_cents
+from shipments.models import Shipment
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-price shipments with the pricing rules in effect when each was created and report '
+        'the ones whose stored price differs. Read-only.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First creation day, YYYY-MM-DD')
+        parser.add_argument('--end', help='Last creation day, YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Shipments read and priced per pass')
+        parser.add_argument('--show', type=int, default=20, help='How many differing shipments to list')
+
+    def handle(self, *args, **options):
+        shipments = Shipment.objects.all()
+        if options['start']:
+            shipments = shipments.filter(created_at__gte=self.day_start(options['start'], '--start'))
+        if options['end']:
+            shipments = shipments.filter(
+                created_at__lt=self.day_start(options['end'], '--end') + timedelta(days=1)
+            )
+
+        total = unpriced = differing = 0
+        stored_sum = quoted_sum = 0
+        for shipment_id, stored, quoted in requote_shipments(shipments, chunk_size=options['chunk_size']):
+            total += 1
+            if quoted is None:
+                unpriced += 1
+                continue
+            stored_sum += stored
+            quoted_sum += quoted
+            if stored != quoted:
+                differing += 1
+                if differing <= options['show']:
+                    self.stdout.write(f'  shipment {shipment_id}: stored {format_cents(stored)}, quoted {format_cents(quoted)}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} shipments: {differing} differ, {unpriced} could not be priced; '
+            f'stored {format_cents(stored_sum)} vs quoted {format_cents(quoted_sum)}'
+        ))
+
+    @staticmethod
+    def day_start(value, option):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date (YYYY-MM-DD)')
+        return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pricing.serializers import SimulationRequestSerializer
+from pricing.simulation import simulate_pricing, historical_shipments, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'What-if pricing: re-price past shipments under proposed rule changes and report the '
+        'revenue delta per client, destination and service type. Nothing is saved.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'rules',
+            help='JSON file (or - for stdin): a list of {service_type, destination, base_price, '
+                 'price_per_km, is_active} changes, or {"rules": [...]}',
+        )
+        parser.add_argument('--start', help='First shipment creation day, YYYY-MM-DD (default: a year ago)')
+        parser.add_argument('--end', help='Last shipment creation day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Shipments read and priced per chunk')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='Pricing processes')
+        parser.add_argument('--top', type=int, default=20, help='Rows per breakdown')
+
+    def handle(self, *args, **options):
+        try:
+            source = sys.stdin if options['rules'] == '-' else open(options['rules'])
+            with source:
+                payload = json.load(source)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read rules: {exc}')
+        if isinstance(payload, list):
+            payload = {'rules': payload}
+        payload.update({key: options[key] for key in ('start', 'end', 'top') if options[key]})
+
+        params = SimulationRequestSerializer(data=payload)
+        if not params.is_valid():
+            raise CommandError(json.dumps(params.errors))
+        data = params.validated_data
+
+        started = time.monotonic()
+        try:
+            result = simulate_pricing(
+                historical_shipments(data.get('start'), data.get('end')),
+                data['rules'],
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(json.dumps(summarize(result, top=data['top']), indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f"Simulated {result['shipments']} shipments in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from destinations.models import Destination
+from pricing.rules import materialize_pricing_rules
+from service_types.models import ServiceType
+
+
+class Command(BaseCommand):
+    help = (
+        'Materialize default pricing rules for every active service type x active destination pair. '
+        'By default only missing pairs are added; --reset also resets existing rules to the defaults.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Overwrite existing rules with the default prices and reactivate them',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Destinations per bulk write / transaction',
+        )
+
+    def handle(self, *args, **options):
+        service_types = list(ServiceType.objects.filter(is_active=True))
+        destination_ids = list(Destination.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        if not service_types or not destination_ids:
+            self.stdout.write('Nothing to sync: no active service types or destinations.')
+            return
+
+        chunk_size = options['chunk_size']
+        written = 0
+        for offset in range(0, len(destination_ids), chunk_size):
+            destinations = Destination.objects.filter(id__in=destination_ids[offset:offset + chunk_size])
+            written += materialize_pricing_rules(service_types, destinations, overwrite=options['reset'])
+            self.stdout.write(f'  {min(offset + chunk_size, len(destination_ids))}/{len(destination_ids)} destinations')
+
+        action = 'Reset' if options['reset'] else 'Synced'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} pricing rules for {written} pairs ({len(service_types)} service types x {len(destination_ids)} destinations)'
+        ))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('destinations', '0001_initial'),
+        ('pricing', '0001_initial'),
+        ('service_types', '0002_servicetype_additional_fees_and_more'),
+    ]
+
+    operations = [
+        # Existing rules stay null ("since before versioning"); only new ones default to now
+        migrations.AddField(
+            model_name='pricingrule',
+            name='effective_from',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pricingrule',
+            name='effective_from',
+            field=models.DateTimeField(blank=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.CreateModel(
+            name='PricingRuleVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('price_per_km', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField()),
+                ('effective_from', models.DateTimeField(blank=True, null=True)),
+                ('effective_to', models.DateTimeField()),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='destinations.destination')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='service_types.servicetype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['service_type', 'destination', 'effective_to'], name='pricing_pri_service_2af0a7_idx')],
+            },
+        ),
+    ]
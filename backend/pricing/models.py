@@ -1,14 +1,38 @@
 from django.db import models
+from django.utils import timezone
 
 class PricingRule(models.Model):
+    """
+    Current prices for a (service type, destination) pair, in effect since
+    `effective_from` (null: since before rules were versioned). Each change
+    closes the previous period into a PricingRuleVersion (pricing/signals.py).
+    """
     service_type = models.ForeignKey('service_types.ServiceType', on_delete=models.CASCADE, related_name='pricing_rules')
     destination = models.ForeignKey('destinations.Destination', on_delete=models.CASCADE, related_name='pricing_rules')
     base_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     price_per_km = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    effective_from = models.DateTimeField(default=timezone.now, null=True, blank=True)
 
     class Meta:
         unique_together = ('service_type', 'destination')
 
     def __str__(self):
         return f"{self.service_type} -> {self.destination} ({self.base_price} DZD)"
+
+
+class PricingRuleVersion(models.Model):
+    """Prices a pair had during [effective_from, effective_to)"""
+    service_type = models.ForeignKey('service_types.ServiceType', on_delete=models.CASCADE, related_name='+')
+    destination = models.ForeignKey('destinations.Destination', on_delete=models.CASCADE, related_name='+')
+    base_price = models.DecimalField(max_digits=10, decimal_places=2)
+    price_per_km = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    is_active = models.BooleanField()
+    effective_from = models.DateTimeField(null=True, blank=True)
+    effective_to = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['service_type', 'destination', 'effective_to'])]
+
+    def __str__(self):
+        return f"{self.service_type} -> {self.destination} until {self.effective_to} ({self.base_price} DZD)"
@@ -0,0 +1,97 @@
+"""
+Default Pricing Rules
+=====================
+Every (service type, destination) pair gets a PricingRule priced from the
+service type's rates, multiplied by INTERNATIONAL_MULTIPLIER for
+International destinations. Rules are materialized in bulk: the
+cross-product is built in memory and written with one bulk_create per
+batch, updating or skipping pairs that already have a rule.
+
+Bulk writes bypass the model signals, so price changes are versioned and
+the quote table is invalidated here explicitly.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .engine import pricing_table, DEFAULT_PRICE_PER_KM, INTERNATIONAL_MULTIPLIER, CENTS
+from .models import PricingRule, PricingRuleVersion
+from .signals import VERSIONED_FIELDS, close_period
+
+
+def default_rule_prices(service_type, destination):
+    """(base_price, price_per_km) a new rule for the pair starts from"""
+    multiplier = INTERNATIONAL_MULTIPLIER if destination.destination_type == 'International' else Decimal('1')
+    base_price = Decimal(service_type.base_price or 0) * multiplier
+    price_per_km = Decimal(service_type.price_per_km or DEFAULT_PRICE_PER_KM) * multiplier
+    return base_price.quantize(CENTS), price_per_km.quantize(CENTS)
+
+
+def materialize_pricing_rules(service_types, destinations, overwrite=True, batch_size=1000):
+    """
+    Write default rules for every pair of `service_types` x `destinations`
+    (iterables or querysets). With `overwrite`, existing rules are reset to
+    the defaults and reactivated; otherwise only missing pairs are added.
+    Returns the number of rules written.
+    """
+    destinations = list(destinations)
+    now = timezone.now()
+    rules = [
+        PricingRule(
+            service_type=service_type,
+            destination=destination,
+            base_price=base_price,
+            price_per_km=price_per_km,
+            is_active=True,
+            effective_from=now,
+        )
+        for service_type in service_types
+        for destination in destinations
+        for base_price, price_per_km in [default_rule_prices(service_type, destination)]
+    ]
+    if not rules:
+        return 0
+
+    if overwrite:
+        conflict_options = {
+            'update_conflicts': True,
+            'unique_fields': ['service_type', 'destination'],
+            'update_fields': ['base_price', 'price_per_km', 'is_active', 'effective_from'],
+        }
+    else:
+        conflict_options = {'ignore_conflicts': True}
+    with transaction.atomic():
+        if overwrite:
+            versions = _close_changed_periods(rules, now)
+            PricingRuleVersion.objects.bulk_create(versions, batch_size=batch_size)
+        PricingRule.objects.bulk_create(rules, batch_size=batch_size, **conflict_options)
+        transaction.on_commit(pricing_table.invalidate)
+    pricing_table.invalidate()
+    return len(rules)
+
+
+def _close_changed_periods(rules, now):
+    """
+    Versions closing the current period of existing rules that `rules` will
+    change; unchanged rules keep their effective_from.
+    """
+    existing = {
+        (values['service_type_id'], values['destination_id']): values
+        for values in PricingRule.objects.filter(
+            service_type__in={rule.service_type_id for rule in rules},
+            destination__in={rule.destination_id for rule in rules},
+        ).values(*VERSIONED_FIELDS).iterator(chunk_size=2000)
+    }
+    versions = []
+    for rule in rules:
+        previous = existing.get((rule.service_type_id, rule.destination_id))
+        if previous is None:
+            continue
+        if (previous['base_price'], previous['price_per_km'], previous['is_active']) == (
+            rule.base_price, rule.price_per_km, rule.is_active
+        ):
+            rule.effective_from = previous['effective_from']
+        else:
+            versions.append(close_period(previous, now))
+    return versions
@@ -13,10 +13,11 @@ class PricingRuleSerializer(serializers.ModelSerializer):
     basePrice = serializers.DecimalField(source='base_price', max_digits=10, decimal_places=2)
     pricePerKm = serializers.DecimalField(source='price_per_km', max_digits=10, decimal_places=2, allow_null=True)
     isActive = serializers.BooleanField(source='is_active')
+    effectiveFrom = serializers.DateTimeField(source='effective_from', read_only=True)
 
     class Meta:
         model = PricingRule
-        fields = ('id', 'serviceTypeId', 'serviceTypeDetails', 'destinationId', 'destinationDetails', 'basePrice', 'pricePerKm', 'isActive')
+        fields = ('id', 'serviceTypeId', 'serviceTypeDetails', 'destinationId', 'destinationDetails', 'basePrice', 'pricePerKm', 'isActive', 'effectiveFrom')
     
     def create(self, validated_data):
         return PricingRule.objects.create(**validated_data)
@@ -26,3 +27,30 @@ class PricingRuleSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         return instance
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    service_type = serializers.IntegerField()
+    destination = serializers.IntegerField()
+    distance_km = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    at = serializers.DateTimeField(required=False)
+
+
+class SimulationRuleSerializer(serializers.Serializer):
+    service_type = serializers.IntegerField()
+    destination = serializers.IntegerField(required=False, allow_null=True)
+    base_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    price_per_km = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False, allow_null=True)
+    is_active = serializers.BooleanField(required=False)
+
+
+class SimulationRequestSerializer(serializers.Serializer):
+    rules = SimulationRuleSerializer(many=True, allow_empty=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=1000, default=50)
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        return attrs
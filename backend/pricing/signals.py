@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from destinations.models import Destination
+from service_types.models import ServiceType
+from .engine import pricing_table
+from .models import PricingRule, PricingRuleVersion
+
+# Price-relevant fields: changing any of them closes the current period
+VERSIONED_FIELDS = ('service_type_id', 'destination_id', 'base_price', 'price_per_km', 'is_active', 'effective_from')
+
+
+def close_period(values, effective_to):
+    """PricingRuleVersion for a rule's values (dict of VERSIONED_FIELDS) ending at `effective_to`"""
+    return PricingRuleVersion(**values, effective_to=effective_to)
+
+
+@receiver(pre_save, sender=PricingRule)
+def remember_pricing_rule(sender, instance, raw=False, **kwargs):
+    instance._version_previous = None
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*VERSIONED_FIELDS).first()
+    current = {field: getattr(instance, field) for field in VERSIONED_FIELDS if field != 'effective_from'}
+    if previous is None or all(previous[field] == value for field, value in current.items()):
+        return
+    instance._version_previous = previous
+    instance.effective_from = timezone.now()
+
+
+@receiver(post_save, sender=PricingRule)
+def record_pricing_rule_version(sender, instance, **kwargs):
+    previous = getattr(instance, '_version_previous', None)
+    if previous:
+        close_period(previous, instance.effective_from).save()
+        instance._version_previous = None
+
+
+@receiver(post_delete, sender=PricingRule)
+def record_deleted_pricing_rule(sender, instance, origin=None, **kwargs):
+    # Cascades from a deleted service type / destination take the history with them
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not PricingRule:
+        return
+    values = {field: getattr(instance, field) for field in VERSIONED_FIELDS}
+    close_period(values, timezone.now()).save()
+
+
+@receiver(post_save, sender=PricingRule)
+@receiver(post_delete, sender=PricingRule)
+@receiver(post_save, sender=ServiceType)
+@receiver(post_delete, sender=ServiceType)
+@receiver(post_save, sender=Destination)
+@receiver(post_delete, sender=Destination)
+def invalidate_pricing_table(sender, **kwargs):
+    """
+    Drop the compiled quote table now and again once the change commits, so a
+    table compiled from pre-commit data in between is not kept.
+    """
+    pricing_table.invalidate()
+    transaction.on_commit(pricing_table.invalidate)
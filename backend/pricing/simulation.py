@@ -0,0 +1,203 @@
+"""
+Pricing What-If Simulation
+==========================
+Re-prices historical shipments under a proposed set of rule changes and
+aggregates the revenue delta against today's rules, per client,
+destination and service type.
+
+Shipments are read with one `.iterator()` query in chunks; each chunk is
+priced twice (current and proposed matrices, see pricing/batch.py) and
+reduced to per-key sums in a worker process. Only the sums come back, so
+memory is bounded by the chunk size times the chunks in flight. Workers
+never touch the database.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .batch import get_matrices, quote_batch, format_cents, _cents, SOURCE_RULE, SOURCE_SERVICE_TYPE
+
+DIMENSIONS = ('client', 'destination', 'service_type')
+# Per-key sums: shipments, stored price, current quote, proposed quote (cents)
+SHIPMENTS, STORED, CURRENT, PROPOSED = range(4)
+
+
+def apply_overrides(matrices, overrides):
+    """
+    Copy of `matrices` with proposed rule changes applied. Each override is a
+    dict with `service_type`, optional `destination` (None: every
+    destination) and any of `base_price`, `price_per_km` (None: service type
+    rate) and `is_active` (False: drop the rule, i.e. service type rates).
+    Raises ValueError for unknown or inactive service types / destinations.
+    """
+    proposed = dict(matrices, base=matrices['base'].copy(), per_km=matrices['per_km'].copy(),
+                    source=matrices['source'].copy())
+    st_index = {st_id: i for i, st_id in enumerate(matrices['st_ids'].tolist())}
+    dest_index = {dest_id: j for j, dest_id in enumerate(matrices['dest_ids'].tolist())}
+    for override in overrides:
+        i = st_index.get(override['service_type'])
+        if i is None:
+            raise ValueError(f"Unknown or inactive service type {override['service_type']}.")
+        if override.get('destination') is None:
+            j = slice(None)
+        else:
+            j = dest_index.get(override['destination'])
+            if j is None:
+                raise ValueError(f"Unknown or inactive destination {override['destination']}.")
+        fallback_base = matrices['st_base'][i] * matrices['multiplier'][j]
+        fallback_per_km = matrices['st_per_km'][i] * matrices['multiplier'][j]
+
+        if override.get('is_active') is False:
+            proposed['base'][i, j] = fallback_base
+            proposed['per_km'][i, j] = fallback_per_km
+            proposed['source'][i, j] = SOURCE_SERVICE_TYPE
+            continue
+        if 'base_price' in override:
+            proposed['base'][i, j] = _cents(override['base_price'])
+        if 'price_per_km' in override:
+            per_km = override['price_per_km']
+            proposed['per_km'][i, j] = fallback_per_km if per_km is None else _cents(per_km)
+        proposed['source'][i, j] = SOURCE_RULE
+    return proposed
+
+
+def simulate_chunk(current, proposed, columns):
+    """
+    Price one chunk under both tables and sum per key. `columns` is
+    (client, destination, service_type, stored price cents) int64 arrays.
+    Returns (unpriced count, {dimension: {key: [shipments, stored, current, proposed]}}).
+    """
+    clients, destinations, service_types, stored = columns
+    now = quote_batch(service_types, destinations, matrices=current)
+    then = quote_batch(service_types, destinations, matrices=proposed)
+    priced = now['st_found'] & now['dest_found']
+
+    values = np.stack([
+        np.ones(int(priced.sum()), dtype=np.int64),
+        stored[priced],
+        now['price_cents'][priced],
+        then['price_cents'][priced],
+    ], axis=1)
+    sums = {}
+    for dimension, keys in zip(DIMENSIONS, (clients, destinations, service_types)):
+        unique, inverse = np.unique(keys[priced], return_inverse=True)
+        totals = np.zeros((len(unique), values.shape[1]), dtype=np.int64)
+        np.add.at(totals, inverse, values)
+        sums[dimension] = dict(zip(unique.tolist(), totals.tolist()))
+    return int((~priced).sum()), sums
+
+
+_worker_tables = None
+
+
+def _init_worker(current, proposed):
+    global _worker_tables
+    _worker_tables = (current, proposed)
+
+
+def _simulate_in_worker(columns):
+    return simulate_chunk(*_worker_tables, columns)
+
+
+def _chunks(shipments, chunk_size):
+    """(client, destination, service_type, stored cents) arrays per chunk"""
+    rows = shipments.order_by().values_list('client_id', 'destination_id', 'service_type_id', 'price')
+    chunk = []
+    for client_id, destination_id, service_type_id, price in rows.iterator(chunk_size=chunk_size):
+        # Missing destination / service type: id 0 matches nothing and counts as unpriced
+        chunk.append((client_id, destination_id or 0, service_type_id or 0, _cents(price)))
+        if len(chunk) >= chunk_size:
+            yield tuple(np.array(column, dtype=np.int64) for column in zip(*chunk))
+            chunk = []
+    if chunk:
+        yield tuple(np.array(column, dtype=np.int64) for column in zip(*chunk))
+
+
+def historical_shipments(start=None, end=None):
+    """Shipments created from `start` through `end` (dates; default: the last 365 days)"""
+    from shipments.models import Shipment
+
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=364)
+    return Shipment.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def simulate_pricing(shipments, overrides, chunk_size=20000, workers=1):
+    """
+    Revenue impact of `overrides` (see apply_overrides) over `shipments` (a
+    queryset). Returns {'shipments', 'unpriced', 'totals', 'by_<dimension>'}
+    where totals and per-key rows hold [shipments, stored, current, proposed]
+    cents.
+    """
+    current = get_matrices()
+    proposed = apply_overrides(current, overrides)
+    # Matrices are plain arrays: ship only what pricing reads to the workers
+    current = {key: value for key, value in current.items() if isinstance(value, np.ndarray)}
+    proposed = {key: value for key, value in proposed.items() if isinstance(value, np.ndarray)}
+
+    sums = {dimension: {} for dimension in DIMENSIONS}
+    counts = {'shipments': 0, 'unpriced': 0}
+
+    def merge(result, size):
+        unpriced, chunk_sums = result
+        counts['shipments'] += size
+        counts['unpriced'] += unpriced
+        for dimension, per_key in chunk_sums.items():
+            target = sums[dimension]
+            for key, row in per_key.items():
+                total = target.setdefault(key, [0, 0, 0, 0])
+                for index, value in enumerate(row):
+                    total[index] += value
+
+    chunks = _chunks(shipments, chunk_size)
+    if workers <= 1:
+        for columns in chunks:
+            merge(simulate_chunk(current, proposed, columns), len(columns[0]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(current, proposed)) as pool:
+            # At most two chunks per worker in flight keeps memory bounded
+            pending = []
+            for columns in chunks:
+                pending.append((pool.submit(_simulate_in_worker, columns), len(columns[0])))
+                if len(pending) >= workers * 2:
+                    future, size = pending.pop(0)
+                    merge(future.result(), size)
+            for future, size in pending:
+                merge(future.result(), size)
+
+    totals = [0, 0, 0, 0]
+    for row in sums['client'].values():
+        for index, value in enumerate(row):
+            totals[index] += value
+    return {
+        **counts,
+        'totals': totals,
+        **{f'by_{dimension}': per_key for dimension, per_key in sums.items()},
+    }
+
+
+def summarize(result, top=50):
+    """JSON-ready report: money as strings, each breakdown sorted by |delta|, `top` rows"""
+    def row(values):
+        return {
+            'shipments': values[SHIPMENTS],
+            'stored': format_cents(values[STORED]),
+            'current': format_cents(values[CURRENT]),
+            'proposed': format_cents(values[PROPOSED]),
+            'delta': format_cents(values[PROPOSED] - values[CURRENT]),
+        }
+
+    report = {'shipments': result['shipments'], 'unpriced': result['unpriced'], 'totals': row(result['totals'])}
+    for dimension in DIMENSIONS:
+        per_key = sorted(
+            result[f'by_{dimension}'].items(),
+            key=lambda item: (-abs(item[1][PROPOSED] - item[1][CURRENT]), item[0]),
+        )
+        report[f'by_{dimension}'] = [{'id': key, **row(values)} for key, values in per_key[:top]]
+    return report
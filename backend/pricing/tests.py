@@ -0,0 +1,294 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from destinations.models import Destination
+from pricing.batch import quote_batch, format_cents, requote_shipments, to_microseconds
+from pricing.engine import pricing_table
+from pricing.models import PricingRule, PricingRuleVersion
+from pricing.simulation import simulate_pricing, historical_shipments
+from service_types.models import ServiceType
+from shipments.models import Shipment
+from users.models import User
+
+
+class QuoteEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service_type = ServiceType.objects.create(
+            name='Express', description='', category='Delivery', base_price=Decimal('500'),
+            price_per_km=Decimal('10'), estimated_delivery_time='24h', additional_fees=Decimal('5'),
+        )
+        cls.domestic = Destination.objects.create(name='Oran', country='DZ', city='Oran', delivery_zone='West',
+                                                  distance_km=400, type='Regular')
+        cls.abroad = Destination.objects.create(name='Tunis', country='TN', city='Tunis', delivery_zone='East',
+                                                distance_km=800, type='Regular', destination_type='International')
+        cls.rule = PricingRule.objects.create(service_type=cls.service_type, destination=cls.domestic,
+                                              base_price=Decimal('300'), price_per_km=Decimal('12.50'))
+
+    def setUp(self):
+        # Test transactions roll back without signals: start from a fresh table
+        pricing_table.invalidate()
+
+    def test_rule_and_service_type_fallback(self):
+        quote = pricing_table.quote(self.service_type.id, self.domestic.id)
+        self.assertEqual((quote['source'], quote['price']), ('rule', Decimal('5305.00')))
+
+        # No rule for the pair: service type rates, doubled for International
+        quote = pricing_table.quote(self.service_type.id, self.abroad.id, distance_km=100)
+        self.assertEqual((quote['source'], quote['price']), ('service_type', Decimal('3005.00')))
+
+    def test_hot_path_skips_the_database_until_a_rule_changes(self):
+        pricing_table.quote(self.service_type.id, self.domestic.id)
+        with self.assertNumQueries(0):
+            pricing_table.quote(self.service_type.id, self.domestic.id)
+
+        self.rule.base_price = Decimal('1000')
+        self.rule.save()
+        self.assertEqual(pricing_table.quote(self.service_type.id, self.domestic.id)['price'], Decimal('6005.00'))
+
+    def test_quote_endpoint(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username='client', password='pass', role='client'))
+        response = api.get('/api/v1/quotes/', {'service_type': self.service_type.id, 'destination': self.domestic.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['price'], '5305.00')
+        response = api.get('/api/v1/quotes/', {'service_type': self.service_type.id, 'destination': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_matches_single_quotes(self):
+        service_types = [self.service_type.id] * 4 + [0]
+        destinations = [self.domestic.id, self.abroad.id, self.domestic.id, self.abroad.id, self.domestic.id]
+        distances = [float('nan'), float('nan'), 0.005, 123.45, float('nan')]
+        result = quote_batch(service_types, destinations, distances)
+        for index in range(4):
+            distance = None if distances[index] != distances[index] else distances[index]
+            quote = pricing_table.quote(service_types[index], destinations[index], distance)
+            self.assertEqual(format_cents(int(result['price_cents'][index])), str(quote['price']))
+        self.assertFalse(result['st_found'][4])
+
+    def test_batch_rounds_half_cents_like_the_engine(self):
+        # Floats whose x100 product lands just below the half cent, and exact halves
+        distances = [1.015, 2.675, 0.005, 1.025, 0.125, 10.0049, 1234.565, 0.0]
+        result = quote_batch([self.service_type.id] * len(distances), [self.abroad.id] * len(distances), distances)
+        self.assertEqual(result['distance_cents'].tolist(), [102, 268, 1, 103, 13, 1000, 123457, 0])
+        for index, distance in enumerate(distances):
+            quote = pricing_table.quote(self.service_type.id, self.abroad.id, distance)
+            self.assertEqual(quote['distance_km'] * 100, int(result['distance_cents'][index]))
+            self.assertEqual(format_cents(int(result['price_cents'][index])), str(quote['price']))
+
+    def test_batch_endpoint_streams_json_and_csv(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username='client', password='pass', role='client'))
+        lines = [
+            {'service_type': self.service_type.id, 'destination': self.domestic.id, 'weight_kg': 10},
+            {'service_type': self.service_type.id, 'destination': self.abroad.id, 'distance_km': 100},
+            {'service_type': self.service_type.id, 'destination': 0},
+        ]
+        response = api.post('/api/v1/quotes/batch/', lines, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((body['count'], body['priced']), (3, 2))
+        self.assertEqual([row['price'] for row in body['results']], ['5305.00', '3005.00', None])
+        self.assertIsNotNone(body['results'][2]['error'])
+
+        columns = {'service_type': [self.service_type.id], 'destination': [self.domestic.id]}
+        response = api.post('/api/v1/quotes/batch/?output=csv', columns, format='json')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual((rows[0]['price'], rows[0]['source']), ('5305.00', 'rule'))
+
+        response = api.post('/api/v1/quotes/batch/', {'service_type': [1, 2], 'destination': [1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_endpoint_rejects_non_finite_numbers_and_fractional_ids(self):
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username='client', password='pass', role='client'))
+        st, dest = self.service_type.id, self.abroad.id
+        body = f'{{"service_type": {st}, "destination": {dest}, "distance_km": NaN}}\n'
+        response = api.post('/api/v1/quotes/batch/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+        body = '\n'.join([
+            f'{{"service_type": {st}, "destination": {dest}, "distance_km": 1e400}}',
+            f'{{"service_type": {st}.5, "destination": {dest}}}',
+            f'{{"service_type": {st}, "destination": {dest}.0, "distance_km": 100}}',
+        ])
+        response = api.post('/api/v1/quotes/batch/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((body['count'], body['priced']), (3, 1))
+        errors = [row['error'] for row in body['results']]
+        self.assertIn('distance_km must be a finite number', errors[0])
+        self.assertIn('service_type must be an integer id', errors[1])
+        self.assertIsNone(errors[2])
+        self.assertEqual([row['price'] for row in body['results']], [None, None, '3005.00'])
+
+        response = api.post('/api/v1/quotes/batch/', f'[{{"service_type": {st}, "destination": {dest}, "weight_kg": 1e400}}]',
+                            content_type='application/json')
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual((body['priced'], body['results'][0]['weight_kg']), (0, None))
+
+
+class PricingRuleMaterializationTests(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username='manager', password='pass', role='manager'))
+        pricing_table.invalidate()
+
+    def test_create_paths_materialize_the_cross_product(self):
+        response = self.api.post('/api/v1/service-types/', {
+            'name': 'Standard', 'description': 'Road', 'category': 'Delivery', 'basePrice': '500.00', 'pricePerKm': None,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        standard = response.data['id']
+        self.assertFalse(PricingRule.objects.exists())
+
+        response = self.api.post('/api/v1/destinations/', {
+            'name': 'Tunis', 'country': 'TN', 'city': 'Tunis', 'type': 'Regular', 'distanceKm': 800,
+            'destinationType': 'International',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        tunis = response.data['id']
+        rule = PricingRule.objects.get(service_type=standard, destination=tunis)
+        self.assertEqual((rule.base_price, rule.price_per_km), (Decimal('1000.00'), Decimal('30.00')))
+
+        response = self.api.post('/api/v1/service-types/', {
+            'name': 'Express', 'description': 'Road', 'category': 'Delivery', 'basePrice': '800.00', 'pricePerKm': '20.00',
+        }, format='json')
+        self.assertTrue(PricingRule.objects.filter(service_type=response.data['id'], destination=tunis).exists())
+        # Bulk writes skip the model signals: the quote table must still see the new rule
+        self.assertEqual(pricing_table.quote(response.data['id'], tunis)['source'], 'rule')
+
+    def test_sync_command_fills_missing_pairs_and_resets(self):
+        service_type = ServiceType.objects.create(name='Standard', description='', category='Delivery',
+                                                  base_price=Decimal('500'), estimated_delivery_time='')
+        destinations = [
+            Destination.objects.create(name=f'D{i}', country='DZ', city='C', delivery_zone='', distance_km=10,
+                                       type='Regular')
+            for i in range(3)
+        ]
+        PricingRule.objects.create(service_type=service_type, destination=destinations[0], base_price=Decimal('1'))
+
+        call_command('sync_pricing_rules', chunk_size=2, stdout=io.StringIO())
+        self.assertEqual(PricingRule.objects.count(), 3)
+        self.assertEqual(PricingRule.objects.get(destination=destinations[0]).base_price, Decimal('1'))
+
+        call_command('sync_pricing_rules', reset=True, stdout=io.StringIO())
+        self.assertEqual(PricingRule.objects.get(destination=destinations[0]).base_price, Decimal('500'))
+        # Only the rule whose price changed gets a closed period
+        self.assertEqual(list(PricingRuleVersion.objects.values_list('destination', 'base_price')),
+                         [(destinations[0].id, Decimal('1'))])
+
+
+class PricingHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service_type = ServiceType.objects.create(
+            name='Express', description='', category='Delivery', base_price=Decimal('500'),
+            price_per_km=Decimal('10'), estimated_delivery_time='24h',
+        )
+        cls.destination = Destination.objects.create(name='Oran', country='DZ', city='Oran', delivery_zone='West',
+                                                      distance_km=100, type='Regular')
+
+    def setUp(self):
+        pricing_table.invalidate()
+
+    def test_changes_close_periods_and_past_quotes_use_them(self):
+        rule = PricingRule.objects.create(service_type=self.service_type, destination=self.destination,
+                                          base_price=Decimal('300'), price_per_km=Decimal('10'))
+        first_period = timezone.now()
+        rule.base_price = Decimal('400')
+        rule.save()
+        second_period = timezone.now()
+        rule.is_active = False
+        rule.save()
+        rule.save()  # No price change: no new version
+
+        periods = list(PricingRuleVersion.objects.order_by('effective_to').values_list('base_price', 'is_active'))
+        self.assertEqual(periods, [(Decimal('300'), True), (Decimal('400'), True)])
+
+        before = rule.effective_from - timedelta(days=365)
+        expected = [
+            (before, Decimal('1500.00'), 'service_type'),   # No rule yet
+            (first_period, Decimal('1300.00'), 'rule'),
+            (second_period, Decimal('1400.00'), 'rule'),
+            (None, Decimal('1500.00'), 'service_type'),     # Deactivated
+        ]
+        for at, price, source in expected:
+            quote = pricing_table.quote(self.service_type.id, self.destination.id, at=at)
+            self.assertEqual((quote['price'], quote['source']), (price, source))
+
+        with self.assertNumQueries(0):
+            result = quote_batch([self.service_type.id] * 4, [self.destination.id] * 4,
+                                 at=to_microseconds([at for at, _, _ in expected]))
+        self.assertEqual([format_cents(cents) for cents in result['price_cents'].tolist()],
+                         [str(price) for _, price, _ in expected])
+        self.assertEqual(result['source'].tolist(), [0, 1, 1, 0])
+
+    def test_requote_shipments_uses_the_rule_at_creation(self):
+        rule = PricingRule.objects.create(service_type=self.service_type, destination=self.destination,
+                                          base_price=Decimal('300'), price_per_km=Decimal('10'))
+        client = User.objects.create_user(username='client', password='pass', role='client')
+        shipment = Shipment.objects.create(client=client, destination=self.destination,
+                                           service_type=self.service_type, weight_kg=1, volume_m3=1,
+                                           price=Decimal('1300.00'))
+        rule.base_price = Decimal('900')
+        rule.save()
+        pricing_table.invalidate()
+        self.assertEqual(list(requote_shipments(Shipment.objects.all())), [(shipment.id, 130000, 130000)])
+
+
+class PricingSimulationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service_type = ServiceType.objects.create(
+            name='Express', description='', category='Delivery', base_price=Decimal('500'),
+            price_per_km=Decimal('10'), estimated_delivery_time='24h',
+        )
+        cls.oran = Destination.objects.create(name='Oran', country='DZ', city='Oran', delivery_zone='West',
+                                              distance_km=100, type='Regular')
+        cls.blida = Destination.objects.create(name='Blida', country='DZ', city='Blida', delivery_zone='Centre',
+                                               distance_km=50, type='Regular')
+        PricingRule.objects.create(service_type=cls.service_type, destination=cls.oran,
+                                   base_price=Decimal('300'), price_per_km=Decimal('10'))
+        cls.client_a = User.objects.create_user(username='client_a', password='pass', role='client')
+        cls.client_b = User.objects.create_user(username='client_b', password='pass', role='client')
+        for client, destination in [(cls.client_a, cls.oran), (cls.client_a, cls.blida), (cls.client_b, cls.oran)]:
+            Shipment.objects.create(client=client, destination=destination, service_type=cls.service_type,
+                                    weight_kg=1, volume_m3=1, price=Decimal('1000'))
+        Shipment.objects.create(client=cls.client_b, destination=cls.oran, weight_kg=1, volume_m3=1,
+                                price=Decimal('1000'))
+
+    def setUp(self):
+        pricing_table.invalidate()
+
+    def test_deltas_per_dimension_and_process_pool(self):
+        overrides = [{'service_type': self.service_type.id, 'destination': self.oran.id, 'base_price': Decimal('400')}]
+        result = simulate_pricing(historical_shipments(), overrides, chunk_size=2)
+        self.assertEqual((result['shipments'], result['unpriced']), (4, 1))
+        # Oran 300 + 1000 -> 400 + 1000 (x2), Blida service type fallback 500 + 500 unchanged
+        self.assertEqual(result['totals'], [3, 300000, 360000, 380000])
+        self.assertEqual(result['by_client'][self.client_a.id], [2, 200000, 230000, 240000])
+        self.assertEqual(result['by_destination'][self.blida.id], [1, 100000, 100000, 100000])
+        self.assertEqual(simulate_pricing(historical_shipments(), overrides, chunk_size=2, workers=2), result)
+
+    def test_simulate_endpoint(self):
+        api = APIClient()
+        body = {'rules': [{'service_type': self.service_type.id, 'destination': None, 'is_active': False}]}
+        api.force_authenticate(self.client_a)
+        self.assertEqual(api.post('/api/v1/pricing-rules/simulate/', body, format='json').status_code, 403)
+
+        api.force_authenticate(User.objects.create_user(username='manager', password='pass', role='manager'))
+        response = api.post('/api/v1/pricing-rules/simulate/', body, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals']['delta'], '400.00')
+        self.assertEqual(response.data['by_destination'][0]['id'], self.oran.id)
+        body['rules'][0]['service_type'] = 0
+        self.assertEqual(api.post('/api/v1/pricing-rules/simulate/', body, format='json').status_code, 400)
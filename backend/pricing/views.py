@@ -1,18 +1,248 @@
-from rest_framework import viewsets, filters
+import csv
+import io
+import json
+import math
+from decimal import Decimal
+
+import numpy as np
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
+from .batch import quote_batch, format_cents, to_microseconds, SOURCES
+from .engine import pricing_table, QuoteError
+from .simulation import simulate_pricing, historical_shipments, summarize
 from .models import PricingRule
-from .serializers import PricingRuleSerializer
-from users.permissions import IsManager
+from .serializers import PricingRuleSerializer, QuoteRequestSerializer, SimulationRequestSerializer
+from users.permissions import IsManager, IsAuthenticated
 from users.audit import AuditLogMixin
+from users.parsers import NDJSONParser
 
 class PricingRuleViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     Pricing Rules: Manager-only access for modifications
     """
-    queryset = PricingRule.objects.all()
+    queryset = PricingRule.objects.select_related('service_type', 'destination')
     serializer_class = PricingRuleSerializer
     permission_classes = [IsManager]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['service_type', 'destination', 'is_active']
     search_fields = ['destination__name', 'destination__city']
     ordering_fields = ['base_price', 'destination']
+
+    @action(detail=False, methods=['post'])
+    def simulate(self, request):
+        """
+        What-if: revenue impact of proposed rule changes over past shipments.
+        Body: {"rules": [{service_type, destination (null: all), base_price,
+        price_per_km, is_active}], "start", "end" (default: last 365 days),
+        "top"}. Nothing is saved. Deltas compare with today's rules.
+        """
+        params = SimulationRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        try:
+            result = simulate_pricing(
+                historical_shipments(data.get('start'), data.get('end')),
+                data['rules'],
+                workers=settings.PRICING_SIMULATION_WORKERS,
+            )
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summarize(result, top=data['top']))
+
+
+class QuoteViewSet(viewsets.ViewSet):
+    """
+    Price quotes from the in-memory compiled pricing table (no DB access
+    once the table is compiled). Available to every authenticated user.
+    GET /quotes/?service_type=<id>&destination=<id>[&distance_km=<km>][&at=<ISO datetime>]
+    `at` prices with the rules in effect at that time (re-rating, audits).
+    """
+    permission_classes = [IsAuthenticated]
+    batch_max_lines = 200000
+    batch_fields = ['line', 'service_type', 'destination', 'weight_kg', 'volume_m3', 'distance_km', 'price', 'source', 'error']
+    batch_stream_chunk = 2000
+
+    def list(self, request):
+        params = QuoteRequestSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        try:
+            quote = pricing_table.quote(
+                params.validated_data['service_type'],
+                params.validated_data['destination'],
+                params.validated_data.get('distance_km'),
+                params.validated_data.get('at'),
+            )
+        except QuoteError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        # Money as strings, like the model serializers' DecimalFields
+        return Response({key: str(value) if isinstance(value, Decimal) else value for key, value in quote.items()})
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def batch(self, request):
+        """
+        Price many shipment lines in one vectorized pass.
+        Body: a JSON array / NDJSON of {service_type, destination, weight_kg,
+        volume_m3, distance_km, at} objects, or one object of equal-length
+        arrays under the same keys. distance_km and at (ISO datetime: price
+        with the rules in effect then) may be omitted or null per line.
+        Streams JSON by default, CSV with ?output=csv or Accept: text/csv.
+        Unknown or inactive pairs, fractional ids and non-finite numbers
+        (1e400 overflows to inf) get an error on their line, not a 400.
+        """
+        try:
+            columns = self._batch_columns(request.data)
+            errors = self._batch_errors(columns)
+            service_types = np.asarray(columns['service_type'], dtype=np.int64)
+            destinations = np.asarray(columns['destination'], dtype=np.int64)
+            distances = np.asarray(
+                [None] * len(service_types) if columns['distance_km'] is None else columns['distance_km'],
+                dtype=np.float64,
+            )
+            at = self._batch_times(columns['at'])
+        except (TypeError, ValueError) as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        lengths = {len(service_types), len(destinations), len(distances)}
+        lengths.update(len(columns[key]) for key in ('weight_kg', 'volume_m3', 'at') if columns[key] is not None)
+        if len(lengths) > 1:
+            return Response({'detail': 'All columns must have the same length.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(service_types) > self.batch_max_lines:
+            return Response(
+                {'detail': f'At most {self.batch_max_lines} lines per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if np.any(distances < 0):
+            return Response({'detail': 'distance_km must not be negative.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = quote_batch(service_types, destinations, distances, at)
+        rows = self._batch_rows(columns, service_types, destinations, result, errors)
+        wants_csv = (
+            request.query_params.get('output') == 'csv'
+            or 'text/csv' in request.META.get('HTTP_ACCEPT', '')
+        )
+        if wants_csv:
+            response = StreamingHttpResponse(self._stream_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="quotes.csv"'
+            return response
+        priced = result['st_found'] & result['dest_found']
+        priced[list(errors)] = False
+        return StreamingHttpResponse(
+            self._stream_json(rows, len(service_types), int(np.count_nonzero(priced))), content_type='application/json'
+        )
+
+    def _batch_columns(self, data):
+        """Line objects or columnar arrays -> {field: list or None}"""
+        keys = ['service_type', 'destination', 'weight_kg', 'volume_m3', 'distance_km', 'at']
+        if isinstance(data, list):
+            if not all(isinstance(line, dict) for line in data):
+                raise ValueError('Every line must be an object.')
+            columns = {key: [line.get(key) for line in data] for key in keys}
+            for key in ('distance_km', 'at'):
+                if not any(value is not None for value in columns[key]):
+                    columns[key] = None
+            return columns
+        if isinstance(data, dict):
+            columns = {key: data.get(key) for key in keys}
+            if columns['service_type'] is None or columns['destination'] is None:
+                raise ValueError('service_type and destination arrays are required.')
+            for key, value in columns.items():
+                if value is not None and not isinstance(value, list):
+                    raise ValueError(f'{key} must be an array.')
+            return columns
+        raise ValueError('Expected a list of lines or an object of arrays.')
+
+    def _batch_errors(self, columns):
+        """
+        {line: error} for values the int64/float64 columns would silently
+        mangle; they are blanked (id 0, no distance) so the line is not priced
+        """
+        errors = {}
+        for key in ('service_type', 'destination'):
+            values = columns[key] = list(columns[key])
+            for index, value in enumerate(values):
+                if isinstance(value, float) and not value.is_integer():
+                    errors.setdefault(index, f'{key} must be an integer id, got {value!r}.')
+                    values[index] = 0
+        for key in ('weight_kg', 'volume_m3', 'distance_km'):
+            if columns[key] is None:
+                continue
+            values = columns[key] = list(columns[key])
+            for index, value in enumerate(values):
+                if isinstance(value, float) and not math.isfinite(value):
+                    errors.setdefault(index, f'{key} must be a finite number, got {value!r}.')
+                    values[index] = None
+        return errors
+
+    def _batch_times(self, values):
+        """ISO datetimes (None: current rules) -> `quote_batch(at=...)` array"""
+        if values is None:
+            return None
+        times = []
+        for value in values:
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if value is not None and parsed is None:
+                raise ValueError(f'Invalid at value {value!r}: expected an ISO datetime.')
+            if parsed is not None and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            times.append(parsed)
+        return to_microseconds(times)
+
+    def _batch_rows(self, columns, service_types, destinations, result, errors):
+        """Yield one output dict per line; money and distances as exact strings"""
+        weights, volumes = columns['weight_kg'], columns['volume_m3']
+        found = zip(result['st_found'].tolist(), result['dest_found'].tolist())
+        lines = zip(
+            service_types.tolist(), destinations.tolist(), result['price_cents'].tolist(),
+            result['distance_cents'].tolist(), result['source'].tolist(), found,
+        )
+        for index, (st_id, dest_id, price, distance, source, (st_found, dest_found)) in enumerate(lines):
+            row = {
+                'line': index,
+                'service_type': st_id,
+                'destination': dest_id,
+                'weight_kg': weights[index] if weights else None,
+                'volume_m3': volumes[index] if volumes else None,
+                'distance_km': None,
+                'price': None,
+                'source': None,
+                'error': None,
+            }
+            if index in errors:
+                row['error'] = errors[index]
+            elif not st_found:
+                row['error'] = f'Unknown or inactive service type {st_id}.'
+            elif not dest_found:
+                row['error'] = f'Unknown or inactive destination {dest_id}.'
+            else:
+                row.update(distance_km=format_cents(distance), price=format_cents(price), source=SOURCES[source])
+            yield row
+
+    def _stream_json(self, rows, count, priced):
+        yield f'{{"count": {count}, "priced": {priced}, "results": ['
+        chunk, first = [], True
+        for row in rows:
+            chunk.append(json.dumps(row))
+            if len(chunk) >= self.batch_stream_chunk:
+                yield ('' if first else ',') + ','.join(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ('' if first else ',') + ','.join(chunk)
+        yield ']}'
+
+    def _stream_csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.batch_fields)
+        writer.writeheader()
+        for index, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if index % self.batch_stream_chunk == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
@@ -0,0 +1,270 @@
+"""
+Route Assignment
+================
+Pairs the Planned routes of a day with drivers and vehicles by solving two
+linear assignment problems (Hungarian algorithm, shortest augmenting path
+with potentials; the inner column scans are vectorized in NumPy, so a few
+hundred routes solve in well under a second).
+
+Vehicle cost for route r / vehicle k:
+- forbidden when the route's load exceeds the vehicle's weight or volume
+  capacity or the vehicle is in Maintenance;
+- unused capacity (weight, and volume when known) as a share of the
+  vehicle: snug fits keep the big vehicles free;
+- a penalty when flagged On Route, and for recent breakdowns, scaled by
+  the route's length.
+
+Driver cost for route r / driver d:
+- forbidden when the driver is Off Duty; a penalty when flagged On Route;
+- driving hours over the last ASSIGNMENT_WORKLOAD_DAYS days, scaled by the
+  route's duration so long routes go to rested drivers;
+- recent incidents (accidents weigh most), scaled by the route's length.
+
+Keeping a route's current driver / vehicle gets a small bonus so re-running
+the solver does not shuffle an unchanged day. A current pairing is never
+forbidden, only heavily penalized, so every route has a fallback.
+Drivers and vehicles on other open routes of the day are not considered.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from drivers.models import Driver
+from incidents.models import Incident
+from vehicles.models import Vehicle
+from .availability import availability_index
+from .models import Route
+from .planning import OPEN_ROUTE_STATUSES
+
+FORBIDDEN = 1e9
+FORCED = 1e6  # Current pairing that would otherwise be forbidden
+BUSY_PENALTY = 2.0
+KEEP_BONUS = 0.1
+INCIDENT_WEIGHTS = {'Accident': 3.0, 'Lost Cargo': 2.0, 'Delay': 1.0, 'Breakdown': 1.0, 'Other': 0.5}
+
+
+class AssignmentError(Exception):
+    """Raised when the routes cannot all be staffed without double-booking"""
+
+
+def linear_sum_assignment(cost):
+    """
+    Minimum-cost assignment for a rectangular cost matrix. Returns
+    (rows, cols) index arrays with one pair per row (per column when there
+    are fewer columns than rows).
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # 1-based potentials / matching as in the classic formulation; column 0 is a sentinel
+    u, v = np.zeros(n + 1), np.zeros(m + 1)
+    row_of = np.zeros(m + 1, dtype=np.int64)  # row matched to each column, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        row_of[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = row_of[column]
+            free = ~used[1:]
+            slack = cost[current - 1] - u[current] - v[1:]
+            better = free & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[row_of[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if row_of[column] == 0:
+                break
+        while column:  # Augment along the alternating path
+            previous = way[column]
+            row_of[column] = row_of[previous]
+            column = previous
+
+    columns = np.flatnonzero(row_of[1:])
+    rows = row_of[1:][columns] - 1
+    if transposed:
+        rows, columns = columns, rows
+    order = np.argsort(rows)
+    return rows[order], columns[order]
+
+
+def _normalized(values):
+    values = np.asarray(values, dtype=np.float64)
+    peak = values.max() if len(values) else 0
+    return values / peak if peak > 0 else np.zeros_like(values)
+
+
+def _incident_scores(field, ids, since):
+    weight = Case(
+        *[When(type=incident_type, then=Value(value)) for incident_type, value in INCIDENT_WEIGHTS.items()],
+        default=Value(1.0), output_field=FloatField(),
+    )
+    rows = (
+        Incident.objects.filter(**{f'{field}__in': ids}, date__gte=since)
+        .values(field).annotate(score=Sum(weight))
+    )
+    scores = {row[field]: row['score'] for row in rows}
+    return np.array([scores.get(pk, 0.0) for pk in ids])
+
+
+def vehicle_costs(routes, vehicles, since):
+    """routes x vehicles cost matrix"""
+    load_kg = np.array([route.load_kg or 0.0 for route in routes])
+    load_m3 = np.array([route.load_m3 or 0.0 for route in routes])
+    length = _normalized([route.estimated_distance_km or 0.0 for route in routes])
+    cap_kg = np.array([vehicle.capacity_kg for vehicle in vehicles], dtype=np.float64)
+    cap_m3 = np.array([np.inf if vehicle.capacity_m3 is None else vehicle.capacity_m3 for vehicle in vehicles])
+    status = np.array([vehicle.status for vehicle in vehicles])
+    breakdowns = _normalized(_incident_scores('vehicle', [vehicle.id for vehicle in vehicles], since))
+
+    cost = (cap_kg[None, :] - load_kg[:, None]) / max(cap_kg.max(), 1.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        volume_slack = np.where(np.isfinite(cap_m3), (cap_m3[None, :] - load_m3[:, None]) / cap_m3, 0.0)
+    cost = cost + np.nan_to_num(volume_slack)
+    cost = cost + BUSY_PENALTY * (status == 'On Route')[None, :] + breakdowns[None, :] * length[:, None]
+    forbidden = ((load_kg[:, None] > cap_kg[None, :]) | (load_m3[:, None] > cap_m3[None, :])
+                 | (status == 'Maintenance')[None, :])
+    current = np.array([route.vehicle_id for route in routes])[:, None] == np.array([v.id for v in vehicles])[None, :]
+    return _finish(cost, forbidden, current)
+
+
+def driver_costs(routes, drivers, date, since):
+    """routes x drivers cost matrix"""
+    hours = np.array([
+        route.estimated_duration_hours
+        or (route.estimated_distance_km or 0.0) / settings.ROUTE_AVERAGE_SPEED_KMH
+        or 1.0
+        for route in routes
+    ])
+    length = _normalized([route.estimated_distance_km or 0.0 for route in routes])
+    driver_ids = [driver.id for driver in drivers]
+    status = np.array([driver.status for driver in drivers])
+    recent = dict(
+        Route.objects.filter(driver_id__in=driver_ids, date__lt=date,
+                             date__gte=date - timedelta(days=settings.ASSIGNMENT_WORKLOAD_DAYS))
+        .values('driver')
+        .annotate(hours=Sum(Coalesce('actual_duration_hours', 'estimated_duration_hours', Value(0.0))))
+        .values_list('driver', 'hours')
+    )
+    workload = _normalized([recent.get(driver_id) or 0.0 for driver_id in driver_ids])
+    incidents = _normalized(_incident_scores('driver', driver_ids, since))
+
+    cost = workload[None, :] * (0.5 + _normalized(hours)[:, None]) + incidents[None, :] * length[:, None]
+    cost = cost + BUSY_PENALTY * (status == 'On Route')[None, :]
+    forbidden = np.broadcast_to((status == 'Off Duty')[None, :], cost.shape)
+    current = np.array([route.driver_id for route in routes])[:, None] == np.array(driver_ids)[None, :]
+    return _finish(cost, forbidden, current)
+
+
+def _finish(cost, forbidden, current):
+    cost = np.where(forbidden, FORBIDDEN, cost)
+    # The current pairing: small bonus, and never forbidden, only forced
+    cost = np.where(current & forbidden, FORCED, cost)
+    cost = np.where(current & ~forbidden, cost - KEEP_BONUS, cost)
+    return cost
+
+
+def _solve(cost):
+    """{row: column} for feasible pairs"""
+    rows, columns = linear_sum_assignment(cost)
+    return {int(row): int(column) for row, column in zip(rows, columns) if cost[row, column] < FORBIDDEN}
+
+
+def assign_routes(date, commit=True):
+    """
+    Re-pair the Planned routes of `date` with drivers and vehicles.
+    Returns {'date', 'assignments': [...], 'changed', 'elapsed_seconds'}.
+    """
+    started = time.monotonic()
+    routes = list(
+        Route.objects.filter(date=date, status='Planned')
+        .annotate(load_kg=Sum('shipments__weight_kg'), load_m3=Sum('shipments__volume_m3'))
+        .order_by('id')
+    )
+    plan = {'date': date, 'assignments': [], 'changed': 0}
+    if not routes:
+        plan['elapsed_seconds'] = round(time.monotonic() - started, 3)
+        return plan
+
+    # Everyone not busy on another open route of the day
+    other_routes = Route.objects.filter(date=date, status__in=OPEN_ROUTE_STATUSES).exclude(
+        id__in=[route.id for route in routes]
+    )
+    vehicles = list(Vehicle.objects.exclude(id__in=other_routes.values('vehicle_id')).order_by('id'))
+    drivers = list(Driver.objects.exclude(id__in=other_routes.values('driver_id')).order_by('id'))
+    since = date - timedelta(days=settings.ASSIGNMENT_INCIDENT_DAYS)
+
+    vehicle_cost = vehicle_costs(routes, vehicles, since)
+    driver_cost = driver_costs(routes, drivers, date, since)
+    vehicle_of, driver_of = _solve(vehicle_cost), _solve(driver_cost)
+
+    # Routes left without a feasible pair keep theirs; that must not double-book
+    final = []
+    for index, route in enumerate(routes):
+        vehicle_id = vehicles[vehicle_of[index]].id if index in vehicle_of else route.vehicle_id
+        driver_id = drivers[driver_of[index]].id if index in driver_of else route.driver_id
+        final.append((route, driver_id, vehicle_id))
+    for position in (1, 2):
+        taken = [entry[position] for entry in final]
+        if len(taken) != len(set(taken)):
+            resource = 'drivers' if position == 1 else 'vehicles'
+            raise AssignmentError(f'Not enough available {resource} to cover every planned route on {date}.')
+
+    for index, (route, driver_id, vehicle_id) in enumerate(final):
+        changed = driver_id != route.driver_id or vehicle_id != route.vehicle_id
+        plan['changed'] += changed
+        plan['assignments'].append({
+            'route': route.id,
+            'driver': driver_id,
+            'vehicle': vehicle_id,
+            'previous_driver': route.driver_id,
+            'previous_vehicle': route.vehicle_id,
+            'changed': changed,
+            'driver_cost': round(float(driver_cost[index, driver_of[index]]), 3) if index in driver_of else None,
+            'vehicle_cost': round(float(vehicle_cost[index, vehicle_of[index]]), 3) if index in vehicle_of else None,
+        })
+    if commit and plan['changed']:
+        commit_assignments(date, plan['assignments'])
+    plan['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return plan
+
+
+def commit_assignments(date, assignments):
+    """Apply the new pairings in one transaction (routes locked, one bulk update)"""
+    changes = {entry['route']: entry for entry in assignments if entry['changed']}
+    with transaction.atomic():
+        routes = list(Route.objects.select_for_update().filter(id__in=changes, status='Planned'))
+        if len(routes) != len(changes):
+            raise AssignmentError('Some routes were started or removed meanwhile; assign again.')
+        clash = Route.objects.filter(date=date, status__in=OPEN_ROUTE_STATUSES).exclude(
+            id__in=[entry['route'] for entry in assignments]
+        ).filter(
+            Q(driver_id__in=[entry['driver'] for entry in changes.values()])
+            | Q(vehicle_id__in=[entry['vehicle'] for entry in changes.values()])
+        )
+        if clash.exists():
+            raise AssignmentError('A driver or vehicle was booked on another route meanwhile; assign again.')
+        for route in routes:
+            route.driver_id = changes[route.id]['driver']
+            route.vehicle_id = changes[route.id]['vehicle']
+        Route.objects.bulk_update(routes, ['driver', 'vehicle'])
+        transaction.on_commit(availability_index.invalidate)  # bulk_update sends no signals
+    availability_index.invalidate()
+    return routes
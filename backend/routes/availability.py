@@ -0,0 +1,240 @@
+"""
+Driver / Vehicle Availability
+=============================
+In-memory interval index over the bookings of drivers and vehicles, for
+"which drivers / vehicles are free in this window" and "what does this
+route clash with" without scanning every route.
+
+- Bookings: every Planned/Active route occupies its driver and vehicle
+  from ROUTE_DAY_START_HOUR on its date for its planned duration
+  (estimated_duration_hours, else ROUTE_DEFAULT_DURATION_HOURS).
+- Blocks: a vehicle in Maintenance (a driver Off Duty) is unavailable
+  from today on, until its status changes.
+
+Times are hours since 0001-01-01 in local time. Each resource kind keeps
+one interval list for all bookings and one per driver / vehicle, sorted
+by start with the running maximum of the ends: the bookings overlapping
+[start, end) are the slice between searchsorted(running_end, start) and
+searchsorted(starts, end), filtered on their own end. A lookup is two
+binary searches plus the overlapping bookings it returns.
+
+Like the spatial index, it is dropped by signals in the process that
+changed a route, driver or vehicle and rebuilt lazily on the next query;
+other workers rebuild after ROUTE_AVAILABILITY_MAX_AGE seconds. Route
+create/update therefore re-checks the bookings against the database
+(booking_conflicts) rather than trusting a possibly older snapshot.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from drivers.models import Driver
+from vehicles.models import Vehicle
+from .models import Route
+from .planning import OPEN_ROUTE_STATUSES
+
+BLOCKING_STATUSES = {'driver': 'Off Duty', 'vehicle': 'Maintenance'}
+
+
+def to_hours(moment):
+    """Hours since 0001-01-01 of a date / naive or aware datetime (local time)"""
+    if isinstance(moment, datetime):
+        if timezone.is_aware(moment):
+            moment = timezone.localtime(moment)
+        return moment.toordinal() * 24 + moment.hour + moment.minute / 60 + moment.second / 3600
+    return moment.toordinal() * 24.0
+
+
+def from_hours(hours):
+    """Naive local datetime for to_hours()"""
+    day, rest = divmod(hours, 24)
+    return (datetime.fromordinal(int(day)) + timedelta(hours=rest)).replace(microsecond=0)
+
+
+def route_window(date, duration_hours=None):
+    """(start, end) hours of a route dated `date` lasting `duration_hours`"""
+    start = to_hours(date) + settings.ROUTE_DAY_START_HOUR
+    if not duration_hours or duration_hours <= 0:
+        duration_hours = settings.ROUTE_DEFAULT_DURATION_HOURS
+    return start, start + duration_hours
+
+
+def blocked_from():
+    """Start of a status block: the beginning of today"""
+    return to_hours(timezone.localdate())
+
+
+class _Intervals:
+    """Bookings sorted by start, with the running maximum of their ends"""
+
+    def __init__(self, starts, ends, owners, routes):
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.reach = np.maximum.accumulate(self.ends) if len(order) else self.ends
+        self.owners = owners[order]
+        self.routes = routes[order]
+
+    def overlapping(self, start, end):
+        """Indexes of the bookings overlapping [start, end)"""
+        low = int(np.searchsorted(self.reach, start, side='right'))
+        high = int(np.searchsorted(self.starts, end, side='left'))
+        if high <= low:
+            return np.empty(0, dtype=np.int64)
+        index = np.arange(low, high)
+        return index[self.ends[index] > start]
+
+
+class AvailabilityIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built = None
+        self._built_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        self._generation += 1
+        self._built = None
+
+    def built(self):
+        """Current snapshot: {'driver': {...}, 'vehicle': {...}} (see build_availability_index)"""
+        built = self._built
+        max_age = getattr(settings, 'ROUTE_AVAILABILITY_MAX_AGE', 30)
+        if built is not None and time.monotonic() - self._built_at < max_age:
+            return built
+        with self._lock:
+            if self._built is not None and time.monotonic() - self._built_at < max_age:
+                return self._built
+            generation = self._generation
+            built = build_availability_index()
+            # Only publish if nothing was invalidated while building
+            if generation == self._generation:
+                self._built, self._built_at = built, time.monotonic()
+            return built
+
+    def free(self, start, end):
+        """Drivers and vehicles neither booked nor blocked in [start, end): {'drivers': [...], 'vehicles': [...]}"""
+        built = self.built()
+        free = {}
+        for kind in ('driver', 'vehicle'):
+            resources = built[kind]
+            bookings = resources['bookings']
+            busy = set(bookings.owners[bookings.overlapping(start, end)].tolist())
+            if end > resources['blocked_from']:
+                busy.update(resources['blocked'])
+            free[f'{kind}s'] = [row for owner, row in resources['rows'].items() if owner not in busy]
+        return free
+
+    def conflicts(self, start, end, driver=None, vehicle=None, exclude_route=None):
+        """
+        What keeps `driver` / `vehicle` from [start, end):
+        [{'resource', 'id', 'route', 'start', 'end'}] for clashing routes and
+        [{'resource', 'id', 'status'}] for a status block.
+        """
+        built = self.built()
+        found = []
+        for kind, owner in (('driver', driver), ('vehicle', vehicle)):
+            if owner is None:
+                continue
+            resources = built[kind]
+            if owner in resources['blocked'] and end > resources['blocked_from']:
+                found.append({'resource': kind, 'id': owner, 'status': BLOCKING_STATUSES[kind]})
+            bookings = resources['by_owner'].get(owner)
+            if bookings is None:
+                continue
+            for index in bookings.overlapping(start, end).tolist():
+                route_id = int(bookings.routes[index])
+                if route_id == exclude_route:
+                    continue
+                found.append({
+                    'resource': kind,
+                    'id': owner,
+                    'route': route_id,
+                    'start': from_hours(float(bookings.starts[index])),
+                    'end': from_hours(float(bookings.ends[index])),
+                })
+        return found
+
+    def route_conflicts(self, route):
+        start, end = route_window(route.date, route.estimated_duration_hours)
+        return self.conflicts(start, end, driver=route.driver_id, vehicle=route.vehicle_id, exclude_route=route.id)
+
+
+def _interval_index(bookings, field):
+    if not bookings:
+        empty = np.empty(0)
+        return _Intervals(empty, empty, empty.astype(np.int64), empty.astype(np.int64)), {}
+    starts = np.array([booking['start'] for booking in bookings])
+    ends = np.array([booking['end'] for booking in bookings])
+    owners = np.array([booking[field] for booking in bookings], dtype=np.int64)
+    routes = np.array([booking['id'] for booking in bookings], dtype=np.int64)
+    everything = _Intervals(starts, ends, owners, routes)
+    by_owner = {}
+    order = np.argsort(owners, kind='stable')
+    split = np.flatnonzero(np.diff(owners[order])) + 1
+    for group in np.split(order, split):
+        by_owner[int(owners[group[0]])] = _Intervals(starts[group], ends[group], owners[group], routes[group])
+    return everything, by_owner
+
+
+def build_availability_index():
+    bookings = list(
+        Route.objects.filter(status__in=OPEN_ROUTE_STATUSES)
+        .values('id', 'driver_id', 'vehicle_id', 'date', 'estimated_duration_hours')
+    )
+    for booking in bookings:
+        booking['start'], booking['end'] = route_window(booking['date'], booking['estimated_duration_hours'])
+
+    drivers = {
+        row['id']: {
+            'id': row['id'],
+            'name': ' '.join(filter(None, (row['user__first_name'], row['user__last_name']))) or row['user__username'],
+            'status': row['status'],
+        }
+        for row in Driver.objects.order_by('id').values(
+            'id', 'status', 'user__first_name', 'user__last_name', 'user__username'
+        )
+    }
+    vehicles = {
+        row['id']: row
+        for row in Vehicle.objects.order_by('id').values('id', 'plate', 'model', 'capacity_kg', 'capacity_m3', 'status')
+    }
+    built = {}
+    for kind, rows in (('driver', drivers), ('vehicle', vehicles)):
+        everything, by_owner = _interval_index(bookings, f'{kind}_id')
+        built[kind] = {
+            'rows': rows,
+            'bookings': everything,
+            'by_owner': by_owner,
+            'blocked': {owner for owner, row in rows.items() if row['status'] == BLOCKING_STATUSES[kind]},
+            'blocked_from': blocked_from(),
+        }
+    return built
+
+
+def booking_conflicts(date, duration_hours, driver=None, vehicle=None, exclude_route=None):
+    """
+    Same answer as AvailabilityIndex.conflicts for a route, read from the
+    database (the open routes of this driver / vehicle) for use on writes.
+    """
+    start, end = route_window(date, duration_hours)
+    found = []
+    for kind, resource in (('driver', driver), ('vehicle', vehicle)):
+        if resource is None:
+            continue
+        if resource.status == BLOCKING_STATUSES[kind] and end > blocked_from():
+            found.append({'resource': kind, 'id': resource.pk, 'status': resource.status})
+        routes = Route.objects.filter(**{kind: resource}, status__in=OPEN_ROUTE_STATUSES).exclude(pk=exclude_route)
+        for route_id, route_date, hours in routes.values_list('id', 'date', 'estimated_duration_hours'):
+            route_start, route_end = route_window(route_date, hours)
+            if route_start < end and route_end > start:
+                found.append({'resource': kind, 'id': resource.pk, 'route': route_id,
+                              'start': from_hours(route_start), 'end': from_hours(route_end)})
+    return found
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,72 @@
+"""
+Route Completion
+================
+Closes routes and delivers their shipments set-based, in one transaction:
+
+1. The routes are locked, marked Completed and their actual metrics
+   (distance, duration, fuel) written in one bulk update.
+2. Their shipments still under way (not Delivered / Cancelled) are locked
+   and marked Delivered with a single UPDATE; the analytics rollups the
+   skipped save signals would have moved are moved per cell instead.
+3. A Delivered ShipmentEvent per shipment is inserted in batches.
+
+Completing a route again only rewrites its metrics: its shipments are
+Delivered already. Either every route closes or none does.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.rollups import move_shipment_status
+from shipments.events import record_events
+from shipments.models import Shipment, ShipmentEvent
+from .availability import availability_index
+from .models import Route
+
+METRIC_FIELDS = ('actual_distance_km', 'actual_duration_hours', 'fuel_consumed_liters')
+
+
+class CompletionError(Exception):
+    """Raised when some of the routes to complete do not exist"""
+
+
+def complete_routes(completions, actor=None):
+    """
+    Complete routes given as {route_id: {metric: value}} (metrics from
+    METRIC_FIELDS, all optional). `actor` is recorded on the delivery events.
+    Returns {'routes': [ids], 'delivered_shipments': count}.
+    """
+    route_ids = sorted(completions)
+    now = timezone.now()
+    actor = actor if getattr(actor, 'is_authenticated', False) else None
+    with transaction.atomic():
+        routes = list(Route.objects.select_for_update().filter(id__in=route_ids).order_by('id'))
+        found = {route.id for route in routes}
+        missing = [route_id for route_id in route_ids if route_id not in found]
+        if missing:
+            raise CompletionError(f'Routes not found: {", ".join(map(str, missing))}.')
+
+        for route in routes:
+            route.status = 'Completed'
+            for field, value in completions[route.id].items():
+                setattr(route, field, value)
+        Route.objects.bulk_update(routes, ['status', *METRIC_FIELDS])
+
+        on_routes = Route.shipments.through.objects.filter(route_id__in=route_ids).values('shipment_id')
+        pending = (
+            Shipment.objects.select_for_update(of=('self',))
+            .filter(id__in=on_routes)
+            .exclude(status__in=('Delivered', 'Cancelled'))
+        )
+        rows = list(pending.values_list('id', 'destination__city'))
+        shipment_ids = [shipment_id for shipment_id, _ in rows]
+        delivered = Shipment.objects.filter(id__in=shipment_ids)
+        move_shipment_status(delivered, 'Delivered')  # update() sends no save signals
+        delivered.update(status='Delivered')
+        record_events([
+            ShipmentEvent(shipment_id=shipment_id, status='Delivered', timestamp=now, actor=actor,
+                          location=city or '', note='Shipment delivered')
+            for shipment_id, city in rows
+        ])
+        transaction.on_commit(availability_index.invalidate)  # bulk_update sends no signals
+    availability_index.invalidate()
+    return {'routes': route_ids, 'delivered_shipments': len(shipment_ids)}
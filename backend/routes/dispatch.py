@@ -0,0 +1,172 @@
+"""
+Live Dispatch
+=============
+Slots a newly created shipment into the already Planned routes by
+cheapest insertion instead of re-planning the day:
+
+1. Candidate routes: Planned routes dated from today to the shipment's
+   due date (estimated_delivery, else today) that have a stop within
+   DISPATCH_CANDIDATE_RADIUS_KM of its destination, found through the
+   spatial index. Destinations without coordinates consider every route
+   of those days. Stops are reconciled with the routes' shipments first,
+   so routes edited by hand are seen as they are.
+2. Feasibility: the route's vehicle must still carry the shipment's
+   weight and volume on top of its current load.
+3. Cost: the cheapest position between two consecutive stops (hub at both
+   ends) of the added distance d(a, x) + d(x, b) - d(a, b); zero when the
+   destination already is a stop. One vectorized pass per route, so
+   O(routes x stops) overall.
+
+The best route is assigned when its detour is within DISPATCH_MAX_DETOUR_KM
+(and auto-assignment is requested); otherwise the ranked suggestions are
+returned for a manager to pick from.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from destinations.spatial import spatial_index
+from .models import Route
+from .planning import OPEN_ROUTE_STATUSES, route_stops, travel_matrices
+
+
+class DispatchError(Exception):
+    """Raised when a shipment cannot be inserted into the chosen route"""
+
+
+def dispatch_date(shipment):
+    """Last day a route may deliver the shipment"""
+    if shipment.estimated_delivery:
+        return timezone.localdate(shipment.estimated_delivery)
+    return timezone.localdate()
+
+
+def candidate_routes(shipment):
+    """Planned routes that could still take the shipment, with their current load"""
+    today = timezone.localdate()
+    routes = list(
+        Route.objects.filter(status='Planned', date__gte=today, date__lte=max(dispatch_date(shipment), today))
+        .select_related('vehicle')
+        .annotate(load_kg=Sum('shipments__weight_kg'), load_m3=Sum('shipments__volume_m3'))
+        .order_by('date', 'id')
+    )
+    route_stops(routes)
+    destination = shipment.destination
+    if destination.latitude is None or destination.longitude is None:
+        return routes
+    radius = settings.DISPATCH_CANDIDATE_RADIUS_KM
+    nearby = {row['id'] for row, _ in spatial_index.within(destination.latitude, destination.longitude, radius)}
+    nearby.add(destination.id)
+    return [route for route in routes if nearby.intersection(route.stops)]
+
+
+def insertion_options(shipment, routes=None):
+    """
+    Feasible insertions of `shipment`, cheapest first:
+    [{'route', 'date', 'vehicle', 'driver', 'position', 'added_distance_km',
+      'added_duration_hours', 'load_kg', 'load_m3'}].
+    """
+    routes = candidate_routes(shipment) if routes is None else routes
+    weight, volume = shipment.weight_kg or 0.0, shipment.volume_m3 or 0.0
+    feasible = [
+        route for route in routes
+        if (route.load_kg or 0.0) + weight <= route.vehicle.capacity_kg
+        and (route.vehicle.capacity_m3 is None or (route.load_m3 or 0.0) + volume <= route.vehicle.capacity_m3)
+    ]
+    if not feasible:
+        return []
+
+    # One matrix over every stop involved; index 0 is the hub
+    destination_ids = list(dict.fromkeys(
+        [shipment.destination_id] + [stop for route in feasible for stop in route.stops]
+    ))
+    dist, hours = travel_matrices(destination_ids)
+    node = {dest_id: position + 1 for position, dest_id in enumerate(destination_ids)}
+    new = node[shipment.destination_id]
+    stop_hours = settings.ROUTE_STOP_MINUTES / 60
+
+    options = []
+    for route in feasible:
+        if shipment.destination_id in route.stops:
+            position, added_km, added_hours = route.stops.index(shipment.destination_id), 0.0, 0.0
+        else:
+            tour = np.array([0] + [node[stop] for stop in route.stops] + [0], dtype=np.int64)
+            a, b = tour[:-1], tour[1:]
+            delta = dist[a, new] + dist[new, b] - dist[a, b]
+            position = int(np.argmin(delta))
+            added_km = float(delta[position])
+            added_hours = float(hours[a[position], new] + hours[new, b[position]] - hours[a[position], b[position]])
+            added_hours += stop_hours
+        options.append({
+            'route': route.id,
+            'date': route.date,
+            'vehicle': route.vehicle_id,
+            'driver': route.driver_id,
+            'position': position,
+            'added_distance_km': round(added_km, 1),
+            'added_duration_hours': round(added_hours, 2),
+            'load_kg': round((route.load_kg or 0.0) + weight, 2),
+            'load_m3': round((route.load_m3 or 0.0) + volume, 3),
+        })
+    options.sort(key=lambda option: (option['added_distance_km'], option['date'], option['route']))
+    return options
+
+
+def assign_to_route(shipment, option):
+    """Insert the shipment into the route at the option's position, re-checking under lock"""
+    with transaction.atomic():
+        route = Route.objects.select_for_update().select_related('vehicle').filter(
+            id=option['route'], status='Planned'
+        ).first()
+        if route is None:
+            raise DispatchError('The route is no longer planned.')
+        if route.shipments.through.objects.filter(
+            shipment_id=shipment.id, route__status__in=OPEN_ROUTE_STATUSES
+        ).exists():
+            raise DispatchError('The shipment is already on a route.')
+        load = route.shipments.aggregate(kg=Sum('weight_kg'), m3=Sum('volume_m3'))
+        if ((load['kg'] or 0.0) + (shipment.weight_kg or 0.0) > route.vehicle.capacity_kg
+                or (route.vehicle.capacity_m3 is not None
+                    and (load['m3'] or 0.0) + (shipment.volume_m3 or 0.0) > route.vehicle.capacity_m3)):
+            raise DispatchError("The route's vehicle no longer has room for the shipment.")
+
+        saved_stops = list(route.stops)
+        route_stops([route])
+        route.shipments.add(shipment)
+        update_fields = []
+        if shipment.destination_id not in route.stops:
+            route.stops.insert(min(option['position'], len(route.stops)), shipment.destination_id)
+            if route.estimated_distance_km is not None:
+                route.estimated_distance_km = round(route.estimated_distance_km + option['added_distance_km'], 1)
+                update_fields.append('estimated_distance_km')
+            if route.estimated_duration_hours is not None:
+                route.estimated_duration_hours = round(
+                    route.estimated_duration_hours + option['added_duration_hours'], 2
+                )
+                update_fields.append('estimated_duration_hours')
+        if route.stops != saved_stops:
+            update_fields.append('stops')
+        if update_fields:
+            route.save(update_fields=update_fields)
+    return route
+
+
+def dispatch_shipment(shipment, auto_assign=True, suggestions=None):
+    """
+    Cheapest feasible insertion of a Pending shipment into the Planned routes.
+    Returns {'assigned_route': id or None, 'suggestions': [...]}.
+    """
+    suggestions = settings.DISPATCH_SUGGESTIONS if suggestions is None else suggestions
+    result = {'assigned_route': None, 'suggestions': []}
+    if shipment.status != 'Pending' or shipment.destination_id is None:
+        return result
+    options = insertion_options(shipment)
+    result['suggestions'] = options[:suggestions]
+    if auto_assign and options and options[0]['added_distance_km'] <= settings.DISPATCH_MAX_DETOUR_KM:
+        try:
+            result['assigned_route'] = assign_to_route(shipment, options[0]).id
+        except DispatchError:
+            pass  # Taken / filled meanwhile: leave the suggestions to a manager
+    return result
@@ -0,0 +1,267 @@
+"""
+Load Planning
+=============
+Packs shipments into vehicles by weight and volume (2D variable-size bin
+packing) and checks route loads against their vehicle.
+
+1. First-fit decreasing: shipments by decreasing size, where size is
+   the larger of weight and volume relative to the biggest vehicle; each
+   goes into the first open vehicle with room, else opens the largest
+   free vehicle that can take it.
+2. Local improvement until nothing changes or the deadline:
+   - empty the lightest vehicles by moving their shipments into the
+     others' spare room;
+   - fit unassigned shipments by swapping out a lighter shipment that
+     fits elsewhere;
+   - move each load onto the smallest vehicle that carries it (best-fit,
+     heaviest load first), freeing the big ones.
+
+Vehicles without a volume capacity are not volume constrained.
+"""
+import time
+
+import numpy as np
+from django.db.models import Sum
+
+from .planning import free_vehicles, pending_shipments
+
+EPSILON = 1e-9
+
+
+def load_excess(vehicle, load_kg, load_m3):
+    """Human-readable reasons the load does not fit the vehicle, empty when it fits"""
+    problems = []
+    if load_kg > vehicle.capacity_kg + EPSILON:
+        problems.append(f'{load_kg:g} kg exceeds the vehicle capacity of {vehicle.capacity_kg} kg')
+    if vehicle.capacity_m3 is not None and load_m3 > vehicle.capacity_m3 + EPSILON:
+        problems.append(f'{load_m3:g} m3 exceeds the vehicle capacity of {vehicle.capacity_m3:g} m3')
+    return problems
+
+
+def shipment_load(shipment_ids):
+    """(kg, m3) of shipments (ids or an id subquery) in one aggregate query"""
+    from shipments.models import Shipment
+
+    load = Shipment.objects.filter(id__in=shipment_ids).aggregate(kg=Sum('weight_kg'), m3=Sum('volume_m3'))
+    return load['kg'] or 0.0, load['m3'] or 0.0
+
+
+class _Packing:
+    """Mutable packing state: items per bin plus residual capacities (NumPy)"""
+
+    def __init__(self, kg, m3, cap_kg, cap_m3):
+        self.kg, self.m3 = kg, m3
+        self.cap_kg, self.cap_m3 = cap_kg, cap_m3
+        self.res_kg, self.res_m3 = cap_kg.astype(np.float64), cap_m3.astype(np.float64)
+        self.items = [[] for _ in range(len(cap_kg))]
+        self.used = np.zeros(len(cap_kg), dtype=bool)
+        self.owner = np.full(len(kg), -1, dtype=np.int64)
+
+    def fits(self, item, bins=None):
+        mask = (self.res_kg >= self.kg[item] - EPSILON) & (self.res_m3 >= self.m3[item] - EPSILON)
+        return mask if bins is None else mask & bins
+
+    def put(self, item, vehicle):
+        self.items[vehicle].append(item)
+        self.owner[item] = vehicle
+        self.res_kg[vehicle] -= self.kg[item]
+        self.res_m3[vehicle] -= self.m3[item]
+        self.used[vehicle] = True
+
+    def take(self, item, vehicle):
+        self.items[vehicle].remove(item)
+        self.owner[item] = -1
+        self.res_kg[vehicle] += self.kg[item]
+        self.res_m3[vehicle] += self.m3[item]
+        if not self.items[vehicle]:
+            self.used[vehicle] = False
+
+    def first_fit(self, item, bins):
+        candidates = np.flatnonzero(self.fits(item, bins))
+        return int(candidates[0]) if len(candidates) else None
+
+
+def pack_loads(kg, m3, cap_kg, cap_m3, time_budget=1.0):
+    """
+    Pack items (`kg`, `m3` arrays) into vehicles (`cap_kg`, `cap_m3`
+    arrays; inf = unconstrained). Returns ({vehicle index: [item indexes]},
+    [unassigned item indexes]).
+    """
+    deadline = time.monotonic() + time_budget
+    kg, m3 = np.asarray(kg, dtype=np.float64), np.asarray(m3, dtype=np.float64)
+    cap_kg, cap_m3 = np.asarray(cap_kg, dtype=np.float64), np.asarray(cap_m3, dtype=np.float64)
+    if not len(cap_kg):
+        return {}, list(range(len(kg)))
+    packing = _Packing(kg, m3, cap_kg, cap_m3)
+
+    # 1. First-fit decreasing; vehicles are opened largest first
+    largest_m3 = cap_m3[np.isfinite(cap_m3)].max() if np.isfinite(cap_m3).any() else 0
+    size = np.maximum(kg / (cap_kg.max() or 1), m3 / largest_m3 if largest_m3 else 0)
+    by_capacity = np.lexsort((-cap_m3, -cap_kg))
+    unassigned = []
+    for item in np.argsort(-size, kind='stable').tolist():
+        vehicle = packing.first_fit(item, packing.used)
+        if vehicle is None:
+            fresh = np.flatnonzero(packing.fits(item, ~packing.used)[by_capacity])
+            vehicle = int(by_capacity[fresh[0]]) if len(fresh) else None
+        if vehicle is None:
+            unassigned.append(item)
+        else:
+            packing.put(item, vehicle)
+
+    # 2. Local improvement
+    changed = True
+    while changed and time.monotonic() < deadline:
+        changed = _empty_lightest(packing, deadline)
+        changed = _swap_in(packing, unassigned, deadline) or changed
+    _downsize(packing)
+
+    loads = {vehicle: sorted(items) for vehicle, items in enumerate(packing.items) if items}
+    return loads, sorted(unassigned)
+
+
+def _empty_lightest(packing, deadline):
+    """Try to close each vehicle (lightest first) by moving its items into the others"""
+    changed = False
+    used = np.flatnonzero(packing.used)
+    fill = (packing.cap_kg[used] - packing.res_kg[used]) / packing.cap_kg[used]
+    for vehicle in used[np.argsort(fill)].tolist():
+        if time.monotonic() > deadline:
+            break
+        if not packing.items[vehicle]:
+            continue
+        others = packing.used.copy()
+        others[vehicle] = False
+        moves = []
+        saved = packing.res_kg.copy(), packing.res_m3.copy()
+        for item in sorted(packing.items[vehicle], key=lambda item: -packing.kg[item]):
+            target = packing.first_fit(item, others)
+            if target is None:
+                break
+            moves.append((item, target))
+            packing.res_kg[target] -= packing.kg[item]
+            packing.res_m3[target] -= packing.m3[item]
+        packing.res_kg, packing.res_m3 = saved
+        if len(moves) == len(packing.items[vehicle]):
+            for item, target in moves:
+                packing.take(item, vehicle)
+                packing.put(item, target)
+            changed = True
+    return changed
+
+
+def _swap_in(packing, unassigned, deadline, candidates=64):
+    """Place unassigned items directly, or by swapping out a smaller item that fits elsewhere"""
+    changed = False
+    everywhere = np.ones(len(packing.cap_kg), dtype=bool)
+    bounds = None
+    # Items that could not be placed: anything at least as heavy and bulky fails too
+    failed_kg, failed_m3 = [], []
+    for item in sorted(unassigned, key=lambda item: packing.kg[item]):
+        if time.monotonic() > deadline:
+            break
+        if failed_kg and ((np.array(failed_kg) <= packing.kg[item]) & (np.array(failed_m3) <= packing.m3[item])).any():
+            continue
+        vehicle = packing.first_fit(item, everywhere)
+        if vehicle is None:
+            if bounds is None:
+                # Upper bound of each vehicle's room after swapping out its largest item
+                packed = np.flatnonzero(packing.owner >= 0)
+                bounds = packing.res_kg.copy(), packing.res_m3.copy()
+                largest_kg, largest_m3 = np.zeros(len(packing.cap_kg)), np.zeros(len(packing.cap_kg))
+                np.maximum.at(largest_kg, packing.owner[packed], packing.kg[packed])
+                np.maximum.at(largest_m3, packing.owner[packed], packing.m3[packed])
+                bounds = bounds[0] + largest_kg, bounds[1] + largest_m3
+            if not ((bounds[0] >= packing.kg[item] - EPSILON) & (bounds[1] >= packing.m3[item] - EPSILON)).any():
+                failed_kg.append(packing.kg[item])
+                failed_m3.append(packing.m3[item])
+                continue
+            # Packed items whose vehicle could take `item` instead of them
+            owner = packing.owner
+            packed = np.flatnonzero(owner >= 0)
+            room_kg = packing.res_kg[owner[packed]] + packing.kg[packed]
+            room_m3 = packing.res_m3[owner[packed]] + packing.m3[packed]
+            smaller = (packing.kg[packed] < packing.kg[item]) | (packing.m3[packed] < packing.m3[item])
+            outs = packed[(room_kg >= packing.kg[item] - EPSILON) & (room_m3 >= packing.m3[item] - EPSILON) & smaller]
+            if len(outs) > candidates:
+                outs = outs[np.argpartition(packing.kg[outs], candidates - 1)[:candidates]]
+            outs = outs[np.argsort(packing.kg[outs], kind='stable')]
+            if not len(outs):
+                failed_kg.append(packing.kg[item])
+                failed_m3.append(packing.m3[item])
+                continue
+            # Can each of them go to another vehicle?
+            fits = ((packing.res_kg[None, :] >= packing.kg[outs, None] - EPSILON)
+                    & (packing.res_m3[None, :] >= packing.m3[outs, None] - EPSILON))
+            fits[np.arange(len(outs)), owner[outs]] = False
+            movable = np.flatnonzero(fits.any(axis=1))
+            if not len(movable):
+                failed_kg.append(packing.kg[item])
+                failed_m3.append(packing.m3[item])
+                continue
+            out = int(outs[movable[0]])
+            vehicle, target = int(owner[out]), int(np.argmax(fits[movable[0]]))
+            packing.take(out, vehicle)
+            packing.put(out, target)
+        packing.put(item, vehicle)
+        unassigned.remove(item)
+        changed, bounds = True, None
+        failed_kg, failed_m3 = [], []
+    return changed
+
+
+def _downsize(packing):
+    """Re-match loads to the smallest vehicles that carry them (heaviest load first)"""
+    used = np.flatnonzero(packing.used)
+    load_kg = np.array([packing.kg[packing.items[vehicle]].sum() for vehicle in used])
+    load_m3 = np.array([packing.m3[packing.items[vehicle]].sum() for vehicle in used])
+    free = np.ones(len(packing.cap_kg), dtype=bool)
+    by_capacity = np.lexsort((packing.cap_m3, packing.cap_kg))  # Smallest first
+    assignment = {}
+    for position in np.argsort(-load_kg, kind='stable').tolist():
+        fits = free & (packing.cap_kg >= load_kg[position] - EPSILON) & (packing.cap_m3 >= load_m3[position] - EPSILON)
+        candidates = np.flatnonzero(fits[by_capacity])
+        if not len(candidates):
+            return  # Keep the current vehicles
+        vehicle = int(by_capacity[candidates[0]])
+        free[vehicle] = False
+        assignment[int(used[position])] = vehicle
+    items = [[] for _ in range(len(packing.cap_kg))]
+    for source, target in assignment.items():
+        items[target] = packing.items[source]
+    packing.items = items
+    packing.used = np.array([bool(load) for load in items])
+
+
+def plan_loads(date, time_budget=1.0):
+    """
+    Pack the day's pending shipments into the free vehicles.
+    Returns {'date', 'loads': [...], 'unassigned_shipments', 'elapsed_seconds'}.
+    """
+    started = time.monotonic()
+    shipments = list(pending_shipments(date).order_by('id').values_list('id', 'weight_kg', 'volume_m3'))
+    vehicles = list(free_vehicles(date).order_by('id').values_list('id', 'plate', 'capacity_kg', 'capacity_m3'))
+    ids = np.array([shipment_id for shipment_id, _, _ in shipments], dtype=np.int64)
+    kg = np.array([weight or 0.0 for _, weight, _ in shipments])
+    m3 = np.array([volume or 0.0 for _, _, volume in shipments])
+    cap_kg = np.array([cap for _, _, cap, _ in vehicles], dtype=np.float64)
+    cap_m3 = np.array([np.inf if cap is None else cap for _, _, _, cap in vehicles], dtype=np.float64)
+
+    loads, unassigned = pack_loads(kg, m3, cap_kg, cap_m3, time_budget=time_budget)
+    plan = {'date': date, 'loads': [], 'unassigned_shipments': ids[unassigned].tolist()}
+    for vehicle, items in sorted(loads.items()):
+        vehicle_id, plate, capacity_kg, capacity_m3 = vehicles[vehicle]
+        load_kg, load_m3 = float(kg[items].sum()), float(m3[items].sum())
+        plan['loads'].append({
+            'vehicle': vehicle_id,
+            'plate': plate,
+            'capacity_kg': capacity_kg,
+            'capacity_m3': capacity_m3,
+            'shipments': ids[items].tolist(),
+            'load_kg': round(load_kg, 2),
+            'load_m3': round(load_m3, 3),
+            'utilization_kg': round(load_kg / capacity_kg, 3) if capacity_kg else None,
+            'utilization_m3': round(load_m3 / capacity_m3, 3) if capacity_m3 else None,
+        })
+    plan['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return plan
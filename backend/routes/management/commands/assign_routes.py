@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from routes.assignment import assign_routes, AssignmentError
+
+
+class Command(BaseCommand):
+    help = (
+        'Pair the Planned routes of a day with drivers and vehicles at minimum cost '
+        '(capacity fit, status, recent workload and incidents) and save the changes in one transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to assign, YYYY-MM-DD (default: today)')
+        parser.add_argument('--dry-run', action='store_true', help='Print the assignment without saving it')
+
+    def handle(self, *args, **options):
+        date = timezone.localdate()
+        if options['date']:
+            date = parse_date(options['date'])
+            if date is None:
+                raise CommandError('--date must be a date (YYYY-MM-DD)')
+
+        try:
+            plan = assign_routes(date, commit=not options['dry_run'])
+        except AssignmentError as exc:
+            raise CommandError(str(exc))
+
+        for entry in plan['assignments']:
+            if entry['changed']:
+                self.stdout.write(
+                    f"  route {entry['route']}: driver {entry['previous_driver']} -> {entry['driver']}, "
+                    f"vehicle {entry['previous_vehicle']} -> {entry['vehicle']}"
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"{plan['changed']} of {len(plan['assignments'])} routes reassigned for {date} "
+            f"({plan['elapsed_seconds']}s){' (dry run)' if options['dry_run'] else ''}"
+        ))
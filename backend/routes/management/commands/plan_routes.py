@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from routes.planning import plan_routes, PlanningError
+
+
+class Command(BaseCommand):
+    help = (
+        'Plan the routes of a day: pending shipments are grouped into capacity-feasible routes '
+        'for the free vehicles and drivers and created as Planned routes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to plan, YYYY-MM-DD (default: today)')
+        parser.add_argument(
+            '--time-budget',
+            type=float,
+            default=settings.ROUTE_PLANNING_TIME_BUDGET,
+            help='Solver time limit in seconds (default: ROUTE_PLANNING_TIME_BUDGET)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.ROUTE_PLANNING_WORKERS,
+            help='Processes for the route improvement phase',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Print the plan without creating routes')
+
+    def handle(self, *args, **options):
+        date = timezone.localdate()
+        if options['date']:
+            date = parse_date(options['date'])
+            if date is None:
+                raise CommandError('--date must be a date (YYYY-MM-DD)')
+
+        try:
+            plan = plan_routes(date, time_budget=options['time_budget'], workers=options['workers'],
+                               commit=not options['dry_run'])
+        except PlanningError as exc:
+            raise CommandError(str(exc))
+
+        for route in plan['routes']:
+            self.stdout.write(
+                f"  {'route ' + str(route['id']) if 'id' in route else 'planned'}: vehicle {route['vehicle']}, "
+                f"driver {route['driver']}, {len(route['stops'])} stops, {len(route['shipments'])} shipments, "
+                f"{route['load_kg']} kg, {route['estimated_distance_km']} km"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plan['routes'])} routes for {date}, {len(plan['unassigned_shipments'])} shipments unassigned "
+            f"({plan['elapsed_seconds']}s)"
+        ))
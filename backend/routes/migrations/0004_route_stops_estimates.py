@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0003_alter_route_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='estimated_distance_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='estimated_duration_hours',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='route',
+            name='stops',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -10,10 +10,15 @@ class Route(models.Model):
     driver = models.ForeignKey('drivers.Driver', on_delete=models.CASCADE, related_name='routes')
     vehicle = models.ForeignKey('vehicles.Vehicle', on_delete=models.CASCADE, related_name='routes')
     shipments = models.ManyToManyField('shipments.Shipment', related_name='routes')
-    date = models.DateField()
+    date = models.DateField(db_index=True)
     actual_distance_km = models.FloatField(null=True, blank=True)
     actual_duration_hours = models.FloatField(null=True, blank=True)
     fuel_consumed_liters = models.FloatField(null=True, blank=True)
+    # Set by the route planner: destination ids in visiting order and the
+    # planned hub -> stops -> hub distance / driving plus handling time
+    stops = models.JSONField(default=list, blank=True)
+    estimated_distance_km = models.FloatField(null=True, blank=True)
+    estimated_duration_hours = models.FloatField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Planned')
     
     def __str__(self):
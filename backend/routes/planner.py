@@ -0,0 +1,214 @@
+"""
+Route Planner
+=============
+Capacitated vehicle routing over a distance matrix whose row/column 0 is
+the depot (hub) and 1..n are stops. Pure NumPy/Python: no Django, so the
+local search can run in worker processes.
+
+1. Construction: Clarke-Wright parallel savings, restricted to each stop's
+   nearest neighbours (granular savings) so candidates stay O(n*k).
+   Merges respect the largest vehicle's weight and volume capacity.
+2. Fleet fit: routes are matched to vehicles best-fit by load; routes no
+   vehicle can carry are trimmed and their stops left unassigned.
+3. Improvement: 2-opt and or-opt (segments of 1-3 stops) per route, run
+   in parallel across routes.
+
+Everything stops at the time budget's deadline and returns the best
+feasible plan so far. 2-opt reverses segments, which assumes a (near)
+symmetric matrix.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+NEIGHBOURS = 40
+EPSILON = 1e-9
+
+
+def savings_routes(dist, kg, m3, cap_kg, cap_m3, deadline, neighbours=NEIGHBOURS):
+    """Stops 1..n merged into routes (lists of stop indexes) by descending savings"""
+    n = len(dist) - 1
+    routes = {stop: [stop] for stop in range(1, n + 1)}
+    route_of = list(range(n + 1))
+    load_kg = {stop: float(kg[stop]) for stop in range(1, n + 1)}
+    load_m3 = {stop: float(m3[stop]) for stop in range(1, n + 1)}
+    if n < 2:
+        return list(routes.values())
+
+    k = min(neighbours, n - 1)
+    between = dist[1:, 1:].astype(np.float64, copy=True)
+    np.fill_diagonal(between, np.inf)
+    nearest = np.argpartition(between, k - 1, axis=1)[:, :k] + 1
+    first = np.repeat(np.arange(1, n + 1), k)
+    second = nearest.ravel()
+    pairs = np.unique(np.minimum(first, second) * (n + 1) + np.maximum(first, second))
+    first, second = pairs // (n + 1), pairs % (n + 1)
+    saving = dist[0, first] + dist[0, second] - dist[first, second]
+    order = np.argsort(-saving, kind='stable')
+    order = order[saving[order] > 0]
+
+    for count, (p, q) in enumerate(zip(first[order].tolist(), second[order].tolist())):
+        if count % 1024 == 0 and time.monotonic() > deadline:
+            break
+        rp, rq = route_of[p], route_of[q]
+        if rp == rq:
+            continue
+        route_p, route_q = routes[rp], routes[rq]
+        if p not in (route_p[0], route_p[-1]) or q not in (route_q[0], route_q[-1]):
+            continue  # Interior stops cannot be joined
+        if load_kg[rp] + load_kg[rq] > cap_kg or load_m3[rp] + load_m3[rq] > cap_m3:
+            continue
+        # Orient as ... p -> q ...
+        if route_p[-1] != p:
+            route_p.reverse()
+        if route_q[0] != q:
+            route_q.reverse()
+        # Keep the longer list, relabel the shorter one
+        if len(route_p) >= len(route_q):
+            keep, drop = rp, rq
+            route_p.extend(route_q)
+        else:
+            keep, drop = rq, rp
+            route_q[:0] = route_p
+        for stop in routes[drop]:
+            route_of[stop] = keep
+        load_kg[keep] += load_kg.pop(drop)
+        load_m3[keep] += load_m3.pop(drop)
+        del routes[drop]
+    return list(routes.values())
+
+
+def tour_length(dist, stops):
+    """Depot -> stops -> depot"""
+    tour = np.concatenate(([0], stops, [0])).astype(np.int64)
+    return float(dist[tour[:-1], tour[1:]].sum())
+
+
+def two_opt(dist, tour, deadline):
+    """Best-improvement 2-opt on a closed tour (depot at both ends); in place"""
+    improved = False
+    for i in range(1, len(tour) - 2):
+        if time.monotonic() > deadline:
+            break
+        a, b = tour[i - 1], tour[i]
+        ks = np.arange(i + 1, len(tour) - 1)
+        c, d = tour[ks], tour[ks + 1]
+        delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+        best = int(np.argmin(delta))
+        if delta[best] < -EPSILON:
+            k = ks[best]
+            tour[i:k + 1] = tour[i:k + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def or_opt(dist, tour, deadline, max_segment=3):
+    """Move segments of 1..max_segment stops to their best position; in place"""
+    improved = False
+    for length in range(1, max_segment + 1):
+        i = 1
+        while i + length <= len(tour) - 1:
+            if time.monotonic() > deadline:
+                return improved
+            prev, first, last, after = tour[i - 1], tour[i], tour[i + length - 1], tour[i + length]
+            removal_gain = dist[prev, first] + dist[last, after] - dist[prev, after]
+            rest = np.concatenate((tour[:i], tour[i + length:]))
+            u, v = rest[:-1], rest[1:]
+            forward = dist[u, first] + dist[last, v] - dist[u, v]
+            backward = dist[u, last] + dist[first, v] - dist[u, v]
+            costs = np.minimum(forward, backward)
+            costs[i - 1] = np.inf  # Where it came from
+            best = int(np.argmin(costs))
+            if costs[best] < removal_gain - EPSILON:
+                segment = tour[i:i + length].copy()
+                if backward[best] < forward[best]:
+                    segment = segment[::-1]
+                tour[:] = np.concatenate((rest[:best + 1], segment, rest[best + 1:]))
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def improve_route(dist, deadline):
+    """
+    2-opt / or-opt until no improvement or the deadline. `dist` is the
+    route's own matrix (0 = depot, 1..m = its stops in current order).
+    Returns the improved order as local indexes 1..m.
+    """
+    tour = np.arange(len(dist) + 1, dtype=np.int64)
+    tour[-1] = 0
+    if len(dist) <= 3:
+        return tour[1:-1]
+    while time.monotonic() < deadline:
+        changed = two_opt(dist, tour, deadline)
+        changed = or_opt(dist, tour, deadline) or changed
+        if not changed:
+            break
+    return tour[1:-1]
+
+
+def fit_fleet(routes, kg, m3, vehicles):
+    """
+    Best-fit routes (heaviest first) onto vehicles [(cap_kg, cap_m3)].
+    Returns ([(vehicle index, stops)], unassigned stops).
+    """
+    free = sorted(range(len(vehicles)), key=lambda index: vehicles[index])
+    routes = sorted(routes, key=lambda stops: -sum(kg[stop] for stop in stops))
+    assigned, unassigned = [], []
+    for stops in routes:
+        if not free:
+            unassigned.extend(stops)
+            continue
+        load_kg, load_m3 = sum(kg[stop] for stop in stops), sum(m3[stop] for stop in stops)
+        fitting = [index for index in free if vehicles[index][0] >= load_kg and vehicles[index][1] >= load_m3]
+        vehicle = fitting[0] if fitting else free[-1]
+        stops = list(stops)
+        while stops and (load_kg > vehicles[vehicle][0] or load_m3 > vehicles[vehicle][1]):
+            stop = stops.pop()
+            load_kg -= kg[stop]
+            load_m3 -= m3[stop]
+            unassigned.append(stop)
+        if stops:
+            free.remove(vehicle)
+            assigned.append((vehicle, stops))
+    return assigned, unassigned
+
+
+def solve(dist, kg, m3, vehicles, time_budget=10.0, workers=1):
+    """
+    Plan routes for stops 1..n of `dist` with demands `kg` / `m3` (index 0
+    unused) and `vehicles` [(cap_kg, cap_m3)]. Returns
+    {'routes': [(vehicle index, ordered stops, length)], 'unassigned': stops}.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget
+    dist = np.asarray(dist, dtype=np.float64)
+    kg, m3 = np.asarray(kg, dtype=np.float64), np.asarray(m3, dtype=np.float64)
+    if not vehicles:
+        return {'routes': [], 'unassigned': list(range(1, len(dist)))}
+
+    cap_kg = max(vehicle[0] for vehicle in vehicles)
+    cap_m3 = max(vehicle[1] for vehicle in vehicles)
+    oversized = [stop for stop in range(1, len(dist)) if kg[stop] > cap_kg or m3[stop] > cap_m3]
+    # Construction gets at most half the budget, the rest goes to improvement
+    routes = savings_routes(dist, kg, m3, cap_kg, cap_m3, started + time_budget / 2)
+    routes = [stops for stops in routes if stops[0] not in oversized]
+    assigned, unassigned = fit_fleet(routes, kg, m3, vehicles)
+
+    jobs = []
+    for vehicle, stops in assigned:
+        nodes = np.concatenate(([0], stops)).astype(np.int64)
+        jobs.append((vehicle, nodes, dist[np.ix_(nodes, nodes)]))
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            orders = list(pool.map(improve_route, [sub for _, _, sub in jobs], [deadline] * len(jobs)))
+    else:
+        orders = [improve_route(sub, deadline) for _, _, sub in jobs]
+
+    planned = []
+    for (vehicle, nodes, _), order in zip(jobs, orders):
+        stops = nodes[order].tolist()
+        planned.append((vehicle, stops, tour_length(dist, stops)))
+    return {'routes': planned, 'unassigned': sorted(oversized + unassigned)}
@@ -0,0 +1,232 @@
+"""
+Route Planning
+==============
+Loads a day's pending shipments and free vehicles / drivers, runs the
+planner (routes/planner.py) and commits the resulting routes in bulk.
+
+- Shipments: Pending, with a destination, not on a Planned/Active route,
+  due by the end of the day (estimated_delivery, or created by then).
+- Vehicles / drivers: status Available and not on a route that day.
+- Stops: shipments are grouped per destination; a destination whose load
+  exceeds the largest vehicle is split into several stops.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from destinations.geo import distance_matrix as geo_matrix
+from destinations.models import Destination
+from drivers.models import Driver
+from shipments.models import Shipment
+from vehicles.models import Vehicle
+from .models import Route
+from .planner import solve, tour_length
+
+OPEN_ROUTE_STATUSES = ('Planned', 'Active')
+
+
+class PlanningError(Exception):
+    """Raised when the plan cannot be committed (e.g. shipments taken meanwhile)"""
+
+
+def reconcile_stops(stops, destination_ids):
+    """
+    Stops matching the destinations of a route's shipments: the current
+    order for destinations still served, missing ones appended in the
+    order given, stops without a shipment left dropped.
+    """
+    served = set(destination_ids) - {None}
+    reconciled = [stop for stop in dict.fromkeys(stops or ()) if stop in served]
+    reconciled += [stop for stop in dict.fromkeys(destination_ids) if stop in served and stop not in reconciled]
+    return reconciled
+
+
+def route_stops(routes):
+    """Reconcile `route.stops` in place (not saved) for routes whose shipments were edited by hand; one query"""
+    destinations = defaultdict(list)
+    rows = Route.shipments.through.objects.filter(route_id__in=[route.id for route in routes]).order_by('id')
+    for route_id, destination_id in rows.values_list('route_id', 'shipment__destination_id'):
+        destinations[route_id].append(destination_id)
+    for route in routes:
+        route.stops = reconcile_stops(route.stops, destinations[route.id])
+    return routes
+
+
+def pending_shipments(date):
+    end_of_day = timezone.make_aware(datetime.combine(date + timedelta(days=1), dt_time.min))
+    return (
+        Shipment.objects
+        .filter(status='Pending', destination__isnull=False)
+        .filter(Q(estimated_delivery__lt=end_of_day) | Q(estimated_delivery__isnull=True, created_at__lt=end_of_day))
+        .exclude(routes__status__in=OPEN_ROUTE_STATUSES)
+    )
+
+
+def free_vehicles(date):
+    return Vehicle.objects.filter(status='Available').exclude(
+        routes__date=date, routes__status__in=OPEN_ROUTE_STATUSES
+    )
+
+
+def free_drivers(date):
+    return Driver.objects.filter(status='Available').exclude(
+        routes__date=date, routes__status__in=OPEN_ROUTE_STATUSES
+    )
+
+
+def travel_matrices(destination_ids):
+    """
+    Hub + destinations (distance km, driving hours) matrices; row/column 0
+    is the hub. Legs between destinations come from the precomputed geo
+    matrix (destinations/geo.py). Without coordinates, destinations only
+    have their distance from the hub: stops in the same city / delivery
+    zone are assumed to lie on one corridor (|d1 - d2|), others to be
+    reached through the hub (d1 + d2).
+    """
+    rows = {
+        dest_id: (distance_km, city, zone)
+        for dest_id, distance_km, city, zone in Destination.objects.filter(id__in=set(destination_ids)).values_list(
+            'id', 'distance_km', 'city', 'delivery_zone'
+        )
+    }
+    distances = np.array([0.0] + [rows[dest_id][0] for dest_id in destination_ids])
+    corridors = [None] + [(rows[dest_id][1], rows[dest_id][2]) for dest_id in destination_ids]
+    _, corridor = np.unique(np.array([str(key) for key in corridors]), return_inverse=True)
+    same_corridor = corridor[:, None] == corridor[None, :]
+    matrix = np.where(
+        same_corridor,
+        np.abs(distances[:, None] - distances[None, :]),
+        distances[:, None] + distances[None, :],
+    )
+    hours = matrix / settings.ROUTE_AVERAGE_SPEED_KMH
+
+    geo_distance, geo_hours = geo_matrix.submatrix(list(destination_ids))
+    known = np.isfinite(geo_distance)
+    matrix[1:, 1:][known] = geo_distance[known]
+    hours[1:, 1:][known] = geo_hours[known]
+
+    matrix[0, :], matrix[:, 0] = distances, distances
+    hours[0, :] = hours[:, 0] = distances / settings.ROUTE_AVERAGE_SPEED_KMH
+    np.fill_diagonal(matrix, 0)
+    np.fill_diagonal(hours, 0)
+    return matrix, hours
+
+
+def build_stops(shipments, cap_kg, cap_m3):
+    """
+    [(destination_id, [shipment ids], kg, m3)] - shipments of a destination
+    first-fit into stops no larger than the biggest vehicle.
+    """
+    by_destination = defaultdict(list)
+    for shipment_id, destination_id, weight_kg, volume_m3 in shipments:
+        by_destination[destination_id].append((shipment_id, weight_kg or 0.0, volume_m3 or 0.0))
+    stops = []
+    for destination_id, items in by_destination.items():
+        bins = []
+        for shipment_id, weight_kg, volume_m3 in sorted(items, key=lambda item: -item[1]):
+            for stop in bins:
+                if stop[2] + weight_kg <= cap_kg and stop[3] + volume_m3 <= cap_m3:
+                    stop[1].append(shipment_id)
+                    stop[2] += weight_kg
+                    stop[3] += volume_m3
+                    break
+            else:
+                bins.append([destination_id, [shipment_id], weight_kg, volume_m3])
+        stops.extend(tuple(stop) for stop in bins)
+    return stops
+
+
+def plan_routes(date, time_budget=None, workers=None, commit=True):
+    """
+    Plan (and unless `commit` is False, create) the routes for `date`.
+    Returns {'date', 'routes': [...], 'unassigned_shipments', 'elapsed_seconds'}.
+    """
+    started = time.monotonic()
+    time_budget = settings.ROUTE_PLANNING_TIME_BUDGET if time_budget is None else time_budget
+    workers = settings.ROUTE_PLANNING_WORKERS if workers is None else workers
+
+    shipments = list(pending_shipments(date).values_list('id', 'destination_id', 'weight_kg', 'volume_m3'))
+    drivers = list(free_drivers(date).order_by('id').values_list('id', flat=True))
+    # Biggest vehicles first: there may be more vehicles than drivers
+    vehicles = list(
+        free_vehicles(date).order_by('-capacity_kg', 'id').values_list('id', 'capacity_kg', 'capacity_m3')
+    )[:len(drivers)]
+    capacities = [(float(cap_kg), float('inf') if cap_m3 is None else cap_m3) for _, cap_kg, cap_m3 in vehicles]
+
+    plan = {'date': date, 'routes': [], 'unassigned_shipments': [shipment_id for shipment_id, *_ in shipments]}
+    if not shipments or not vehicles:
+        plan['elapsed_seconds'] = round(time.monotonic() - started, 3)
+        return plan
+
+    stops = build_stops(shipments, max(cap for cap, _ in capacities), max(cap for _, cap in capacities))
+    dist, hours = travel_matrices([destination_id for destination_id, *_ in stops])
+    kg = np.array([0.0] + [stop[2] for stop in stops])
+    m3 = np.array([0.0] + [stop[3] for stop in stops])
+    solution = solve(dist, kg, m3, capacities, time_budget=max(time_budget - (time.monotonic() - started), 0.1),
+                     workers=workers)
+
+    for (vehicle_index, route_stops, length), driver_id in zip(solution['routes'], drivers):
+        plan['routes'].append({
+            'driver': driver_id,
+            'vehicle': vehicles[vehicle_index][0],
+            'stops': [stops[stop - 1][0] for stop in route_stops],
+            'shipments': [shipment_id for stop in route_stops for shipment_id in stops[stop - 1][1]],
+            'load_kg': round(float(kg[route_stops].sum()), 2),
+            'load_m3': round(float(m3[route_stops].sum()), 3),
+            'estimated_distance_km': round(length, 1),
+            'estimated_duration_hours': round(
+                tour_length(hours, route_stops) + len(route_stops) * settings.ROUTE_STOP_MINUTES / 60, 2
+            ),
+        })
+    plan['unassigned_shipments'] = sorted(
+        shipment_id for stop in solution['unassigned'] for shipment_id in stops[stop - 1][1]
+    )
+    if commit and plan['routes']:
+        commit_plan(date, plan['routes'])
+    plan['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return plan
+
+
+def commit_plan(date, planned):
+    """Create the planned routes and their shipment links in two bulk inserts"""
+    from .availability import availability_index
+
+    shipment_ids = [shipment_id for route in planned for shipment_id in route['shipments']]
+    with transaction.atomic():
+        # Lock the shipments; refuse if another plan/manager took any of them meanwhile
+        locked = list(Shipment.objects.select_for_update().filter(id__in=shipment_ids).values_list('id', flat=True))
+        taken = set(
+            Route.shipments.through.objects.filter(
+                shipment_id__in=shipment_ids, route__status__in=OPEN_ROUTE_STATUSES
+            ).values_list('shipment_id', flat=True)
+        )
+        if taken or len(locked) != len(shipment_ids):
+            raise PlanningError('Some shipments were assigned or removed while planning; plan again.')
+        routes = Route.objects.bulk_create([
+            Route(
+                date=date,
+                driver_id=route['driver'],
+                vehicle_id=route['vehicle'],
+                status='Planned',
+                stops=route['stops'],
+                estimated_distance_km=route['estimated_distance_km'],
+                estimated_duration_hours=route['estimated_duration_hours'],
+            )
+            for route in planned
+        ])
+        Route.shipments.through.objects.bulk_create([
+            Route.shipments.through(route_id=route.id, shipment_id=shipment_id)
+            for route, route_plan in zip(routes, planned)
+            for shipment_id in route_plan['shipments']
+        ])
+        transaction.on_commit(availability_index.invalidate)  # bulk_create sends no signals
+    availability_index.invalidate()
+    for route, route_plan in zip(routes, planned):
+        route_plan['id'] = route.id
+    return routes
@@ -1,14 +1,149 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .availability import booking_conflicts
+from .loading import load_excess, shipment_load
 from .models import Route
+from .planning import OPEN_ROUTE_STATUSES, reconcile_stops
+from shipments.models import Shipment
 from drivers.serializers import DriverSerializer
 from vehicles.serializers import VehicleSerializer
 from shipments.serializers import ShipmentSerializer
 
+BOOKING_FIELDS = {'driver', 'vehicle', 'date', 'estimated_duration_hours'}
+
+
 class RouteSerializer(serializers.ModelSerializer):
     driver_details = DriverSerializer(source='driver', read_only=True)
     vehicle_details = VehicleSerializer(source='vehicle', read_only=True)
     shipments_details = ShipmentSerializer(source='shipments', many=True, read_only=True)
     
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join driver/user/vehicle and prefetch the nested shipment tree in one query"""
+        return queryset.select_related('driver__user', 'vehicle').prefetch_related(
+            Prefetch('shipments', queryset=ShipmentSerializer.setup_eager_loading(Shipment.objects.all()))
+        )
+    
     class Meta:
         model = Route
         fields = '__all__'
+
+    def validate(self, attrs):
+        self._check_bookings(attrs)
+        # The vehicle must carry the route's shipments (weight and volume), one aggregate query
+        if 'shipments' not in attrs and 'vehicle' not in attrs:
+            return attrs
+        vehicle = attrs.get('vehicle', getattr(self.instance, 'vehicle', None))
+        if vehicle is None:
+            return attrs
+        if 'shipments' in attrs:
+            load_kg, load_m3 = shipment_load([shipment.pk for shipment in attrs['shipments']])
+        else:
+            load_kg, load_m3 = shipment_load(self.instance.shipments.values('pk'))
+        problems = load_excess(vehicle, load_kg, load_m3)
+        if problems:
+            raise serializers.ValidationError({'shipments': problems})
+        return attrs
+
+    def create(self, validated_data):
+        route = super().create(validated_data)
+        self._sync_stops(route)
+        return route
+
+    def update(self, instance, validated_data):
+        route = super().update(instance, validated_data)
+        if 'shipments' in validated_data or 'stops' in validated_data:
+            self._sync_stops(route)
+        return route
+
+    @staticmethod
+    def _sync_stops(route):
+        # Keep the ordered stops (used by dispatch) in line with the shipments
+        destination_ids = route.shipments.order_by('id').values_list('destination_id', flat=True)
+        stops = reconcile_stops(route.stops, list(destination_ids))
+        if stops != route.stops:
+            route.stops = stops
+            route.save(update_fields=['stops'])
+
+    def _check_bookings(self, attrs):
+        # No driver / vehicle on two open routes whose windows overlap, none Off Duty / in Maintenance
+        instance = self.instance
+        reopened = 'status' in attrs and getattr(instance, 'status', None) not in OPEN_ROUTE_STATUSES
+        if not reopened and not BOOKING_FIELDS.intersection(attrs):
+            return
+        values = {field: attrs.get(field, getattr(instance, field, None)) for field in BOOKING_FIELDS}
+        values['status'] = attrs.get('status', getattr(instance, 'status', 'Planned'))
+        if values['status'] not in OPEN_ROUTE_STATUSES or values['date'] is None:
+            return
+        found = booking_conflicts(
+            values['date'], values['estimated_duration_hours'], driver=values['driver'], vehicle=values['vehicle'],
+            exclude_route=getattr(instance, 'pk', None),
+        )
+        errors = {}
+        for conflict in found:
+            kind = conflict['resource']
+            if 'route' in conflict:
+                message = (f"The {kind} is already booked on route {conflict['route']} "
+                           f"({conflict['start']:%Y-%m-%d %H:%M} - {conflict['end']:%Y-%m-%d %H:%M}).")
+            elif instance is None or getattr(instance, f'{kind}_id') != conflict['id']:
+                message = f"The {kind} is {conflict['status']}."
+            else:
+                continue  # Already on this route before the block
+            errors.setdefault(kind, []).append(message)
+        if errors:
+            raise serializers.ValidationError(errors)
+
+
+class RoutePlanRequestSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    time_budget = serializers.FloatField(min_value=0.1, max_value=120, required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+
+class RouteLoadPlanQuerySerializer(serializers.Serializer):
+    date = serializers.DateField(required=False)
+    time_budget = serializers.FloatField(min_value=0.05, max_value=10, default=1.0)
+
+
+class RouteAssignRequestSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    dry_run = serializers.BooleanField(default=False)
+
+
+class RouteAvailabilityQuerySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    duration_hours = serializers.FloatField(min_value=0.1, max_value=24 * 14, required=False)
+
+
+class RouteConflictQuerySerializer(serializers.Serializer):
+    """Either an existing `route`, or a proposed `date` (+ duration) with a `driver` and/or `vehicle`"""
+    route = serializers.IntegerField(required=False)
+    date = serializers.DateField(required=False)
+    duration_hours = serializers.FloatField(min_value=0.1, max_value=24 * 14, required=False)
+    driver = serializers.IntegerField(required=False)
+    vehicle = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if 'route' not in attrs and ('date' not in attrs or ('driver' not in attrs and 'vehicle' not in attrs)):
+            raise serializers.ValidationError('Pass a route, or a date with a driver and/or vehicle.')
+        return attrs
+
+
+class RouteCompletionSerializer(serializers.Serializer):
+    actual_distance_km = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    actual_duration_hours = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    fuel_consumed_liters = serializers.FloatField(min_value=0, required=False, allow_null=True)
+
+
+class RouteCompletionItemSerializer(RouteCompletionSerializer):
+    id = serializers.IntegerField()
+
+
+class RouteBulkCompletionSerializer(serializers.Serializer):
+    routes = RouteCompletionItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_routes(self, routes):
+        ids = [route['id'] for route in routes]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError('Each route may only be listed once.')
+        return routes
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from drivers.models import Driver
+from vehicles.models import Vehicle
+from .availability import availability_index
+from .models import Route
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+def invalidate_availability_index(sender, **kwargs):
+    """Drop the index now and again once the change commits (see invalidate_pricing_table)"""
+    availability_index.invalidate()
+    transaction.on_commit(availability_index.invalidate)
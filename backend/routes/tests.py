@@ -0,0 +1,569 @@
+import datetime
+import itertools
+import time
+
+import numpy as np
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from destinations.models import Destination
+from drivers.models import Driver
+from incidents.models import Incident
+from routes.assignment import linear_sum_assignment
+from routes.availability import availability_index, route_window
+from analytics.rollups import rebuild_rollups
+from routes.completion import complete_routes
+from routes.dispatch import candidate_routes
+from routes.loading import _Packing, _swap_in, pack_loads
+from routes.models import Route
+from routes.planner import solve, tour_length
+from shipments.models import Shipment, ShipmentEvent
+from users.models import User
+from vehicles.models import Vehicle
+
+
+def euclidean(points):
+    return np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2))
+
+
+class PlannerTests(TestCase):
+    def test_routes_are_feasible_and_cover_every_stop(self):
+        rng = np.random.default_rng(7)
+        points = rng.uniform(-100, 100, size=(301, 2))
+        points[0] = 0
+        dist = euclidean(points)
+        kg = np.concatenate(([0], rng.uniform(10, 200, 300)))
+        m3 = np.concatenate(([0], rng.uniform(0.1, 2, 300)))
+        kg[5] = 5000  # Heavier than any vehicle
+        vehicles = [(3000, 40.0)] * 8 + [(1500, float('inf'))] * 10
+
+        started = time.monotonic()
+        solution = solve(dist, kg, m3, vehicles, time_budget=5)
+        self.assertLess(time.monotonic() - started, 6)
+
+        planned = [stop for _, stops, _ in solution['routes'] for stop in stops]
+        self.assertEqual(sorted(planned + solution['unassigned']), list(range(1, 301)))
+        self.assertIn(5, solution['unassigned'])
+        self.assertEqual(len({vehicle for vehicle, _, _ in solution['routes']}), len(solution['routes']))
+        for vehicle, stops, length in solution['routes']:
+            self.assertLessEqual(kg[stops].sum(), vehicles[vehicle][0])
+            self.assertLessEqual(m3[stops].sum(), vehicles[vehicle][1])
+            self.assertAlmostEqual(length, tour_length(dist, stops))
+        # Far better than serving every stop with its own round trip
+        total = sum(length for _, _, length in solution['routes'])
+        self.assertLess(total, 0.5 * 2 * dist[0, planned].sum())
+
+
+class RoutePlanningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        client = User.objects.create_user(username='client', password='pass', role='client')
+        for index in range(2):
+            user = User.objects.create_user(username=f'driver{index}', password='pass', role='driver')
+            Driver.objects.create(user=user, license_number=f'LIC-{index}')
+        Vehicle.objects.create(plate='AA-1', model='Truck', capacity_kg=1000)
+        Vehicle.objects.create(plate='AA-2', model='Van', capacity_kg=400, capacity_m3=5)
+        Vehicle.objects.create(plate='AA-3', model='Truck', capacity_kg=1000, status='Maintenance')
+        destinations = [
+            Destination.objects.create(name=f'D{index}', country='DZ', city='Oran', delivery_zone='West',
+                                       distance_km=50 * (index + 1), type='Regular')
+            for index in range(4)
+        ]
+        cls.shipments = [
+            Shipment.objects.create(client=client, destination=destinations[index % 4], weight_kg=100,
+                                    volume_m3=1, price=100)
+            for index in range(12)
+        ]
+
+    def test_plan_creates_routes_within_capacity(self):
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        date = datetime.date.today().isoformat()
+
+        response = api.post('/api/v1/routes/plan/', {'date': date, 'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Route.objects.exists())
+
+        response = api.post('/api/v1/routes/plan/', {'date': date, 'time_budget': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        routes = Route.objects.prefetch_related('shipments').select_related('vehicle')
+        self.assertEqual(len(routes), 2)
+        self.assertNotIn('AA-3', [route.vehicle.plate for route in routes])
+        planned = [shipment.id for route in routes for shipment in route.shipments.all()]
+        self.assertEqual(len(planned), len(set(planned)))
+        self.assertEqual(sorted(planned + response.data['unassigned_shipments']),
+                         sorted(shipment.id for shipment in self.shipments))
+        for route in routes:
+            self.assertLessEqual(sum(shipment.weight_kg for shipment in route.shipments.all()),
+                                 route.vehicle.capacity_kg)
+            self.assertEqual(set(route.stops), {shipment.destination_id for shipment in route.shipments.all()})
+
+        # Everything free is taken: nothing left to plan
+        response = api.post('/api/v1/routes/plan/', {'date': date}, format='json')
+        self.assertEqual(response.data['routes'], [])
+
+
+@override_settings(DISPATCH_ON_CREATE=True)
+class DispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        cls.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        driver = Driver.objects.create(user=User.objects.create_user(username='driver', password='pass',
+                                                                     role='driver'), license_number='LIC-1')
+        vehicle = Vehicle.objects.create(plate='AA-1', model='Van', capacity_kg=500)
+        # One corridor east of the hub, ~9 km between consecutive points
+        cls.points = [
+            Destination.objects.create(name=f'D{index}', country='DZ', city='Oran', delivery_zone='West',
+                                       distance_km=10 * (index + 1), type='Regular',
+                                       latitude=35.7, longitude=-0.6 + 0.1 * index)
+            for index in range(4)
+        ]
+        cls.far = Destination.objects.create(name='Far', country='DZ', city='Tamanrasset', delivery_zone='South',
+                                             distance_km=1900, type='Regular', latitude=22.8, longitude=5.5)
+        cls.route = Route.objects.create(driver=driver, vehicle=vehicle, date=datetime.date.today(),
+                                         stops=[cls.points[0].id, cls.points[2].id],
+                                         estimated_distance_km=60, estimated_duration_hours=1.5)
+        for point in (cls.points[0], cls.points[2]):
+            cls.route.shipments.add(Shipment.objects.create(client=cls.client_user, destination=point,
+                                                            weight_kg=100, volume_m3=1, price=100))
+
+    def create(self, user, destination, weight=50):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api.post('/api/v1/shipments/', {'destination': destination.id, 'weight': weight, 'volume': 1,
+                                               'price': '100.00', 'client': self.client_user.id}, format='json')
+
+    def test_new_shipment_is_inserted_into_a_nearby_route(self):
+        response = self.create(self.client_user, self.points[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['routeId'], self.route.id)
+        self.assertNotIn('dispatch', response.data)  # Clients do not see other routes
+        self.route.refresh_from_db()
+        self.assertEqual(self.route.stops, [self.points[0].id, self.points[1].id, self.points[2].id])
+        self.assertEqual(self.route.shipments.count(), 3)
+
+        # Full vehicle: nothing assigned, no feasible suggestion
+        response = self.create(self.manager, self.points[3], weight=300)
+        self.assertIsNone(response.data['routeId'])
+        self.assertEqual(response.data['dispatch'], {'assigned_route': None, 'suggestions': []})
+
+    @override_settings(DISPATCH_ON_CREATE=False)
+    def test_dispatch_on_create_is_opt_in(self):
+        response = self.create(self.manager, self.points[1])
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['routeId'])
+        self.assertNotIn('dispatch', response.data)
+        self.route.refresh_from_db()
+        self.assertEqual(self.route.stops, [self.points[0].id, self.points[2].id])
+
+    def test_far_shipments_get_suggestions_only(self):
+        response = self.create(self.manager, self.far)
+        self.assertIsNone(response.data['routeId'])
+        self.assertEqual(response.data['dispatch']['suggestions'], [])  # No route stops nearby
+
+        response = self.create(self.manager, self.points[3])
+        shipment_id = response.data['id']
+        self.assertEqual(response.data['dispatch']['assigned_route'], self.route.id)
+        self.route.refresh_from_db()
+        self.assertIn(self.points[3].id, self.route.stops)
+        self.assertAlmostEqual(self.route.estimated_distance_km, 60 + 20)  # Out to 40 km instead of 30
+
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        response = api.post(f'/api/v1/shipments/{shipment_id}/dispatch/', {'route': self.route.id}, format='json')
+        self.assertEqual(response.status_code, 409)  # Already on the route
+        with self.settings(DISPATCH_MAX_DETOUR_KM=0):
+            response = self.create(self.manager, self.points[2])  # Already a stop: no detour
+        self.assertEqual(response.data['dispatch']['suggestions'][0]['added_distance_km'], 0)
+        self.assertEqual(response.data['dispatch']['assigned_route'], self.route.id)
+
+        api.force_authenticate(self.client_user)
+        self.assertEqual(api.post(f'/api/v1/shipments/{shipment_id}/dispatch/', {}, format='json').status_code, 403)
+
+
+    def test_routes_edited_by_hand_keep_their_stops(self):
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        driver = Driver.objects.create(user=User.objects.create_user(username='driver2', role='driver'),
+                                       license_number='LIC-2')
+        vehicle = Vehicle.objects.create(plate='AA-2', model='Van', capacity_kg=500)
+        shipment = Shipment.objects.create(client=self.client_user, destination=self.points[3], weight_kg=10,
+                                           volume_m3=1, price=10)
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+        response = api.post('/api/v1/routes/', {'driver': driver.id, 'vehicle': vehicle.id, 'date': tomorrow,
+                                                'shipments': [shipment.id]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['stops'], [self.points[3].id])
+
+        # Stops left stale by an older client are reconciled when dispatching
+        Route.objects.filter(id=response.data['id']).update(stops=[])
+        shipment = Shipment(client=self.client_user, destination=self.points[3], weight_kg=10, volume_m3=1,
+                            estimated_delivery=timezone.now() + datetime.timedelta(days=1))
+        self.assertIn(response.data['id'], [route.id for route in candidate_routes(shipment)])
+
+        other = Shipment.objects.create(client=self.client_user, destination=self.points[1], weight_kg=10,
+                                        volume_m3=1, price=10)
+        response = api.patch(f"/api/v1/routes/{response.data['id']}/", {'shipments': [other.id]}, format='json')
+        self.assertEqual(response.data['stops'], [self.points[1].id])
+
+
+class LoadPlanningTests(TestCase):
+    def test_packing_respects_weight_and_volume(self):
+        rng = np.random.default_rng(11)
+        kg, m3 = rng.uniform(5, 800, 3000), rng.uniform(0.05, 6, 3000)
+        cap_kg = rng.choice([1500, 3500, 7500, 12000, 24000], 150).astype(float)
+        cap_m3 = np.where(rng.random(150) < 0.3, np.inf, cap_kg / 250)
+
+        started = time.monotonic()
+        loads, unassigned = pack_loads(kg, m3, cap_kg, cap_m3)
+        self.assertLess(time.monotonic() - started, 1)
+        packed = [item for items in loads.values() for item in items]
+        self.assertEqual(sorted(packed + unassigned), list(range(3000)))
+        for vehicle, items in loads.items():
+            self.assertLessEqual(kg[items].sum(), cap_kg[vehicle] + 1e-6)
+            self.assertLessEqual(m3[items].sum(), cap_m3[vehicle] + 1e-6)
+
+    def test_local_improvement_frees_vehicles(self):
+        # FFD alone opens both big vehicles; everything fits the 100 kg one
+        loads, unassigned = pack_loads([40, 30, 20], [0, 0, 0], [1000, 1000, 100], [np.inf] * 3)
+        self.assertEqual(unassigned, [])
+        self.assertEqual(loads, {2: [0, 1, 2]})
+        # Moving the 3 kg item to the other vehicle makes room for the unassigned 4 kg one
+        packing = _Packing(np.array([6.0, 3.0, 7.0, 4.0]), np.zeros(4), np.array([10.0, 10.0]),
+                           np.array([np.inf, np.inf]))
+        for item, vehicle in [(0, 0), (1, 0), (2, 1)]:
+            packing.put(item, vehicle)
+        unassigned = [3]
+        self.assertTrue(_swap_in(packing, unassigned, time.monotonic() + 1))
+        self.assertEqual(unassigned, [])
+        self.assertEqual(packing.items, [[0, 3], [2, 1]])
+
+
+class RouteCapacityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        client = User.objects.create_user(username='client', password='pass', role='client')
+        cls.driver = Driver.objects.create(user=User.objects.create_user(username='driver', password='pass',
+                                                                         role='driver'), license_number='LIC-1')
+        cls.small = Vehicle.objects.create(plate='AA-1', model='Van', capacity_kg=200, capacity_m3=2)
+        cls.large = Vehicle.objects.create(plate='AA-2', model='Truck', capacity_kg=1000)
+        destination = Destination.objects.create(name='D', country='DZ', city='Oran', delivery_zone='West',
+                                                 distance_km=50, type='Regular')
+        cls.shipments = [
+            Shipment.objects.create(client=client, destination=destination, weight_kg=weight, volume_m3=1.5,
+                                    price=100)
+            for weight in (150, 120, 90)
+        ]
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def test_route_create_and_update_are_validated(self):
+        payload = {'driver': self.driver.id, 'vehicle': self.small.id, 'date': datetime.date.today().isoformat(),
+                   'shipments': [self.shipments[0].id, self.shipments[1].id]}
+        response = self.api.post('/api/v1/routes/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('270 kg exceeds', response.data['shipments'][0])
+        self.assertIn('3 m3 exceeds', response.data['shipments'][1])
+
+        payload['shipments'] = [self.shipments[0].id]
+        response = self.api.post('/api/v1/routes/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        route_id = response.data['id']
+        response = self.api.patch(f'/api/v1/routes/{route_id}/', {'shipments': [s.id for s in self.shipments]},
+                                  format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.api.patch(f'/api/v1/routes/{route_id}/', {'vehicle': self.large.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.api.patch(f'/api/v1/routes/{route_id}/', {'shipments': [s.id for s in self.shipments]},
+                                  format='json')
+        self.assertEqual(response.status_code, 200)
+        # Back to the small vehicle with 360 kg on board
+        response = self.api.patch(f'/api/v1/routes/{route_id}/', {'vehicle': self.small.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_plan_loads_endpoint(self):
+        response = self.api.get('/api/v1/routes/loads/', {'date': datetime.date.today().isoformat()})
+        self.assertEqual(response.status_code, 200)
+        planned = [shipment for load in response.data['loads'] for shipment in load['shipments']]
+        self.assertEqual(sorted(planned + response.data['unassigned_shipments']),
+                         sorted(shipment.id for shipment in self.shipments))
+        self.assertEqual(response.data['unassigned_shipments'], [])
+        for load in response.data['loads']:
+            self.assertLessEqual(load['load_kg'], load['capacity_kg'])
+
+
+class AssignmentTests(TestCase):
+    def test_hungarian_matches_brute_force(self):
+        rng = np.random.default_rng(2)
+        for _ in range(100):
+            rows, columns = (int(size) for size in rng.integers(1, 6, 2))
+            cost = rng.integers(0, 20, (rows, columns)).astype(float)
+            picked_rows, picked_columns = linear_sum_assignment(cost)
+            self.assertEqual(len(picked_rows), min(rows, columns))
+            self.assertEqual(len(set(picked_columns.tolist())), len(picked_columns))
+            if rows <= columns:
+                best = min(sum(cost[row, perm[row]] for row in range(rows))
+                           for perm in itertools.permutations(range(columns), rows))
+            else:
+                best = min(sum(cost[perm[column], column] for column in range(columns))
+                           for perm in itertools.permutations(range(rows), columns))
+            self.assertAlmostEqual(cost[picked_rows, picked_columns].sum(), best)
+
+        cost = rng.random((300, 400))
+        started = time.monotonic()
+        linear_sum_assignment(cost)
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_assign_endpoint(self):
+        manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        drivers = [
+            Driver.objects.create(user=User.objects.create_user(username=f'driver{index}', password='pass',
+                                                                role='driver'),
+                                  license_number=f'LIC-{index}', status=status)
+            for index, status in enumerate(['Available', 'Off Duty', 'Available', 'Available'])
+        ]
+        small = Vehicle.objects.create(plate='AA-1', model='Van', capacity_kg=300)
+        large = Vehicle.objects.create(plate='AA-2', model='Truck', capacity_kg=2000)
+        Vehicle.objects.create(plate='AA-3', model='Truck', capacity_kg=5000, status='Maintenance')
+        client = User.objects.create_user(username='client', password='pass', role='client')
+        destination = Destination.objects.create(name='D', country='DZ', city='Oran', delivery_zone='West',
+                                                 distance_km=50, type='Regular')
+        today = datetime.date.today()
+        # Driver 0 drove a lot this week; driver 3 had an accident
+        Route.objects.create(driver=drivers[0], vehicle=small, date=today - datetime.timedelta(days=2),
+                             status='Completed', actual_duration_hours=40)
+        Incident.objects.create(type='Accident', description='Crash', date=today, driver=drivers[3])
+        # Heavy route on the small van with the tired driver, light one on the truck with the Off Duty driver
+        heavy = Route.objects.create(driver=drivers[0], vehicle=small, date=today, estimated_distance_km=400,
+                                     estimated_duration_hours=8)
+        light = Route.objects.create(driver=drivers[1], vehicle=large, date=today, estimated_distance_km=300,
+                                     estimated_duration_hours=6)
+        heavy.shipments.add(Shipment.objects.create(client=client, destination=destination, weight_kg=900,
+                                                    volume_m3=1, price=100))
+        light.shipments.add(Shipment.objects.create(client=client, destination=destination, weight_kg=100,
+                                                    volume_m3=1, price=100))
+
+        api = APIClient()
+        api.force_authenticate(manager)
+        response = api.post('/api/v1/routes/assign/', {'date': today.isoformat(), 'dry_run': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changed'], 2)
+        heavy.refresh_from_db()
+        self.assertEqual(heavy.vehicle, small)
+
+        response = api.post('/api/v1/routes/assign/', {'date': today.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        heavy.refresh_from_db()
+        light.refresh_from_db()
+        self.assertEqual((heavy.vehicle, light.vehicle), (large, small))
+        self.assertEqual({heavy.driver, light.driver}, {drivers[2], drivers[3]})
+        self.assertEqual(heavy.driver, drivers[2])  # The long route goes to the driver without incidents
+
+        # Stable when nothing changed
+        response = api.post('/api/v1/routes/assign/', {'date': today.isoformat()}, format='json')
+        self.assertEqual(response.data['changed'], 0)
+
+
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        cls.drivers = [
+            Driver.objects.create(user=User.objects.create_user(username=f'driver{index}', role='driver'),
+                                  license_number=f'LIC-{index}', status='Off Duty' if index == 7 else 'Available')
+            for index in range(20)
+        ]
+        cls.vehicles = [
+            Vehicle.objects.create(plate=f'AV-{index}', model='Van', capacity_kg=1000,
+                                   status='Maintenance' if index == 5 else 'Available')
+            for index in range(20)
+        ]
+        cls.shipment = Shipment.objects.create(client=cls.manager, weight_kg=10, volume_m3=0.1, price=10)
+        rng = np.random.default_rng(4)
+        cls.today = datetime.date.today()
+        Route.objects.bulk_create([
+            Route(driver=cls.drivers[int(rng.integers(20))], vehicle=cls.vehicles[int(rng.integers(20))],
+                  date=cls.today + datetime.timedelta(days=int(rng.integers(60))),
+                  estimated_duration_hours=float(rng.choice([2, 6, 10, 30, 50])) if index % 4 else None,
+                  status=['Planned', 'Active', 'Completed'][index % 3])
+            for index in range(400)
+        ])
+
+    def setUp(self):
+        availability_index.invalidate()
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def brute_force(self, start, end):
+        booked = {'driver': {}, 'vehicle': {}}
+        for route in Route.objects.filter(status__in=['Planned', 'Active']):
+            route_start, route_end = route_window(route.date, route.estimated_duration_hours)
+            if route_start < end and route_end > start:
+                booked['driver'].setdefault(route.driver_id, set()).add(route.id)
+                booked['vehicle'].setdefault(route.vehicle_id, set()).add(route.id)
+        return booked
+
+    def test_matches_a_linear_scan(self):
+        for offset in range(0, 62, 3):
+            start, end = route_window(self.today + datetime.timedelta(days=offset), 1 + offset % 20)
+            booked = self.brute_force(start, end)
+            free = availability_index.free(start, end)
+            self.assertEqual({row['id'] for row in free['drivers']},
+                             {driver.id for driver in self.drivers} - set(booked['driver']) - {self.drivers[7].id})
+            self.assertEqual({row['id'] for row in free['vehicles']},
+                             {vehicle.id for vehicle in self.vehicles} - set(booked['vehicle'])
+                             - {self.vehicles[5].id})
+            for driver, vehicle in zip(self.drivers[:6], self.vehicles[:6]):
+                found = availability_index.conflicts(start, end, driver=driver.id, vehicle=vehicle.id)
+                self.assertEqual({entry['route'] for entry in found if entry['resource'] == 'driver' and 'route' in entry},
+                                 booked['driver'].get(driver.id, set()))
+                self.assertEqual({entry['route'] for entry in found if entry['resource'] == 'vehicle' and 'route' in entry},
+                                 booked['vehicle'].get(vehicle.id, set()))
+                self.assertEqual(any(entry.get('status') == 'Maintenance' for entry in found), vehicle.id ==
+                                 self.vehicles[5].id)
+
+    def test_route_writes_reject_double_booking(self):
+        date = self.today + datetime.timedelta(days=400)
+        payload = {'driver': self.drivers[0].id, 'vehicle': self.vehicles[0].id, 'date': date.isoformat(),
+                   'estimated_duration_hours': 30, 'shipments': [self.shipment.id]}
+        response = self.api.post('/api/v1/routes/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        route_id = response.data['id']
+
+        # The first route runs into the next morning
+        payload.update(date=(date + datetime.timedelta(days=1)).isoformat(), estimated_duration_hours=4)
+        response = self.api.get('/api/v1/routes/conflicts/', {'date': payload['date'], 'driver': payload['driver'],
+                                                              'vehicle': self.vehicles[1].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(entry['resource'], entry['route']) for entry in response.data['conflicts']],
+                         [('driver', route_id)])
+        response = self.api.post('/api/v1/routes/', {**payload, 'vehicle': self.vehicles[1].id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f'route {route_id}', response.data['driver'][0])
+        response = self.api.post('/api/v1/routes/', {**payload, 'driver': self.drivers[1].id,
+                                                     'vehicle': self.vehicles[5].id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['vehicle'], ['The vehicle is Maintenance.'])
+
+        # Shortened, the first route frees the next day; the new route shows up in the index
+        response = self.api.patch(f'/api/v1/routes/{route_id}/', {'estimated_duration_hours': 8}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.api.get('/api/v1/routes/availability/', {'date': payload['date']})
+        self.assertIn(self.drivers[0].id, [row['id'] for row in response.data['drivers']])
+        response = self.api.post('/api/v1/routes/', {**payload, 'vehicle': self.vehicles[1].id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        response = self.api.get('/api/v1/routes/conflicts/', {'route': response.data['id']})
+        self.assertEqual(response.data['count'], 0)
+        response = self.api.get('/api/v1/routes/availability/', {'date': payload['date'], 'duration_hours': 2})
+        self.assertNotIn(self.drivers[0].id, [row['id'] for row in response.data['drivers']])
+        self.assertEqual(self.api.get('/api/v1/routes/conflicts/', {'date': payload['date']}).status_code, 400)
+
+
+class CompletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        client = User.objects.create_user(username='client', role='client')
+        cls.drivers = [
+            Driver.objects.create(user=User.objects.create_user(username=f'driver{index}', role='driver'),
+                                  license_number=f'LIC-{index}')
+            for index in range(2)
+        ]
+        destination = Destination.objects.create(name='D', country='DZ', city='Oran', delivery_zone='West',
+                                                 distance_km=50, type='Regular')
+        cls.routes = []
+        for index, size in enumerate((5, 40, 3)):
+            route = Route.objects.create(driver=cls.drivers[min(index, 1)], date=datetime.date(2026, 1, 1),
+                                         vehicle=Vehicle.objects.create(plate=f'CP-{index}', model='Van',
+                                                                        capacity_kg=5000))
+            shipments = Shipment.objects.bulk_create([
+                Shipment(client=client, destination=destination, weight_kg=1, volume_m3=0.1, price=10,
+                         status='In Transit')
+                for _ in range(size)
+            ])
+            ShipmentEvent.objects.bulk_create([
+                ShipmentEvent(shipment=shipment, status='In Transit', location='Algiers Hub')
+                for shipment in shipments
+            ])
+            route.shipments.set(shipments)
+            cls.routes.append(route)
+        cancelled = cls.routes[0].shipments.first()
+        cancelled.status = 'Cancelled'
+        cancelled.save()
+
+    def test_completion_is_set_based(self):
+        counts = []
+        for route in self.routes:
+            with CaptureQueriesContext(connection) as queries:
+                result = complete_routes({route.id: {'actual_distance_km': 120.5}})
+            counts.append(len(queries.captured_queries))
+            self.assertEqual(result['delivered_shipments'], route.shipments.exclude(status='Cancelled').count())
+        # 40 vs 3 shipments (the first completion also creates the Delivered rollup rows)
+        self.assertEqual(counts[1], counts[2])
+
+        route = self.routes[0]
+        route.refresh_from_db()
+        self.assertEqual((route.status, route.actual_distance_km), ('Completed', 120.5))
+        self.assertEqual(route.shipments.filter(status='Cancelled').count(), 1)
+        for shipment in route.shipments.filter(status='Delivered'):
+            events = list(shipment.events.all())
+            self.assertEqual([event.status for event in events], ['In Transit', 'Delivered'])
+            self.assertEqual(events[-1].location, 'Oran')
+
+        # Completing again only updates the metrics
+        self.assertEqual(complete_routes({route.id: {'fuel_consumed_liters': 30}})['delivered_shipments'], 0)
+        self.assertEqual(route.shipments.filter(status='Delivered').first().events.count(), 2)
+
+    def test_completion_keeps_stats_rollups_current(self):
+        today = datetime.date.today()
+        rebuild_rollups(today - datetime.timedelta(days=1), today + datetime.timedelta(days=1))  # Bulk-created rows
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        response = api.post('/api/v1/routes/complete/', {'routes': [{'id': self.routes[0].id}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        expected = {row['status']: row['count'] for row in Shipment.objects.values('status').annotate(count=Count('id'))}
+        self.assertEqual(expected, {'In Transit': 43, 'Delivered': 4, 'Cancelled': 1})
+        by_status = api.get('/api/v1/stats/').data['shipments']['by_status']
+        self.assertEqual({row['status']: row['count'] for row in by_status if row['count']}, expected)
+
+    def test_driver_and_bulk_endpoints(self):
+        api = APIClient()
+        api.force_authenticate(self.drivers[1].user)
+        first, second, third = self.routes
+        response = api.patch(f'/api/v1/routes/{second.id}/complete_delivery/',
+                             {'actual_duration_hours': 6.5, 'fuel_consumed_liters': 42}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'Completed')
+        self.assertEqual(response.data['fuel_consumed_liters'], 42)
+        self.assertEqual(ShipmentEvent.objects.filter(shipment__routes=second, status='Delivered').first().actor,
+                         self.drivers[1].user)
+        response = api.patch(f'/api/v1/routes/{third.id}/complete_delivery/', {'actual_distance_km': -1},
+                             format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # All or nothing: another driver's route makes the whole closeout fail
+        response = api.post('/api/v1/routes/complete/', {'routes': [{'id': third.id}, {'id': first.id}]},
+                            format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Route.objects.filter(status='Completed', id__in=[first.id, third.id]).exists())
+        self.assertFalse(third.shipments.filter(status='Delivered').exists())
+
+        api.force_authenticate(self.manager)
+        response = api.post('/api/v1/routes/complete/', {'routes': [{'id': third.id}, {'id': first.id}]},
+                            format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'routes': sorted([first.id, third.id]), 'delivered_shipments': 7})
+        self.assertEqual(Route.objects.filter(status='Completed').count(), 3)
+        response = api.post('/api/v1/routes/complete/', {'routes': [{'id': first.id}, {'id': first.id}]},
+                            format='json')
+        self.assertEqual(response.status_code, 400)
@@ -1,10 +1,20 @@
+from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Route
-from .serializers import RouteSerializer
+from .assignment import assign_routes, AssignmentError
+from .availability import availability_index, from_hours, route_window
+from .completion import complete_routes, CompletionError
+from .loading import plan_loads
+from .planning import plan_routes, PlanningError
+from .serializers import (
+    RouteSerializer, RoutePlanRequestSerializer, RouteLoadPlanQuerySerializer, RouteAssignRequestSerializer,
+    RouteAvailabilityQuerySerializer, RouteConflictQuerySerializer, RouteCompletionSerializer,
+    RouteBulkCompletionSerializer,
+)
 from users.permissions import IsManager, IsDriver, IsRouteDriver, DriverCanUpdateStatusOnly
-from users.audit import AuditLogMixin
+from users.audit import AuditLog, AuditLogMixin, get_client_ip
 
 class RouteViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
@@ -14,9 +24,10 @@ class RouteViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
+    cursor_ordering = ('-date', '-id')
     
     def get_permissions(self):
-        if self.action in ['create', 'destroy']:
+        if self.action in ['create', 'destroy', 'plan', 'loads', 'assign', 'availability', 'conflicts']:
             return [IsManager()]
         elif self.action in ['update', 'partial_update']:
             # Managers can update everything, Drivers can only update status
@@ -26,6 +37,9 @@ class RouteViewSet(AuditLogMixin, viewsets.ModelViewSet):
         return [IsDriver()]
     
     def get_queryset(self):
+        return RouteSerializer.setup_eager_loading(self._get_scoped_queryset())
+    
+    def _get_scoped_queryset(self):
         user = self.request.user
         
         if user.role in ['admin', 'manager']:
@@ -57,22 +71,154 @@ class RouteViewSet(AuditLogMixin, viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        route.status = 'Completed'
-        
-        if 'actual_distance_km' in request.data:
-            route.actual_distance_km = request.data['actual_distance_km']
-        if 'actual_duration_hours' in request.data:
-            route.actual_duration_hours = request.data['actual_duration_hours']
-        if 'fuel_consumed_liters' in request.data:
-            route.fuel_consumed_liters = request.data['fuel_consumed_liters']
-        
-        route.save()
-        
-        for shipment in route.shipments.all():
-            shipment.status = 'Delivered'
-            shipment.save()
-        
+        params = RouteCompletionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        complete_routes({route.id: params.validated_data}, actor=request.user)
+
         return Response(
-            RouteSerializer(route).data,
+            RouteSerializer(self.get_queryset().get(pk=route.pk)).data,
             status=status.HTTP_200_OK
         )
+
+    @action(detail=False, methods=['post'])
+    def complete(self, request):
+        """
+        End-of-day closeout: complete several routes and deliver their
+        shipments in one transaction (see routes/completion.py). Drivers may
+        only close their own routes.
+        Body: {"routes": [{"id", "actual_distance_km", "actual_duration_hours", "fuel_consumed_liters"}]}
+        """
+        params = RouteBulkCompletionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        completions = {
+            item['id']: {field: value for field, value in item.items() if field != 'id'}
+            for item in params.validated_data['routes']
+        }
+        visible = set(self._get_scoped_queryset().filter(id__in=completions).values_list('id', flat=True))
+        missing = sorted(set(completions) - visible)
+        if missing:
+            return Response({'detail': f'Routes not found: {", ".join(map(str, missing))}.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        try:
+            result = complete_routes(completions, actor=request.user)
+        except CompletionError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_404_NOT_FOUND)
+
+        AuditLog.log(
+            action='resource_updated',
+            user=request.user,
+            resource_type='Route',
+            resource_id=str(timezone.localdate()),
+            ip_address=get_client_ip(request),
+            severity='low',
+            completed_routes=result['routes'],
+            delivered_shipments=result['delivered_shipments'],
+        )
+        return Response(result)
+
+    @action(detail=False, methods=['post'])
+    def plan(self, request):
+        """
+        Plan the routes of a day from pending shipments and free vehicles /
+        drivers (savings construction + 2-opt/or-opt, within time_budget
+        seconds). Body: {"date", "time_budget", "dry_run"}. Unless dry_run,
+        the routes are created as Planned.
+        """
+        params = RoutePlanRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        try:
+            plan = plan_routes(data['date'], time_budget=data.get('time_budget'), commit=not data['dry_run'])
+        except PlanningError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        if not data['dry_run'] and plan['routes']:
+            AuditLog.log(
+                action='resource_created',
+                user=request.user,
+                resource_type='Route',
+                resource_id=str(data['date']),
+                ip_address=get_client_ip(request),
+                severity='low',
+                planned_routes=[route['id'] for route in plan['routes']],
+                shipments=sum(len(route['shipments']) for route in plan['routes']),
+            )
+        return Response(plan, status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def loads(self, request):
+        """
+        Pack the day's pending shipments into the free vehicles by weight and
+        volume (first-fit decreasing + local improvement). Read-only plan.
+        GET /routes/loads/?date=YYYY-MM-DD[&time_budget=1.0]
+        """
+        params = RouteLoadPlanQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        date = params.validated_data.get('date') or timezone.localdate()
+        return Response(plan_loads(date, time_budget=params.validated_data['time_budget']))
+
+    @action(detail=False, methods=['post'])
+    def assign(self, request):
+        """
+        Re-pair the day's Planned routes with drivers and vehicles at minimum
+        cost (capacity fit, status, recent workload and incidents), applied in
+        one transaction. Body: {"date", "dry_run"}.
+        """
+        params = RouteAssignRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        try:
+            plan = assign_routes(data['date'], commit=not data['dry_run'])
+        except AssignmentError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+        if not data['dry_run'] and plan['changed']:
+            AuditLog.log(
+                action='resource_updated',
+                user=request.user,
+                resource_type='Route',
+                resource_id=str(data['date']),
+                ip_address=get_client_ip(request),
+                severity='low',
+                reassigned_routes=[entry['route'] for entry in plan['assignments'] if entry['changed']],
+            )
+        return Response(plan)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """
+        Drivers and vehicles neither booked on an open route nor Off Duty /
+        in Maintenance during a route's window, for the route form.
+        GET /routes/availability/?date=YYYY-MM-DD[&duration_hours=8]
+        """
+        params = RouteAvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = route_window(params.validated_data['date'], params.validated_data.get('duration_hours'))
+        free = availability_index.free(start, end)
+        return Response({'window': {'start': from_hours(start), 'end': from_hours(end)}, **free})
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        Bookings and status blocks clashing with an existing route, or with a
+        proposed one before it is created.
+        GET /routes/conflicts/?route=ID
+        GET /routes/conflicts/?date=YYYY-MM-DD[&duration_hours=8]&driver=ID&vehicle=ID
+        """
+        params = RouteConflictQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+        if 'route' in data:
+            route = Route.objects.filter(pk=data['route']).first()
+            if route is None:
+                return Response({'detail': 'Route not found.'}, status=status.HTTP_404_NOT_FOUND)
+            start, end = route_window(route.date, route.estimated_duration_hours)
+            found = availability_index.route_conflicts(route)
+        else:
+            start, end = route_window(data['date'], data.get('duration_hours'))
+            found = availability_index.conflicts(start, end, driver=data.get('driver'), vehicle=data.get('vehicle'))
+        return Response({
+            'window': {'start': from_hours(start), 'end': from_hours(end)},
+            'count': len(found),
+            'conflicts': found,
+        })
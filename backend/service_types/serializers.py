@@ -1,5 +1,8 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import ServiceType
+from destinations.models import Destination
+from pricing.rules import materialize_pricing_rules
 
 class ServiceTypeSerializer(serializers.ModelSerializer):
     basePrice = serializers.DecimalField(source='base_price', max_digits=10, decimal_places=2, required=False)
@@ -22,7 +25,12 @@ class ServiceTypeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.setdefault('base_price', 0)
         validated_data.setdefault('estimated_delivery_time', '')
-        return ServiceType.objects.create(**validated_data)
+        with transaction.atomic():
+            service_type = ServiceType.objects.create(**validated_data)
+            # Default pricing rules for all active destinations
+            if service_type.is_active:
+                materialize_pricing_rules([service_type], Destination.objects.filter(is_active=True))
+        return service_type
     
     def update(self, instance, validated_data):
         # Allow partial updates
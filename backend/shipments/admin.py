@@ -1,5 +1,18 @@
 from django.contrib import admin
-from .models import Shipment
+from .events import record_events, status_event
+from .models import Shipment, ShipmentEvent
+
+
+class ShipmentEventInline(admin.TabularInline):
+    model = ShipmentEvent
+    fields = ('timestamp', 'status', 'location', 'note', 'actor')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False  # Events are appended by status changes
+
 
 @admin.register(Shipment)
 class ShipmentAdmin(admin.ModelAdmin):
@@ -7,3 +20,18 @@ class ShipmentAdmin(admin.ModelAdmin):
     list_filter = ('status', 'created_at')
     search_fields = ('client__username', 'id')
     readonly_fields = ('created_at',)
+    inlines = [ShipmentEventInline]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or 'status' in form.changed_data:
+            record_events([status_event(obj, actor=request.user, note='Changed in admin')])
+
+
+@admin.register(ShipmentEvent)
+class ShipmentEventAdmin(admin.ModelAdmin):
+    list_display = ('shipment', 'status', 'timestamp', 'location', 'actor')
+    list_filter = ('status', 'timestamp')
+    search_fields = ('shipment__id', 'location', 'note')
+    raw_id_fields = ('shipment', 'actor')
+    date_hierarchy = 'timestamp'
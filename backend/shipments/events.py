@@ -0,0 +1,42 @@
+"""
+Shipment tracking events (append-only, see ShipmentEvent). Writers add one
+row per status change instead of rewriting a history array; readers query
+the table, e.g. every shipment delayed in Oran last week:
+
+    ShipmentEvent.objects.filter(status='Delayed', timestamp__gte=since,
+                                 shipment__destination__city='Oran')
+"""
+from django.utils import timezone
+
+from .models import ShipmentEvent
+
+EVENT_BATCH_SIZE = 1000
+
+
+def status_event(shipment, actor=None, location='', note='', timestamp=None):
+    """Unsaved event recording the shipment's current status"""
+    return ShipmentEvent(
+        shipment_id=shipment.pk,
+        status=shipment.status,
+        timestamp=timestamp or timezone.now(),
+        actor=actor if getattr(actor, 'is_authenticated', False) else None,
+        location=location or '',
+        note=note or '',
+    )
+
+
+def record_events(events):
+    """Insert events in batches; returns them"""
+    return ShipmentEvent.objects.bulk_create(events, batch_size=EVENT_BATCH_SIZE)
+
+
+def history_entry(event):
+    """An event in the shape of the former `history` JSON entries (plus timestamp and actor)"""
+    return {
+        'date': timezone.localtime(event.timestamp).date().isoformat(),
+        'timestamp': event.timestamp,
+        'status': event.status,
+        'location': event.location,
+        'description': event.note,
+        'actor': event.actor.username if event.actor_id else None,
+    }
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_types', '0002_servicetype_additional_fees_and_more'),
+        ('shipments', '0003_alter_shipment_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shipment',
+            name='service_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shipments', to='service_types.servicetype'),
+        ),
+    ]
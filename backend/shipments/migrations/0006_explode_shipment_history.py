@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+from datetime import datetime, time
+
+from django.db import migrations
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+CHUNK_SIZE = 2000
+
+
+def event_time(value, previous):
+    """
+    Timestamp of a history entry's 'date' (ISO date or datetime). Never
+    before the previous entry (the shipment's creation for the first one),
+    so the events keep the array's order; undated entries get `previous`.
+    """
+    moment = None
+    if isinstance(value, str):
+        try:
+            moment = parse_datetime(value)
+            if moment is None and parse_date(value) is not None:
+                moment = datetime.combine(parse_date(value), time.min)
+        except ValueError:
+            moment = None
+    if moment is None:
+        return previous
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return max(moment, previous)
+
+
+def explode_history(apps, schema_editor):
+    """One ShipmentEvent per history entry, CHUNK_SIZE shipments at a time"""
+    Shipment = apps.get_model('shipments', 'Shipment')
+    ShipmentEvent = apps.get_model('shipments', 'ShipmentEvent')
+    statuses = {status for status, _ in Shipment._meta.get_field('status').choices}
+    last_id = 0
+    while True:
+        chunk = list(
+            Shipment.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'history', 'created_at', 'status')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        events = []
+        for shipment_id, history, created_at, current_status in chunk:
+            timestamp = created_at
+            for entry in history if isinstance(history, list) else []:
+                if not isinstance(entry, dict):
+                    continue
+                status = entry.get('status')
+                timestamp = event_time(entry.get('date'), timestamp)
+                events.append(ShipmentEvent(
+                    shipment_id=shipment_id,
+                    status=status if status in statuses else current_status,
+                    timestamp=timestamp,
+                    location=str(entry.get('location') or '')[:255],
+                    note=str(entry.get('description') or ''),
+                ))
+        ShipmentEvent.objects.bulk_create(events, batch_size=CHUNK_SIZE)
+        last_id = chunk[-1][0]
+
+
+def rebuild_history(apps, schema_editor):
+    """Reverse: write the events back into the history arrays"""
+    Shipment = apps.get_model('shipments', 'Shipment')
+    ShipmentEvent = apps.get_model('shipments', 'ShipmentEvent')
+    last_id = 0
+    while True:
+        ids = list(Shipment.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            break
+        history = {shipment_id: [] for shipment_id in ids}
+        events = ShipmentEvent.objects.filter(shipment_id__in=ids).order_by('shipment_id', 'timestamp', 'id')
+        for shipment_id, status, timestamp, location, note in events.values_list(
+            'shipment_id', 'status', 'timestamp', 'location', 'note'
+        ):
+            history[shipment_id].append({
+                'date': timezone.localtime(timestamp).date().isoformat(),
+                'status': status,
+                'location': location,
+                'description': note,
+            })
+        Shipment.objects.bulk_update(
+            [Shipment(id=shipment_id, history=entries) for shipment_id, entries in history.items()],
+            ['history'], batch_size=CHUNK_SIZE,
+        )
+        ShipmentEvent.objects.filter(shipment_id__in=ids).delete()
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipments', '0005_shipmentevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(explode_history, rebuild_history),
+    ]
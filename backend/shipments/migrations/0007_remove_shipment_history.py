@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from the data migration: PostgreSQL refuses to alter a table
+    # with pending deferred foreign key checks in the same transaction
+
+    dependencies = [
+        ('shipments', '0006_explode_shipment_history'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='shipment',
+            name='history',
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Shipment(models.Model):
     STATUS_CHOICES = (
@@ -12,15 +13,34 @@ class Shipment(models.Model):
     
     client = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='shipments')
     destination = models.ForeignKey('destinations.Destination', on_delete=models.SET_NULL, null=True)
+    service_type = models.ForeignKey('service_types.ServiceType', on_delete=models.SET_NULL, null=True, blank=True, related_name='shipments')
     weight_kg = models.FloatField()
     volume_m3 = models.FloatField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     estimated_delivery = models.DateTimeField(null=True, blank=True)
     
-    # Store history as JSON for simplicity
-    history = models.JSONField(default=list, blank=True)
-    
     def __str__(self):
         return f"Shipment {self.id} - {self.client.username}"
+
+
+class ShipmentEvent(models.Model):
+    """Append-only tracking history: one row per status change of a shipment"""
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name='events')
+    status = models.CharField(max_length=20, choices=Shipment.STATUS_CHOICES)
+    timestamp = models.DateTimeField(default=timezone.now)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='shipment_events')
+    location = models.CharField(max_length=255, blank=True)
+    note = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('timestamp', 'id')
+        indexes = [
+            models.Index(fields=['shipment', 'timestamp'], name='shipment_event_timeline'),
+            models.Index(fields=['status', 'timestamp'], name='shipment_event_status'),
+        ]
+
+    def __str__(self):
+        return f"Shipment {self.shipment_id} - {self.status} at {self.timestamp:%Y-%m-%d %H:%M}"
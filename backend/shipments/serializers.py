@@ -1,5 +1,7 @@
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
-from .models import Shipment
+from .events import history_entry
+from .models import Shipment, ShipmentEvent
 from users.serializers import UserSerializer
 from destinations.serializers import DestinationSerializer
 
@@ -12,22 +14,62 @@ class ShipmentSerializer(serializers.ModelSerializer):
     volume = serializers.FloatField(source='volume_m3')
     routeId = serializers.SerializerMethodField()
     isLocked = serializers.SerializerMethodField()
+    # Compatibility view of the ShipmentEvent rows; only present when prefetched (detail views)
+    history = serializers.SerializerMethodField()
+    
+    @staticmethod
+    def setup_eager_loading(queryset, with_history=False):
+        """
+        Preload everything this serializer reads so a list costs a fixed
+        number of queries: nested client/destination are joined and the
+        first route ID is computed as a correlated subquery. `with_history`
+        adds one query prefetching the tracking events.
+        """
+        first_route = (
+            Shipment.routes.through.objects
+            .filter(shipment_id=OuterRef('pk'))
+            .order_by('route_id')
+            .values('route_id')[:1]
+        )
+        queryset = queryset.select_related('client', 'destination').annotate(first_route_id=Subquery(first_route))
+        if with_history:
+            events = ShipmentEvent.objects.select_related('actor').order_by('timestamp', 'id')
+            queryset = queryset.prefetch_related(Prefetch('events', queryset=events, to_attr='history_events'))
+        return queryset
+    
+    def _first_route_id(self, obj):
+        if hasattr(obj, 'first_route_id'):
+            return obj.first_route_id
+        # Not loaded through setup_eager_loading (e.g. freshly created instance)
+        return obj.routes.order_by('id').values_list('id', flat=True).first()
     
     def get_routeId(self, obj):
         # Get the first route ID if shipment is assigned to any route
-        routes = obj.routes.all()
-        if routes.exists():
-            return routes.first().id
-        return None
+        return self._first_route_id(obj)
     
     def get_isLocked(self, obj):
         # Shipment is locked if it's assigned to any route
-        return obj.routes.exists()
+        return self._first_route_id(obj) is not None
+
+    def get_history(self, obj):
+        return [history_entry(event) for event in obj.history_events]
+
+    def to_representation(self, instance):
+        if not hasattr(instance, 'history_events'):
+            # Lists skip the history rather than query it per row
+            self.fields.pop('history', None)
+        return super().to_representation(instance)
     
     class Meta:
         model = Shipment
         fields = (
-            'id', 'client', 'client_details', 'destination', 'destination_details', 
+            'id', 'client', 'client_details', 'destination', 'destination_details', 'service_type',
             'weight', 'volume', 'price', 'status', 'dateCreated', 
             'estimatedDelivery', 'history', 'routeId', 'isLocked'
         )
+
+
+class ShipmentDispatchSerializer(serializers.Serializer):
+    """Body of POST /shipments/<id>/dispatch/: suggest only, auto-assign, or assign to a suggested route"""
+    auto_assign = serializers.BooleanField(default=False)
+    route = serializers.IntegerField(required=False)
@@ -0,0 +1,117 @@
+import datetime
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from destinations.models import Destination
+from shipments.models import Shipment, ShipmentEvent
+from users.models import User
+
+
+class ShipmentEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        cls.client_user = User.objects.create_user(username='client', password='pass', role='client')
+        cls.destination = Destination.objects.create(name='D', country='DZ', city='Oran', delivery_zone='West',
+                                                     distance_km=50, type='Regular')
+
+    def setUp(self):
+        self.api = APIClient()
+
+    def test_status_changes_append_events(self):
+        self.api.force_authenticate(self.client_user)
+        response = self.api.post('/api/v1/shipments/', {
+            'client': self.client_user.id, 'destination': self.destination.id, 'weight': 5, 'volume': 0.1,
+            'price': '100.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('history', response.data)
+        shipment_id = response.data['id']
+
+        self.api.force_authenticate(self.manager)
+        for payload in ({'status': 'In Transit'}, {'price': '120.00'}, {'status': 'Delayed'}):
+            self.assertEqual(self.api.patch(f'/api/v1/shipments/{shipment_id}/', payload, format='json').status_code,
+                             200)
+        events = list(ShipmentEvent.objects.filter(shipment_id=shipment_id))
+        self.assertEqual([event.status for event in events], ['Pending', 'In Transit', 'Delayed'])
+        self.assertEqual([event.actor for event in events], [self.client_user, self.manager, self.manager])
+
+        # Indexed queries: delayed in Oran this week
+        week_ago = timezone.now() - datetime.timedelta(days=7)
+        delayed = ShipmentEvent.objects.filter(status='Delayed', timestamp__gte=week_ago,
+                                               shipment__destination__city='Oran')
+        self.assertEqual([event.shipment_id for event in delayed], [shipment_id])
+
+    def test_history_only_on_detail_views(self):
+        shipments = Shipment.objects.bulk_create([
+            Shipment(client=self.client_user, destination=self.destination, weight_kg=1, volume_m3=0.1, price=10)
+            for _ in range(5)
+        ])
+        now = timezone.now()
+        ShipmentEvent.objects.bulk_create([
+            ShipmentEvent(shipment=shipment, status=status, timestamp=now + datetime.timedelta(hours=hour),
+                          location='Algiers Hub', actor=self.manager if hour else None)
+            for shipment in shipments for hour, status in enumerate(['Pending', 'In Transit'])
+        ])
+        self.api.force_authenticate(self.client_user)
+        response = self.api.get('/api/v1/shipments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('history' not in row for row in response.data))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(f'/api/v1/shipments/{shipments[0].id}/')
+        self.assertEqual([entry['status'] for entry in response.data['history']], ['Pending', 'In Transit'])
+        self.assertEqual(response.data['history'][1]['actor'], 'manager')
+        self.assertEqual(response.data['history'][0]['location'], 'Algiers Hub')
+        # One prefetch query, actors joined
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if 'shipments_shipmentevent' in query['sql']]), 1)
+
+
+class ShipmentHistoryMigrationTests(TransactionTestCase):
+    before = [('shipments', '0005_shipmentevent')]
+    after = [('shipments', '0007_remove_shipment_history')]
+
+    def tearDown(self):
+        MigrationExecutor(connection).loader.build_graph()
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_history_arrays_are_exploded_and_restored(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        OldUser = apps.get_model('users', 'User')
+        OldShipment = apps.get_model('shipments', 'Shipment')
+        client = OldUser.objects.create(username='client', role='client')
+        created_at = timezone.make_aware(datetime.datetime(2026, 3, 1, 15, 30))
+        shipment = OldShipment.objects.create(client=client, weight_kg=1, volume_m3=1, price=10, history=[
+            {'date': '2026-03-01', 'status': 'Pending', 'location': 'Algiers Hub', 'description': 'Created'},
+            {'date': '2026-03-02T09:00:00Z', 'status': 'In Transit', 'location': 'Blida'},
+            {'status': 'Lost'},
+        ])
+        OldShipment.objects.filter(id=shipment.id).update(created_at=created_at)
+        OldShipment.objects.create(client=client, weight_kg=1, volume_m3=1, price=10, history=[])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        events = list(ShipmentEvent.objects.filter(shipment_id=shipment.id))
+        # Unknown statuses fall back to the shipment's; undated entries keep their place
+        self.assertEqual([event.status for event in events], ['Pending', 'In Transit', 'Pending'])
+        self.assertEqual(events[0].timestamp, created_at)  # Date-only entry on the creation day
+        self.assertEqual(events[1].timestamp, datetime.datetime(2026, 3, 2, 9, tzinfo=datetime.timezone.utc))
+        self.assertEqual(events[2].timestamp, events[1].timestamp)
+        self.assertEqual((events[0].location, events[0].note), ('Algiers Hub', 'Created'))
+        self.assertEqual(ShipmentEvent.objects.count(), 3)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        history = apps.get_model('shipments', 'Shipment').objects.get(id=shipment.id).history
+        self.assertEqual([entry['status'] for entry in history], ['Pending', 'In Transit', 'Pending'])
+        self.assertEqual(history[1]['date'], '2026-03-02')
@@ -1,11 +1,16 @@
+from django.conf import settings
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .events import record_events, status_event
 from .models import Shipment
-from .serializers import ShipmentSerializer
+from .serializers import ShipmentSerializer, ShipmentDispatchSerializer
+from routes.dispatch import dispatch_shipment, insertion_options, assign_to_route, DispatchError
 from users.permissions import (
     IsManager, IsClient, IsShipmentOwner, 
     ClientCanCreateOnly, IsManagerOrShipmentOwner
 )
-from users.audit import AuditLogMixin
+from users.audit import AuditLog, AuditLogMixin, get_client_ip
 
 class ShipmentViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
@@ -16,15 +21,23 @@ class ShipmentViewSet(AuditLogMixin, viewsets.ModelViewSet):
     """
     queryset = Shipment.objects.all()
     serializer_class = ShipmentSerializer
+    cursor_ordering = ('-created_at', '-id')
     
     def get_permissions(self):
         if self.action == 'create':
             return [ClientCanCreateOnly()]
+        elif self.action == 'dispatch_to_route':
+            return [IsManager()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [IsManagerOrShipmentOwner()]
         return [IsClient()]
     
     def get_queryset(self):
+        return ShipmentSerializer.setup_eager_loading(
+            self._get_scoped_queryset(), with_history=self.action == 'retrieve'
+        )
+    
+    def _get_scoped_queryset(self):
         user = self.request.user
         
         if user.role in ['admin', 'manager']:
@@ -47,3 +60,72 @@ class ShipmentViewSet(AuditLogMixin, viewsets.ModelViewSet):
                 request,
                 message="Access denied."
             )
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        record_events([status_event(serializer.instance, actor=self.request.user, note='Shipment created')])
+
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        super().perform_update(serializer)
+        if serializer.instance.status != previous_status:
+            record_events([status_event(serializer.instance, actor=self.request.user)])
+
+    def create(self, request, *args, **kwargs):
+        """
+        Create, then insert the shipment into a nearby Planned route when the
+        detour is small (live dispatch). Managers also get the ranked options.
+        """
+        response = super().create(request, *args, **kwargs)
+        if not settings.DISPATCH_ON_CREATE:
+            return response
+        shipment = Shipment.objects.select_related('destination').get(id=response.data['id'])
+        result = dispatch_shipment(shipment)
+        if result['assigned_route']:
+            self._log_dispatch(request, shipment, result['assigned_route'], automatic=True)
+            response.data['routeId'] = result['assigned_route']
+            response.data['isLocked'] = True
+        if request.user.role in ['admin', 'manager']:
+            response.data['dispatch'] = result
+        return response
+
+    @action(detail=True, methods=['post'], url_path='dispatch')
+    def dispatch_to_route(self, request, pk=None):
+        """
+        Cheapest feasible insertions of a Pending shipment into Planned routes.
+        Body: {"auto_assign": false, "route": <id>}. Without auto_assign or
+        route only the suggestions are returned; `route` assigns to that
+        suggestion, auto_assign to the best one within DISPATCH_MAX_DETOUR_KM.
+        """
+        shipment = self.get_object()
+        params = ShipmentDispatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        route_id = params.validated_data.get('route')
+        if route_id is None:
+            result = dispatch_shipment(shipment, auto_assign=params.validated_data['auto_assign'])
+            if result['assigned_route']:
+                self._log_dispatch(request, shipment, result['assigned_route'], automatic=True)
+            return Response(result)
+
+        option = next((option for option in insertion_options(shipment) if option['route'] == route_id), None)
+        if shipment.status != 'Pending' or option is None:
+            return Response({'detail': 'The shipment cannot be inserted into this route.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            assign_to_route(shipment, option)
+        except DispatchError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        self._log_dispatch(request, shipment, route_id, automatic=False)
+        return Response({'assigned_route': route_id, 'suggestions': [option]})
+
+    def _log_dispatch(self, request, shipment, route_id, automatic):
+        AuditLog.log(
+            action='resource_updated',
+            user=request.user,
+            resource_type='Route',
+            resource_id=str(route_id),
+            ip_address=get_client_ip(request),
+            severity='low',
+            added_shipment=shipment.id,
+            automatic=automatic,
+        )
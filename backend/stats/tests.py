@@ -0,0 +1,80 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from billing.models import Invoice, PaymentRecord
+from destinations.models import Destination
+from drivers.models import Driver
+from routes.models import Route
+from shipments.models import Shipment
+from users.models import User
+from vehicles.models import Vehicle
+
+API_PREFIX = '/api/v1/stats/'
+
+
+class StatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        cls.client_a = User.objects.create_user(username='client_a', password='pass', role='client')
+        cls.client_b = User.objects.create_user(username='client_b', password='pass', role='client')
+        driver_user = User.objects.create_user(username='driver', password='pass', role='driver')
+        cls.driver = Driver.objects.create(user=driver_user, license_number='LIC-1')
+        vehicle = Vehicle.objects.create(plate='AA-1', model='Truck', capacity_kg=1000)
+        destination = Destination.objects.create(name='Oran', country='DZ', city='Oran', delivery_zone='West', distance_km=400, type='Regular')
+
+        shipments = [
+            Shipment.objects.create(client=client, destination=destination, weight_kg=10, volume_m3=1,
+                                    price=Decimal('100.00'), status=status)
+            for client, status in [(cls.client_a, 'Pending'), (cls.client_a, 'Delivered'), (cls.client_b, 'Pending')]
+        ]
+        # The same shipment on two routes must still count once for the driver
+        for day in (1, 2):
+            route = Route.objects.create(driver=cls.driver, vehicle=vehicle, date=datetime.date(2025, 3, day))
+            route.shipments.set(shipments[:2])
+
+        for client, paid, day in [(cls.client_a, Decimal('0'), 3), (cls.client_a, Decimal('40'), 20), (cls.client_b, Decimal('120'), 5)]:
+            invoice = Invoice.objects.create(client=client, amount_ht=Decimal('100'), tva=Decimal('20'),
+                                             amount_ttc=Decimal('120'), paid_amount=paid,
+                                             date=datetime.date(2025, 3, day),
+                                             status='Paid' if paid == 120 else 'Partial' if paid else 'Unpaid')
+            if paid:
+                PaymentRecord.objects.create(invoice=invoice, amount=paid, date=datetime.date(2025, 4, 1), method='Cash')
+
+    def get(self, user, path=''):
+        api = APIClient()
+        api.force_authenticate(user)
+        return api.get(API_PREFIX + path)
+
+    def test_overview_is_scoped_by_role(self):
+        data = self.get(self.manager).data
+        self.assertEqual(data['shipments']['total'], 3)
+        self.assertEqual(data['billing']['outstanding'], Decimal('200'))
+
+        data = self.get(self.client_a).data
+        self.assertEqual(data['shipments']['by_status'], [{'status': 'Delivered', 'count': 1}, {'status': 'Pending', 'count': 1}])
+        self.assertNotIn('billing', data)
+
+        self.assertEqual(self.get(self.driver.user).data['shipments']['total'], 2)
+
+    def test_revenue_by_period_and_unpaid_balances(self):
+        data = self.get(self.manager, 'revenue/?period=month').data
+        self.assertEqual([(row['period'], row['amount_ttc']) for row in data['invoiced']], [('2025-03-01', Decimal('360'))])
+        self.assertEqual(data['received'][0]['received'], Decimal('160'))
+
+        data = self.get(self.manager, 'unpaid/').data
+        self.assertEqual(data['total_balance'], Decimal('200'))
+        self.assertEqual([(row['client_id'], row['invoices']) for row in data['clients']], [(self.client_a.id, 2)])
+
+        self.assertEqual(self.get(self.client_a, 'unpaid/').status_code, 403)
+        self.assertEqual(self.get(self.manager, 'revenue/?period=year').status_code, 400)
+        for query in ('start=2026-02-30', 'end=2026-13-01', 'start=March'):
+            self.assertEqual(self.get(self.manager, f'revenue/?{query}').status_code, 400, query)
+
+    def test_routes_per_driver(self):
+        data = self.get(self.manager, 'routes-per-driver/?start=2025-03-02').data
+        self.assertEqual(data, [{'driver_id': self.driver.id, 'name': 'driver', 'routes': 1, 'planned': 1,
+                                 'active': 0, 'completed': 0, 'shipments': 2}])
@@ -0,0 +1,242 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DateTimeField, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_date
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from analytics.models import ShipmentDailyRollup, ShipmentDailyTotal, BillingDailyTotal
+from billing.views import InvoiceViewSet
+from routes.views import RouteViewSet
+from shipments.models import Shipment
+from shipments.views import ShipmentViewSet
+from users.permissions import IsAuthenticated, IsManager, IsDriver
+
+PERIODS = {'month': TruncMonth, 'day': TruncDay}
+
+BALANCE = ExpressionWrapper(F('amount_ttc') - F('paid_amount'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class StatsViewSet(viewsets.ViewSet):
+    """
+    Dashboard aggregates computed in the database.
+    Shipment volumes and revenue are read from the daily rollup tables
+    (analytics app): a few hundred rows instead of the fact tables. Anything
+    else is built from the same role-scoped querysets the resource endpoints
+    use, so a role only ever counts rows it could list itself.
+
+    - LIST: overview (shipments by status, plus billing totals for managers)
+    - shipments/: counts, weight and value by status and by period
+    - revenue/: invoiced and received amounts by period (managers)
+    - unpaid/: outstanding balance per client (managers)
+    - routes-per-driver/: route and shipment counts per driver
+    Optional query params: period=month|day, start / end (YYYY-MM-DD).
+    """
+
+    def get_permissions(self):
+        if self.action in ['revenue', 'unpaid']:
+            return [IsManager()]
+        if self.action == 'routes_per_driver':
+            return [IsDriver()]
+        return [IsAuthenticated()]
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+    def list(self, request):
+        by_status = self._by_status()
+        data = {'shipments': {
+            'total': sum(row['count'] for row in by_status),
+            'by_status': by_status,
+        }}
+        if IsManager().has_permission(request, self):
+            data['billing'] = self._invoices().aggregate(
+                invoices=Count('id'),
+                invoiced=Sum('amount_ttc', default=0),
+                paid=Sum('paid_amount', default=0),
+                outstanding=Sum(BALANCE, filter=~Q(status='Paid'), default=0),
+            )
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def shipments(self, request):
+        rollups = self._shipment_rollups()
+        if rollups is not None:
+            by_period = (
+                rollups
+                .annotate(period=self._trunc('day'))
+                .values('period')
+                .annotate(count=Sum('shipments'), weight_kg=Sum('weight_kg'), volume_m3=Sum('volume_m3'), value=Sum('value'))
+                .filter(count__gt=0)
+                .order_by('period')
+            )
+        else:
+            by_period = (
+                self._filter_dates(self._shipments, 'created_at')
+                .annotate(period=self._trunc('created_at'))
+                .values('period')
+                .annotate(count=Count('id'), weight_kg=Sum('weight_kg'), volume_m3=Sum('volume_m3'), value=Sum('price'))
+                .order_by('period')
+            )
+        return Response({
+            'by_status': self._by_status(),
+            'by_period': [self._with_date(row) for row in by_period],
+        })
+
+    @action(detail=False, methods=['get'])
+    def revenue(self, request):
+        rows = (
+            self._filter_dates(BillingDailyTotal.objects.all(), 'day')
+            .annotate(period=self._trunc('day'))
+            .values('period')
+            .annotate(
+                n_invoices=Sum('invoices'),
+                ht=Sum('amount_ht'),
+                vat=Sum('tva'),
+                ttc=Sum('amount_ttc'),
+                n_payments=Sum('payments'),
+                total_received=Sum('received'),
+            )
+            .order_by('period')
+        )
+        invoiced, received = [], []
+        for row in rows:
+            period = self._with_date(row)['period']
+            if row['n_invoices']:
+                invoiced.append({'period': period, 'invoices': row['n_invoices'], 'amount_ht': row['ht'],
+                                 'tva': row['vat'], 'amount_ttc': row['ttc']})
+            if row['n_payments']:
+                received.append({'period': period, 'payments': row['n_payments'], 'received': row['total_received']})
+        return Response({'invoiced': invoiced, 'received': received})
+
+    @action(detail=False, methods=['get'])
+    def unpaid(self, request):
+        invoices = self._filter_dates(self._invoices(), 'date').exclude(status='Paid')
+        per_client = (
+            invoices
+            .values('client_id', 'client__username', 'client__first_name', 'client__last_name')
+            .annotate(
+                invoices=Count('id'),
+                invoiced=Sum('amount_ttc'),
+                paid=Sum('paid_amount'),
+                balance=Sum(BALANCE),
+            )
+            .order_by('-balance')
+        )
+        clients = [
+            {
+                'client_id': row['client_id'],
+                'name': f"{row['client__first_name']} {row['client__last_name']}".strip() or row['client__username'],
+                'invoices': row['invoices'],
+                'invoiced': row['invoiced'],
+                'paid': row['paid'],
+                'balance': row['balance'],
+            }
+            for row in per_client
+        ]
+        return Response({'total_balance': sum(row['balance'] for row in clients), 'clients': clients})
+
+    @action(detail=False, methods=['get'], url_path='routes-per-driver')
+    def routes_per_driver(self, request):
+        routes = self._filter_dates(self._scoped(RouteViewSet), 'date')
+        per_driver = (
+            routes
+            .values('driver_id', 'driver__user__username', 'driver__user__first_name', 'driver__user__last_name')
+            .annotate(
+                routes=Count('id', distinct=True),
+                planned=Count('id', filter=Q(status='Planned'), distinct=True),
+                active=Count('id', filter=Q(status='Active'), distinct=True),
+                completed=Count('id', filter=Q(status='Completed'), distinct=True),
+                shipments=Count('shipments', distinct=True),
+            )
+            .order_by('-routes')
+        )
+        return Response([
+            {
+                'driver_id': row['driver_id'],
+                'name': (
+                    f"{row['driver__user__first_name']} {row['driver__user__last_name']}".strip()
+                    or row['driver__user__username']
+                ),
+                **{key: row[key] for key in ('routes', 'planned', 'active', 'completed', 'shipments')},
+            }
+            for row in per_driver
+        ])
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _scoped(self, viewset_class):
+        """Role-scoped queryset, exactly as the resource endpoint builds it"""
+        return viewset_class(request=self.request, format_kwarg=None)._get_scoped_queryset()
+
+    @cached_property
+    def _shipments(self):
+        shipments = self._scoped(ShipmentViewSet)
+        if self.request.user.role == 'driver':
+            # Scoped through routes: a shipment on two routes would count twice
+            return Shipment.objects.filter(pk__in=shipments.values('pk'))
+        return shipments
+
+    def _invoices(self):
+        return self._scoped(InvoiceViewSet)
+
+    def _shipment_rollups(self):
+        """
+        Daily rollups this role may read, or None when the role has to be
+        served from the fact table. Shipments are scoped by client, which is
+        a rollup key; drivers are scoped through routes, which is not.
+        """
+        user = self.request.user
+        if user.role in ['admin', 'manager']:
+            rollups = ShipmentDailyTotal.objects.all()
+        elif user.role == 'client':
+            rollups = ShipmentDailyRollup.objects.filter(client=user)
+        else:
+            return None
+        return self._filter_dates(rollups, 'day')
+
+    def _by_status(self):
+        rollups = self._shipment_rollups()
+        if rollups is not None:
+            rows = rollups.values('status').annotate(count=Sum('shipments')).filter(count__gt=0)
+        else:
+            shipments = self._filter_dates(self._shipments, 'created_at')
+            rows = shipments.values('status').annotate(count=Count('id'))
+        return list(rows.order_by('status'))
+
+    def _trunc(self, field):
+        period = self.request.query_params.get('period', 'month')
+        if period not in PERIODS:
+            raise ValidationError({'period': f"Expected one of: {', '.join(PERIODS)}."})
+        return PERIODS[period](field)
+
+    def _filter_dates(self, queryset, field):
+        for param, lookup in (('start', 'gte'), ('end', 'lte')):
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                day = parse_date(value)
+            except ValueError:  # Well formed but impossible, e.g. 2026-02-30
+                day = None
+            if day is None:
+                raise ValidationError({param: 'Expected a date (YYYY-MM-DD).'})
+            if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+                # Whole local days, as a plain range so the column index is used
+                if lookup == 'lte':
+                    day, lookup = day + timedelta(days=1), 'lt'
+                day = timezone.make_aware(datetime.combine(day, time.min))
+            queryset = queryset.filter(**{f'{field}__{lookup}': day})
+        return queryset
+
+    @staticmethod
+    def _with_date(row):
+        period = row['period']
+        row['period'] = period.date().isoformat() if hasattr(period, 'date') else period.isoformat()
+        return row
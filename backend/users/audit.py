@@ -3,7 +3,12 @@ Audit Logging System
 ====================
 Track security events, permission denials, and sensitive actions
 """
+import datetime
+from decimal import Decimal
+
 from django.db import models
+from django.db.models.fields.files import FieldFile
+from django.core.exceptions import FieldDoesNotExist
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
@@ -84,14 +89,19 @@ class AuditLog(models.Model):
             ip_address=None, user_agent='', endpoint='', http_method='',
             severity='low', success=True, error_message='', **details):
         """
-        Convenience method for creating audit logs
+        Convenience method for creating audit logs.
+        Entries go through the buffered background writer when
+        AUDIT_LOG_ASYNC is on (returns None), otherwise they are written
+        immediately and the new row is returned.
         """
-        return cls.objects.create(
-            user=user,
+        from .audit_writer import audit_writer
+
+        entry = dict(
+            user_id=user.pk if user else None,
             username=user.username if user else 'Anonymous',
             action=action,
             resource_type=resource_type,
-            resource_id=resource_id,
+            resource_id=str(resource_id),
             ip_address=ip_address,
             user_agent=user_agent,
             endpoint=endpoint,
@@ -99,8 +109,12 @@ class AuditLog(models.Model):
             severity=severity,
             success=success,
             error_message=error_message,
-            details=details
+            details=details,
+            timestamp=timezone.now(),
         )
+        if audit_writer.submit(entry):
+            return None
+        return cls.objects.create(**entry)
 
 
 def get_client_ip(request):
@@ -112,6 +126,52 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+def audit_value(value):
+    """JSON-safe representation of a field value for change diffs"""
+    if isinstance(value, models.Model):
+        return value.pk
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, FieldFile):
+        return value.name or None
+    if isinstance(value, (list, tuple, set)):
+        return [audit_value(item) for item in value]
+    return value
+
+
+def snapshot_fields(instance, data, prefix='', after=False):
+    """
+    Values of only the fields named in `data` (a serializer's validated_data).
+    Nested source dicts (e.g. `user.first_name`) are followed into the related
+    object. M2M fields are read from the prefetch cache when present; with
+    `after=True` they are taken from `data` itself so no query is needed.
+    """
+    snapshot = {}
+    for name, value in data.items():
+        try:
+            field = instance._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+
+        if field is not None and field.is_relation and not field.many_to_many and isinstance(value, dict):
+            related = getattr(instance, name, None)
+            if related is not None:
+                snapshot.update(snapshot_fields(related, value, prefix=f'{prefix}{name}.', after=after))
+            continue
+
+        if field is not None and field.many_to_many:
+            related = value if after else getattr(instance, name).all()
+            current = sorted(obj.pk for obj in related)
+        elif field is not None and field.is_relation:
+            current = getattr(instance, field.attname)
+        else:
+            current = getattr(instance, name, None)
+        snapshot[prefix + name] = audit_value(current)
+    return snapshot
+
+
 class AuditLogMixin:
     """
     Mixin for ViewSets to automatically log CRUD operations with data diffs.
@@ -136,25 +196,21 @@ class AuditLogMixin:
         )
 
     def perform_update(self, serializer):
-        old_instance = self.get_object()
-        # Capture old data before saving
-        from django.forms.models import model_to_dict
-        old_data = model_to_dict(old_instance)
+        # Snapshot only the submitted fields from the instance DRF already
+        # loaded (and permission-checked) for this update
+        submitted = serializer.validated_data
+        old_data = snapshot_fields(serializer.instance, submitted)
         
         instance = serializer.save()
-        new_data = model_to_dict(instance)
+        new_data = snapshot_fields(instance, submitted, after=True)
         
         # Calculate diff
         diff = {}
         for field, value in new_data.items():
-            if field in old_data and old_data[field] != value:
-                # Convert decimal to string for JSON serialization
-                from decimal import Decimal
-                old_val = str(old_data[field]) if isinstance(old_data[field], Decimal) else old_data[field]
-                new_val = str(value) if isinstance(value, Decimal) else value
+            if old_data.get(field) != value:
                 diff[field] = {
-                    'before': old_val,
-                    'after': new_val
+                    'before': old_data.get(field),
+                    'after': value
                 }
 
         AuditLog.log(
@@ -0,0 +1,208 @@
+"""
+Audit Log Archive
+=================
+Moves old AuditLog rows into date-partitioned, gzip-compressed NDJSON files
+and streams them back for read-only queries.
+
+Layout of AUDIT_LOG_ARCHIVE_DIR:
+
+    index.json                         # per-file date, count, time range, actions, severities;
+                                       # archived_through: (timestamp, id) of the last archived row
+    2026/01/audit-2026-01-05.ndjson.gz # one file per UTC day, one JSON object per line
+"""
+import gzip
+import json
+import os
+from datetime import datetime, time, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .audit import AuditLog
+
+INDEX_NAME = 'index.json'
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'username', 'action', 'resource_type', 'resource_id', 'severity',
+    'ip_address', 'user_agent', 'endpoint', 'http_method', 'timestamp', 'details',
+    'success', 'error_message',
+)
+SEARCH_FIELDS = ('username', 'action', 'resource_type', 'ip_address')
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'AUDIT_LOG_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'audit_archive'))
+
+
+def load_index(archive_dir):
+    path = Path(archive_dir) / INDEX_NAME
+    if not path.exists():
+        return {'files': {}}
+    with open(path, encoding='utf-8') as index_file:
+        return json.load(index_file)
+
+
+def save_index(archive_dir, index):
+    # Write-then-rename so readers never see a half-written index
+    path = Path(archive_dir) / INDEX_NAME
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def archive_audit_logs(cutoff, archive_dir=None, chunk_size=2000, on_chunk=None):
+    """
+    Move every AuditLog row older than `cutoff` into the archive.
+
+    Rows are processed oldest-first in chunks: each chunk is appended to its
+    day files (a new gzip member per append) and fsynced, recorded in the
+    index together with the (timestamp, id) of its last row, and only then
+    deleted in its own short transaction, so no lock is held across the
+    whole run. After a crash before the delete, rows up to that key are
+    looked up in their day file and not archived (or counted) again. A
+    crash before the index is saved can leave a duplicate in a day file
+    that the index does not count; readers drop duplicate IDs. Returns the
+    number of rows archived.
+    """
+    archive_dir = Path(archive_dir or get_archive_dir())
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    index = load_index(archive_dir)
+    queryset = AuditLog.objects.filter(timestamp__lt=cutoff).order_by('timestamp', 'id')
+    archived_ids = {}  # day -> ids already in its file, read only after an interrupted run
+    total = 0
+
+    while True:
+        rows = list(queryset.values(*ARCHIVED_FIELDS)[:chunk_size])
+        if not rows:
+            break
+
+        through = index.get('archived_through')
+        through = (parse_datetime(through['timestamp']), through['id']) if through else None
+        by_day = {}
+        for row in rows:
+            day = row['timestamp'].astimezone(dt_timezone.utc).date()
+            if through and (row['timestamp'], row['id']) <= through:
+                if day not in archived_ids:
+                    archived_ids[day] = _day_ids(archive_dir, day)
+                if row['id'] in archived_ids[day]:
+                    continue  # Archived by a run that stopped before deleting it
+            by_day.setdefault(day, []).append(row)
+        for day, day_rows in by_day.items():
+            _append_day(archive_dir, index, day, day_rows)
+        last = rows[-1]
+        index['archived_through'] = {'timestamp': last['timestamp'].isoformat(), 'id': last['id']}
+        save_index(archive_dir, index)
+
+        with transaction.atomic():
+            AuditLog.objects.filter(id__in=[row['id'] for row in rows]).delete()
+
+        total += len(rows)
+        if on_chunk:
+            on_chunk(total)
+    return total
+
+
+def _day_path(day):
+    return f'{day:%Y}/{day:%m}/audit-{day.isoformat()}.ndjson.gz'
+
+
+def _day_ids(archive_dir, day):
+    path = archive_dir / _day_path(day)
+    if not path.exists():
+        return set()
+    ids = set()
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        try:
+            for line in archive:
+                try:
+                    ids.add(json.loads(line)['id'])
+                except ValueError:
+                    continue  # Torn line from a crash mid-append
+        except EOFError:
+            pass  # Truncated last gzip member, same
+    return ids
+
+
+def _append_day(archive_dir, index, day, rows):
+    relative = _day_path(day)
+    path = archive_dir / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+        archive.flush()
+        os.fsync(archive.fileno())
+
+    entry = index['files'].setdefault(relative, {
+        'date': day.isoformat(), 'count': 0, 'min_timestamp': None, 'max_timestamp': None,
+        'actions': [], 'severities': [],
+    })
+    timestamps = [row['timestamp'].isoformat() for row in rows]
+    entry['count'] += len(rows)
+    entry['min_timestamp'] = min(filter(None, [entry['min_timestamp'], min(timestamps)]))
+    entry['max_timestamp'] = max(filter(None, [entry['max_timestamp'], max(timestamps)]))
+    entry['actions'] = sorted(set(entry['actions']) | {row['action'] for row in rows})
+    entry['severities'] = sorted(set(entry['severities']) | {row['severity'] for row in rows})
+
+
+def iter_archived_logs(start=None, end=None, action=None, severity=None, username=None, search=None,
+                       archive_dir=None):
+    """
+    Yield archived entries (dicts) in chronological order. The index is used to
+    open only the day files that can match; `start`/`end` are datetimes,
+    `search` is a case-insensitive substring over the same fields as the
+    AuditLog list endpoint.
+    """
+    archive_dir = Path(archive_dir or get_archive_dir())
+    index = load_index(archive_dir)
+    search = search.lower() if search else None
+
+    for relative, entry in sorted(index['files'].items(), key=lambda item: item[1]['date']):
+        if start and parse_datetime(entry['max_timestamp']) < start:
+            continue
+        if end and parse_datetime(entry['min_timestamp']) > end:
+            continue
+        if action and action not in entry['actions']:
+            continue
+        if severity and severity not in entry['severities']:
+            continue
+
+        seen = set()
+        with gzip.open(archive_dir / relative, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                seen.add(row['id'])
+                if action and row['action'] != action:
+                    continue
+                if severity and row['severity'] != severity:
+                    continue
+                if username and row['username'] != username:
+                    continue
+                if start or end:
+                    timestamp = parse_datetime(row['timestamp'])
+                    if (start and timestamp < start) or (end and timestamp > end):
+                        continue
+                if search and not any(search in str(row.get(field) or '').lower() for field in SEARCH_FIELDS):
+                    continue
+                yield row
+
+
+def parse_bound(value, end_of_day=False):
+    """Accept `YYYY-MM-DD` or an ISO datetime from a query string"""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is not None:
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid date: {value}')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
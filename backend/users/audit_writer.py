@@ -0,0 +1,285 @@
+"""
+Buffered Audit Log Writer
+=========================
+Moves AuditLog INSERTs off the request path
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BufferedAuditWriter:
+    """
+    In-process queue drained by a background thread that bulk_creates
+    AuditLog rows every AUDIT_LOG_BATCH_SIZE entries or
+    AUDIT_LOG_FLUSH_INTERVAL seconds, whichever comes first.
+
+    - Writer disabled or queue full: `submit` returns False and the caller
+      writes the row synchronously.
+    - Process exit: an atexit hook runs the `on_stop` callbacks (which may
+      still log), then flushes the remaining entries.
+    - AUDIT_LOG_SPOOL_DIR set: every entry is appended to a per-process
+      NDJSON spool before it is queued and acknowledged once its batch
+      commits. Unacknowledged entries left behind by a crashed process are
+      replayed by the next writer that starts.
+    - A failed batch is retried AUDIT_LOG_FLUSH_RETRIES times with doubling
+      backoff, then written row by row so one bad entry cannot sink the
+      rest. Rows that still fail stay in the spool for the next start or,
+      without a spool, are dropped: counted in `counters['dropped']` and
+      logged as an error.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._queue = None
+        self._spool = None
+        self._spool_path = None
+        self._seq = 0
+        self._pending = 0
+        self._stop_callbacks = []
+        self.counters = {'written': 0, 'retried': 0, 'spooled': 0, 'dropped': 0}
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'AUDIT_LOG_ASYNC', False)
+
+    def submit(self, entry):
+        """
+        Queue a dict of AuditLog field values (`user_id`, not `user`).
+        Returns False when the caller must write the entry itself.
+        """
+        if not self.enabled:
+            return False
+        self._ensure_started()
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if self._spool:
+                self._spool_write({'seq': seq, 'entry': entry})
+                self._pending += 1
+        try:
+            self._queue.put_nowait((seq, entry))
+        except queue.Full:
+            self._ack([seq])
+            return False
+        return True
+
+    def on_stop(self, callback):
+        """Run `callback` at the start of stop(), before the final drain"""
+        self._stop_callbacks.append(callback)
+
+    def stop(self, timeout=10):
+        """Flush everything still queued and stop the thread (runs at exit)"""
+        for callback in self._stop_callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception('Audit log stop callback %r failed', callback)
+        if self._pid != os.getpid() or not self._thread or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error('Audit log queue still full at shutdown, entries may be lost')
+            return
+        self._thread.join(timeout)
+        self._pid = None
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+    def _ensure_started(self):
+        # Threads do not survive fork(): each (gunicorn) worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 10000))
+            self._seq = self._pending = 0
+            self._open_spool()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        batch_size = getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200)
+        flush_interval = getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        self._replay_orphaned_spools()
+
+        batch = []
+        deadline = None
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                if batch:
+                    self._flush(batch)
+                break
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + flush_interval
+                batch.append(item)
+            if batch and (len(batch) >= batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+
+        connection.close()
+
+    def _flush(self, batch):
+        close_old_connections()
+        self._write(batch)
+
+    def _write(self, batch):
+        from .audit import AuditLog
+
+        retries = getattr(settings, 'AUDIT_LOG_FLUSH_RETRIES', 3)
+        for attempt in range(retries + 1):
+            try:
+                AuditLog.objects.bulk_create([AuditLog(**entry) for _, entry in batch])
+            except Exception:
+                logger.warning('Failed to write %d audit log entries (attempt %d)', len(batch), attempt + 1,
+                               exc_info=True)
+                if attempt < retries:
+                    self.counters['retried'] += 1
+                    time.sleep(min(0.5 * 2 ** attempt, 10))
+                    close_old_connections()  # Reconnect if the connection broke
+                continue
+            self.counters['written'] += len(batch)
+            self._ack([seq for seq, _ in batch])
+            return
+
+        # Still failing: one row at a time, keeping whatever can be written
+        written, failed = [], []
+        for seq, entry in batch:
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.create(**entry)
+            except Exception:
+                failed.append(seq)
+            else:
+                written.append(seq)
+        self.counters['written'] += len(written)
+        if written:
+            self._ack(written)
+        if not failed:
+            return
+        if self._spool:
+            # Unacknowledged: replayed by the next writer that starts
+            self.counters['spooled'] += len(failed)
+            logger.error('Left %d audit log entries in the spool for replay', len(failed))
+        else:
+            self.counters['dropped'] += len(failed)
+            logger.error('Dropped %d audit log entries', len(failed),
+                         extra={'audit_log_dropped': self.counters['dropped']})
+
+    # ------------------------------------------------------------------
+    # Spool
+    # ------------------------------------------------------------------
+    def _open_spool(self):
+        spool_dir = getattr(settings, 'AUDIT_LOG_SPOOL_DIR', '')
+        if not spool_dir:
+            self._spool = None
+            return
+        spool_dir = Path(spool_dir)
+        spool_dir.mkdir(parents=True, exist_ok=True)
+        self._spool_path = spool_dir / f'audit-{os.getpid()}.ndjson'
+        if self._spool_path.exists():
+            # Left behind by an earlier process that had the same PID
+            self._spool_path.rename(spool_dir / f'audit-{os.getpid()}-stale-{time.time_ns()}.ndjson')
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+
+    def _spool_write(self, record):
+        self._spool.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+        self._spool.flush()
+
+    def _ack(self, seqs):
+        with self._lock:
+            if not self._spool:
+                return
+            self._pending -= len(seqs)
+            if self._pending <= 0:
+                # Everything written so far is committed: start a fresh spool
+                self._pending = 0
+                self._spool.seek(0)
+                self._spool.truncate()
+            else:
+                self._spool_write({'ack': seqs})
+
+    def _replay_orphaned_spools(self):
+        if not self._spool_path:
+            return
+        from .audit import AuditLog
+
+        for path in self._spool_path.parent.glob('audit-*.ndjson'):
+            if path == self._spool_path or self._is_live_spool(path):
+                continue
+            claimed = path.with_suffix(f'.replaying-{os.getpid()}')
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue  # Another worker claimed it first
+
+            entries = {}
+            with open(claimed, encoding='utf-8') as spool:
+                for line in spool:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from the crash
+                    if 'ack' in record:
+                        for seq in record['ack']:
+                            entries.pop(seq, None)
+                    else:
+                        entries[record['seq']] = record['entry']
+
+            rows = []
+            for entry in entries.values():
+                entry['timestamp'] = parse_datetime(entry['timestamp'])
+                rows.append(AuditLog(**entry))
+            try:
+                AuditLog.objects.bulk_create(rows, batch_size=500)
+            except Exception:
+                logger.exception('Failed to replay audit log spool %s', claimed)
+                claimed.rename(path)  # Retry on the next start
+                continue
+            claimed.unlink()
+            logger.info('Replayed %d audit log entries from %s', len(rows), path.name)
+
+    @staticmethod
+    def _is_live_spool(path):
+        parts = path.stem.split('-')
+        if len(parts) != 2 or not parts[1].isdigit():
+            return False  # Stale or renamed spool: always replay
+        try:
+            os.kill(int(parts[1]), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+
+audit_writer = BufferedAuditWriter()
+atexit.register(audit_writer.stop)
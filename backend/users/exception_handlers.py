@@ -3,57 +3,208 @@ Custom Exception Handler for Secure 403 Responses
 ==================================================
 Ensures consistent, non-leaky error messages
 """
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
 from rest_framework.views import exception_handler as drf_exception_handler
 from rest_framework.exceptions import PermissionDenied, NotAuthenticated
 from rest_framework.response import Response
 
+from .audit_writer import audit_writer
+
+logger = logging.getLogger('users.security')
+
+
+class DenialAggregator:
+    """
+    Coalesces identical permission denials (same user or IP, endpoint and
+    method) over a sliding window so a client hammering a forbidden URL
+    costs one audit row per window instead of one per request.
+
+    - The first denial of a window is written immediately with probability
+      AUDIT_DENIAL_SAMPLE_RATE (1.0 = always).
+    - Every other denial only bumps an in-memory counter. When the window
+      (AUDIT_DENIAL_WINDOW_SECONDS) closes, one summary row carries the
+      number of denials that were not written individually.
+    - Closed windows are swept on the next denial and by a background
+      thread every AUDIT_DENIAL_SWEEP_INTERVAL seconds (one per process,
+      started by the first denial). Open windows are flushed when the audit
+      writer stops, before its final drain. At most AUDIT_DENIAL_MAX_KEYS
+      windows are kept open.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()
+        self._sweeper_pid = None
+
+    def record(self, key, event):
+        """Count one denial; returns True when it opened a new window"""
+        now = time.monotonic()
+        window_seconds = getattr(settings, 'AUDIT_DENIAL_WINDOW_SECONDS', 60)
+        with self._lock:
+            expired = self._pop_expired(now, window_seconds)
+            window = self._windows.get(key)
+            opened = window is None
+            if opened:
+                sampled = random.random() < getattr(settings, 'AUDIT_DENIAL_SAMPLE_RATE', 1.0)
+                window = {'opened_at': now, 'started': _utcnow(), 'event': event, 'suppressed': 0 if sampled else 1}
+                self._windows[key] = window
+            else:
+                window['suppressed'] += 1
+                window['event'] = event  # Keep the latest message / user agent
+            self._ensure_sweeper()
+
+        for closed in expired:
+            _write_summary(closed)
+        if opened and window['suppressed'] == 0:
+            _write_denial(event)
+        return opened
+
+    def sweep(self):
+        """Emit summaries for the windows that have closed"""
+        window_seconds = getattr(settings, 'AUDIT_DENIAL_WINDOW_SECONDS', 60)
+        with self._lock:
+            expired = self._pop_expired(time.monotonic(), window_seconds)
+        for closed in expired:
+            _write_summary(closed)
+
+    def flush(self):
+        """Emit summaries for every open window (audit writer shutdown)"""
+        with self._lock:
+            windows = list(self._windows.values())
+            self._windows.clear()
+        for window in windows:
+            _write_summary(window)
+
+    def _ensure_sweeper(self):
+        # Threads do not survive fork(): each (gunicorn) worker starts its own
+        interval = getattr(settings, 'AUDIT_DENIAL_SWEEP_INTERVAL', 5.0)
+        if interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        self._sweeper_pid = os.getpid()
+        threading.Thread(target=self._sweep_forever, args=(interval,), name='audit-denial-sweeper',
+                         daemon=True).start()
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception('Failed to sweep denial windows')
+            finally:
+                connection.close()
+
+    def _pop_expired(self, now, window_seconds):
+        max_keys = getattr(settings, 'AUDIT_DENIAL_MAX_KEYS', 10000)
+        expired = []
+        # Windows are kept in opening order, so expired ones are at the front
+        while self._windows:
+            key, window = next(iter(self._windows.items()))
+            if now - window['opened_at'] < window_seconds and len(self._windows) < max_keys:
+                break
+            expired.append(self._windows.pop(key))
+        return expired
+
+
+def _utcnow():
+    return datetime.now(dt_timezone.utc)
+
+
+def _write_denial(event, **details):
+    from .audit import AuditLog
+    try:
+        AuditLog.log(
+            action='permission_denied',
+            severity='medium',
+            success=False,
+            **event,
+            **details
+        )
+    except Exception:
+        # Don't let logging errors break the response
+        logger.exception('Failed to write permission_denied audit log')
+
+
+def _write_summary(window):
+    if not window['suppressed']:
+        return
+    event = window['event']
+    logger.warning(
+        'Coalesced %d denial(s) since %s: %s %s',
+        window['suppressed'], window['started'].isoformat(), event['http_method'], event['endpoint'],
+        extra={'denial_count': window['suppressed'], **_log_fields(event)}
+    )
+    _write_denial(
+        event,
+        count=window['suppressed'],
+        window_start=window['started'].isoformat(),
+        window_end=_utcnow().isoformat(),
+        coalesced=True
+    )
+
+
+def _log_fields(event):
+    user = event.get('user')
+    return {
+        'user_id': getattr(user, 'id', None),
+        'ip_address': event['ip_address'],
+        'http_method': event['http_method'],
+        'endpoint': event['endpoint'],
+    }
+
+
+denial_aggregator = DenialAggregator()
+audit_writer.on_stop(denial_aggregator.flush)
+
 
 def custom_exception_handler(exc, context):
     """
     Custom exception handler that:
     1. Returns standard 403 for all permission errors
     2. Does not leak information about why access was denied
-    3. Logs security events for auditing
+    3. Logs security events for auditing (coalesced per user/IP, endpoint and method)
     """
     # Call REST framework's default exception handler first
     response = drf_exception_handler(exc, context)
-    
+
     # Handle permission-related exceptions
     if isinstance(exc, (PermissionDenied, NotAuthenticated)):
         # Log the security event (for admin auditing)
         request = context.get('request')
         if request:
+            from .audit import get_client_ip
             user = getattr(request, 'user', None)
-            path = getattr(request, 'path', 'unknown')
-            method = getattr(request, 'method', 'unknown')
-            
-            # Log audit event
-            try:
-                from .audit import AuditLog, get_client_ip
-                AuditLog.log(
-                    action='permission_denied',
-                    user=user if user and user.is_authenticated else None,
-                    resource_type=context.get('view').__class__.__name__ if context.get('view') else '',
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                    endpoint=path,
-                    http_method=method,
-                    severity='medium',
-                    success=False,
-                    error_message=str(exc)
+            user = user if user and user.is_authenticated else None
+            event = {
+                'user': user,
+                'resource_type': context.get('view').__class__.__name__ if context.get('view') else '',
+                'ip_address': get_client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+                'endpoint': getattr(request, 'path', 'unknown'),
+                'http_method': getattr(request, 'method', 'unknown'),
+                'error_message': str(exc),
+            }
+            key = (user.pk if user else event['ip_address'], event['endpoint'], event['http_method'])
+
+            if denial_aggregator.record(key, event):
+                logger.warning(
+                    'Access denied: %s %s (%s)', event['http_method'], event['endpoint'], exc.__class__.__name__,
+                    extra={'exception': exc.__class__.__name__, **_log_fields(event)}
                 )
-            except Exception as e:
-                # Don't let logging errors break the response
-                print(f"[AUDIT LOG ERROR] {e}")
-            
-            # Console log format: [SECURITY] user_id | method | path | exception_type
-            user_id = getattr(user, 'id', 'anonymous')
-            print(f"[SECURITY] {user_id} | {method} | {path} | {exc.__class__.__name__}")
-        
+
         # Return generic 403 response (no details leaked)
         return Response(
             {"detail": "Access denied."},
             status=403
         )
-    
+
     return response
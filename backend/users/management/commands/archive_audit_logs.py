@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.audit import AuditLog
+from users.audit_archive import archive_audit_logs, get_archive_dir
+
+
+class Command(BaseCommand):
+    help = (
+        'Move audit logs older than AUDIT_LOG_RETENTION_DAYS into gzip-compressed, '
+        'day-partitioned NDJSON archives and delete them from the database. '
+        'Meant to run daily from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.AUDIT_LOG_RETENTION_DAYS,
+            help='Archive rows older than this many days (default: AUDIT_LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows written and deleted per transaction',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Archive directory (default: AUDIT_LOG_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many rows per day would be archived without touching anything',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archive_dir = options['archive_dir'] or get_archive_dir()
+
+        if options['dry_run']:
+            per_day = (
+                AuditLog.objects
+                .filter(timestamp__lt=cutoff)
+                .annotate(day=TruncDate('timestamp'))
+                .values('day')
+                .annotate(count=Count('id'))
+                .order_by('day')
+            )
+            total = 0
+            for row in per_day:
+                self.stdout.write(f"{row['day']}: {row['count']}")
+                total += row['count']
+            self.stdout.write(self.style.WARNING(f'DRY RUN: would archive {total} audit logs older than {cutoff:%Y-%m-%d %H:%M}'))
+            return
+
+        archived = archive_audit_logs(
+            cutoff,
+            archive_dir=archive_dir,
+            chunk_size=options['chunk_size'],
+            on_chunk=lambda done: self.stdout.write(f'  {done} archived...'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} audit logs older than {cutoff:%Y-%m-%d %H:%M} to {archive_dir}'))
@@ -0,0 +1,513 @@
+import csv
+import io
+import json
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from users.models import User, AuditLog
+from clients.models import Client
+from drivers.models import Driver
+from vehicles.models import Vehicle
+from destinations.geo import geocode
+from destinations.models import Destination
+from service_types.models import ServiceType
+from pricing.models import PricingRule
+from pricing.rules import default_rule_prices
+from shipments.models import Shipment, ShipmentEvent
+from routes.models import Route
+from billing.models import Invoice, PaymentRecord
+from incidents.models import Incident
+from complaints.models import Complaint, ComplaintItem
+
+
+# (city, country, distance from the Algiers hub in km, destination_type)
+CITIES = [
+    ('Algiers', 'Algeria', 0, 'Domestic'),
+    ('Blida', 'Algeria', 50, 'Domestic'),
+    ('Tizi Ouzou', 'Algeria', 100, 'Domestic'),
+    ('Bejaia', 'Algeria', 220, 'Domestic'),
+    ('Setif', 'Algeria', 270, 'Domestic'),
+    ('Constantine', 'Algeria', 320, 'Domestic'),
+    ('Annaba', 'Algeria', 430, 'Domestic'),
+    ('Oran', 'Algeria', 430, 'Domestic'),
+    ('Tlemcen', 'Algeria', 520, 'Domestic'),
+    ('Batna', 'Algeria', 420, 'Domestic'),
+    ('Biskra', 'Algeria', 410, 'Domestic'),
+    ('Ghardaia', 'Algeria', 600, 'Domestic'),
+    ('Ouargla', 'Algeria', 790, 'Domestic'),
+    ('Bechar', 'Algeria', 1000, 'Domestic'),
+    ('Tamanrasset', 'Algeria', 1950, 'Domestic'),
+    ('Tunis', 'Tunisia', 800, 'International'),
+    ('Marseille', 'France', 760, 'International'),
+    ('Paris', 'France', 1350, 'International'),
+    ('Madrid', 'Spain', 820, 'International'),
+    ('Rome', 'Italy', 980, 'International'),
+]
+
+DESTINATION_TYPES = ['Regular'] * 14 + ['Checkpoint'] * 3 + ['Main Hub', 'Stock Warehouse']
+
+SERVICE_TYPES = [
+    ('Standard', 'Delivery', Decimal('500.00'), Decimal('15.00'), '3-5 jours'),
+    ('Express', 'Delivery', Decimal('1200.00'), Decimal('25.00'), '24-48 heures'),
+    ('International', 'Logistics', Decimal('3500.00'), Decimal('35.00'), '7-14 jours'),
+    ('Same Day', 'Delivery', Decimal('2500.00'), Decimal('45.00'), 'Même jour'),
+]
+
+AUDIT_ACTIONS = (
+    ['login_success'] * 30 + ['resource_updated'] * 25 + ['resource_created'] * 25 +
+    ['permission_denied'] * 10 + ['login_failed'] * 5 + ['resource_deleted'] * 4 + ['logout']
+)
+AUDIT_RESOURCES = ['Shipment', 'Route', 'Invoice', 'Client', 'Driver', 'Vehicle', 'Destination']
+
+STATUS_FLOW = ['Pending', 'In Transit', 'Delivered']
+PAYMENT_METHODS = ['Cash', 'Bank Transfer', 'Cheque', 'Card']
+COPY_NULL = r'\N'
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def raw_timestamps(*model_classes):
+    """
+    Let generated rows keep their own created_at/timestamp values:
+    bulk_create would otherwise overwrite auto_now_add fields with now().
+    """
+    patched = []
+    for model in model_classes:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False):
+                patched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in patched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generates production-scale synthetic data for every model (bulk_create, or COPY on PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shipments', type=int, default=100000, help='Number of shipments to create')
+        parser.add_argument('--clients', type=int, help='Number of client accounts (default: shipments / 50)')
+        parser.add_argument('--drivers', type=int, help='Number of drivers and vehicles (default: shipments / 500)')
+        parser.add_argument('--destinations', type=int, default=200, help='Number of destinations to create')
+        parser.add_argument('--audit-logs', type=int, help='Number of audit log rows (default: 2 x shipments)')
+        parser.add_argument('--days', type=int, default=365, help='Spread shipments over this many past days')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per insert batch / transaction')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed, for reproducible datasets')
+        parser.add_argument('--no-copy', action='store_true', help='Use bulk_create even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        self.next_ids = {}
+        self.usernames = {}
+        self.now = timezone.now()
+
+        n_shipments = options['shipments']
+        n_clients = options['clients'] or max(1, n_shipments // 50)
+        n_drivers = options['drivers'] or max(1, n_shipments // 500)
+        n_audit_logs = options['audit_logs'] if options['audit_logs'] is not None else n_shipments * 2
+
+        self.stdout.write(
+            f'Generating {n_shipments} shipments for {n_clients} clients, {n_drivers} drivers '
+            f'({"COPY" if self.use_copy else "bulk_create"}, chunks of {self.chunk_size}, seed {options["seed"]})'
+        )
+
+        with raw_timestamps(Shipment, Incident, Complaint):
+            client_user_ids = self.generate_users('client', n_clients)
+            driver_user_ids = self.generate_users('driver', n_drivers)
+            self.generate_profiles(client_user_ids, driver_user_ids)
+            self.vehicle_ids = self.generate_vehicles(n_drivers)
+            self.destinations = self.generate_destinations(options['destinations'])
+            self.service_types = self.get_service_types()
+            self.generate_pricing_rules()
+            self.generate_shipments(n_shipments, options['days'], client_user_ids)
+            self.generate_audit_logs(n_audit_logs, options['days'], client_user_ids + driver_user_ids)
+
+        self.reset_sequences()
+        # Bulk inserts bypass the signals that keep the rollups current
+        call_command('rebuild_rollups', stdout=self.stdout)
+        call_command('build_distance_matrix', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS('Load data generated!'))
+
+    # ------------------------------------------------------------------
+    # Low-level writers
+    # ------------------------------------------------------------------
+    def allocate_ids(self, model, count):
+        """
+        Hand out primary keys up front so related rows can be linked without
+        reading inserted rows back (COPY does not return IDs).
+        """
+        if model not in self.next_ids:
+            self.next_ids[model] = (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+        start = self.next_ids[model]
+        self.next_ids[model] += count
+        return range(start, start + count)
+
+    def write(self, model, objs):
+        """Insert a stream of instances in --chunk-size batches, one transaction per batch"""
+        total = 0
+        for chunk in chunked(objs, self.chunk_size):
+            with transaction.atomic():
+                self.insert(model, chunk)
+            total += len(chunk)
+        self.stdout.write(f'  {model.__name__}: {total}')
+        return total
+
+    def insert(self, model, objs):
+        if not objs:
+            return
+        if self.use_copy:
+            self.copy(model, objs)
+        else:
+            model.objects.bulk_create(objs)
+
+    def copy(self, model, objs):
+        fields = model._meta.concrete_fields
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in objs:
+            writer.writerow([self.copy_value(field, getattr(obj, field.attname)) for field in fields])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer
+            )
+
+    def copy_value(self, field, value):
+        if value is None:
+            return COPY_NULL
+        if isinstance(field, models.JSONField):
+            return json.dumps(value, cls=field.encoder)
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        value = field.get_db_prep_save(value, connection)
+        return COPY_NULL if value is None else value
+
+    def reset_sequences(self):
+        # Explicit primary keys do not advance PostgreSQL sequences
+        statements = connection.ops.sequence_reset_sql(no_style(), list(self.next_ids))
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    # ------------------------------------------------------------------
+    # Reference data
+    # ------------------------------------------------------------------
+    def generate_users(self, role, count):
+        ids = self.allocate_ids(User, count)
+        password = make_password(None)  # unusable: load accounts cannot log in
+        self.usernames.update((user_id, f'load-{role}-{user_id}') for user_id in ids)
+        self.write(User, (
+            User(
+                id=user_id, username=self.usernames[user_id], email=f'load-{role}-{user_id}@example.com',
+                first_name=f'{role.title()} {user_id}', password=password, role=role,
+                phone=f'05{self.rng.randint(10000000, 99999999)}', date_joined=self.now
+            )
+            for user_id in ids
+        ))
+        return list(ids)
+
+    def generate_profiles(self, client_user_ids, driver_user_ids):
+        def clients():
+            for profile_id, user_id in zip(self.allocate_ids(Client, len(client_user_ids)), client_user_ids):
+                is_company = self.rng.random() < 0.3
+                yield Client(
+                    id=profile_id, user_id=user_id,
+                    client_type='Company' if is_company else 'Individual',
+                    company_name=f'Company {user_id}' if is_company else None,
+                )
+
+        self.write(Client, clients())
+        self.driver_ids = list(self.allocate_ids(Driver, len(driver_user_ids)))
+        self.write(Driver, (
+            Driver(id=driver_id, user_id=user_id, license_number=f'LIC-{user_id:07d}')
+            for driver_id, user_id in zip(self.driver_ids, driver_user_ids)
+        ))
+
+    def generate_vehicles(self, count):
+        ids = self.allocate_ids(Vehicle, count)
+        self.write(Vehicle, (
+            Vehicle(
+                id=vehicle_id, plate=f'LD-{vehicle_id:07d}',
+                model=self.rng.choice(['Renault Master', 'Iveco Daily', 'Mercedes Actros', 'Isuzu NPR']),
+                capacity_kg=self.rng.choice([1500, 3500, 7500, 12000, 24000]),
+                status='Maintenance' if self.rng.random() < 0.05 else 'Available',
+            )
+            for vehicle_id in ids
+        ))
+        return list(ids)
+
+    def generate_destinations(self, count):
+        destinations = []
+        for destination_id in self.allocate_ids(Destination, count):
+            city, country, distance, destination_type = self.rng.choice(CITIES)
+            # Spread points of one city over a few km around the gazetteer entry
+            latitude, longitude = geocode(city, country) or (None, None)
+            if latitude is not None:
+                latitude += self.rng.uniform(-0.05, 0.05)
+                longitude += self.rng.uniform(-0.05, 0.05)
+            destinations.append(Destination(
+                id=destination_id, name=f'{city} Point {destination_id}', country=country, city=city,
+                delivery_zone=f'Zone {chr(65 + destination_id % 6)}',
+                distance_km=distance + self.rng.uniform(0, 40),
+                type=self.rng.choice(DESTINATION_TYPES), destination_type=destination_type,
+                latitude=latitude, longitude=longitude,
+            ))
+        self.write(Destination, destinations)
+        return destinations
+
+    def get_service_types(self):
+        existing = list(ServiceType.objects.filter(is_active=True))
+        if existing:
+            return existing
+        service_types = [
+            ServiceType(
+                id=service_type_id, name=name, description=f'{name} delivery', category=category,
+                base_price=base_price, price_per_km=price_per_km, estimated_delivery_time=delay,
+            )
+            for service_type_id, (name, category, base_price, price_per_km, delay)
+            in zip(self.allocate_ids(ServiceType, len(SERVICE_TYPES)), SERVICE_TYPES)
+        ]
+        self.write(ServiceType, service_types)
+        return service_types
+
+    def generate_pricing_rules(self):
+        pairs = [(st, dest) for st in self.service_types for dest in self.destinations]
+        self.write(PricingRule, (
+            PricingRule(id=rule_id, service_type_id=st.id, destination_id=dest.id, base_price=base_price,
+                        price_per_km=price_per_km)
+            for rule_id, (st, dest) in zip(self.allocate_ids(PricingRule, len(pairs)), pairs)
+            for base_price, price_per_km in [default_rule_prices(st, dest)]
+        ))
+
+    # ------------------------------------------------------------------
+    # Fact tables
+    # ------------------------------------------------------------------
+    def generate_shipments(self, count, days, client_user_ids):
+        """
+        Shipments are generated in chronological order, one chunk at a time.
+        Routes, invoices, payments, incidents and complaints are derived from
+        each chunk so memory stays bounded by --chunk-size.
+        """
+        start = self.now - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+        totals = dict.fromkeys(['shipments', 'routes', 'invoices', 'payments', 'incidents', 'complaints'], 0)
+
+        for offset in range(0, count, self.chunk_size):
+            size = min(self.chunk_size, count - offset)
+            shipments = [
+                self.build_shipment(shipment_id, start + step * (offset + i), client_user_ids)
+                for i, shipment_id in enumerate(self.allocate_ids(Shipment, size))
+            ]
+            with transaction.atomic():
+                self.insert(Shipment, shipments)
+                self.insert(ShipmentEvent, self.build_events(shipments))
+                routes = self.generate_routes(shipments)
+                invoices, payments = self.generate_invoices(shipments)
+                incidents = self.generate_incidents(routes)
+                complaints = self.generate_complaints(shipments)
+
+            for key, value in zip(totals, (size, len(routes), invoices, payments, incidents, complaints)):
+                totals[key] += value
+            self.stdout.write(f'  Shipments: {offset + size}/{count}')
+
+        self.stdout.write('  ' + ', '.join(f'{key}: {value}' for key, value in totals.items()))
+
+    def build_shipment(self, shipment_id, created_at, client_user_ids):
+        destination = self.rng.choice(self.destinations)
+        service_type = self.rng.choice(self.service_types)
+        multiplier = Decimal('2') if destination.destination_type == 'International' else Decimal('1')
+        weight = round(min(self.rng.lognormvariate(3, 1.2), 5000), 2)
+        price = (service_type.base_price + (service_type.price_per_km or Decimal('15'))
+                 * Decimal(str(round(destination.distance_km, 2)))) * multiplier
+
+        age = self.now - created_at
+        if age > timedelta(days=7):
+            status = 'Cancelled' if self.rng.random() < 0.03 else 'Delivered'
+        else:
+            status = self.rng.choice(['Pending', 'Pending', 'In Transit', 'Delayed'])
+
+        shipment = Shipment(
+            id=shipment_id, client_id=self.rng.choice(client_user_ids), destination_id=destination.id,
+            service_type_id=service_type.id,
+            weight_kg=weight, volume_m3=round(weight / self.rng.uniform(150, 400), 3),
+            price=price.quantize(Decimal('0.01')), status=status, created_at=created_at,
+            estimated_delivery=created_at + timedelta(days=3),
+        )
+        # Tracking events, inserted after the shipments by build_events()
+        flow = STATUS_FLOW[:STATUS_FLOW.index(status) + 1] if status in STATUS_FLOW else ['Pending', status]
+        shipment.generated_events = [
+            (created_at + timedelta(days=step), event_status, 'Algiers Hub' if step == 0 else destination.city,
+             f'Shipment {event_status.lower()}')
+            for step, event_status in enumerate(flow)
+        ]
+        return shipment
+
+    def build_events(self, shipments):
+        events = [(shipment.id, *event) for shipment in shipments for event in shipment.generated_events]
+        return [
+            ShipmentEvent(id=event_id, shipment_id=shipment_id, status=status, timestamp=timestamp,
+                          location=location, note=note)
+            for event_id, (shipment_id, timestamp, status, location, note)
+            in zip(self.allocate_ids(ShipmentEvent, len(events)), events)
+        ]
+
+    def generate_routes(self, shipments):
+        routable = [s for s in shipments if s.status not in ('Pending', 'Cancelled')]
+        groups = []
+        while routable:
+            size = self.rng.randint(10, 30)
+            groups.append(routable[:size])
+            routable = routable[size:]
+
+        routes = []
+        links = []
+        link_ids = iter(self.allocate_ids(Route.shipments.through, sum(len(g) for g in groups)))
+        for route_id, group in zip(self.allocate_ids(Route, len(groups)), groups):
+            completed = all(s.status == 'Delivered' for s in group)
+            routes.append(Route(
+                id=route_id, driver_id=self.rng.choice(self.driver_ids), vehicle_id=self.rng.choice(self.vehicle_ids),
+                date=(group[-1].created_at + timedelta(days=1)).date(),
+                status='Completed' if completed else 'Active',
+                actual_distance_km=round(self.rng.uniform(50, 900), 1) if completed else None,
+                actual_duration_hours=round(self.rng.uniform(2, 14), 1) if completed else None,
+                fuel_consumed_liters=round(self.rng.uniform(10, 250), 1) if completed else None,
+            ))
+            links.extend(
+                Route.shipments.through(id=next(link_ids), route_id=route_id, shipment_id=s.id) for s in group
+            )
+        self.insert(Route, routes)
+        self.insert(Route.shipments.through, links)
+        return routes
+
+    def generate_invoices(self, shipments):
+        by_client = {}
+        for shipment in shipments:
+            if shipment.status == 'Delivered':
+                by_client.setdefault(shipment.client_id, []).append(shipment)
+        groups = [
+            client_shipments[i:i + 10]
+            for client_shipments in by_client.values()
+            for i in range(0, len(client_shipments), 10)
+        ]
+
+        invoices, links, payments = [], [], []
+        link_ids = iter(self.allocate_ids(Invoice.shipments.through, sum(len(g) for g in groups)))
+        for invoice_id, group in zip(self.allocate_ids(Invoice, len(groups)), groups):
+            amount_ht = sum((s.price for s in group), Decimal('0'))
+            tva = (amount_ht * Decimal('0.19')).quantize(Decimal('0.01'))
+            amount_ttc = amount_ht + tva
+            invoice_date = group[-1].created_at.date()
+            roll = self.rng.random()
+            if roll < 0.6:
+                status, paid_parts = 'Paid', [amount_ttc]
+            elif roll < 0.8:
+                part = (amount_ttc * Decimal(str(round(self.rng.uniform(0.2, 0.8), 2)))).quantize(Decimal('0.01'))
+                status, paid_parts = 'Partial', [part]
+            else:
+                status, paid_parts = 'Unpaid', []
+
+            invoices.append(Invoice(
+                id=invoice_id, client_id=group[0].client_id, amount_ht=amount_ht, tva=tva,
+                amount_ttc=amount_ttc, paid_amount=sum(paid_parts, Decimal('0')), date=invoice_date, status=status,
+            ))
+            links.extend(
+                Invoice.shipments.through(id=next(link_ids), invoice_id=invoice_id, shipment_id=s.id) for s in group
+            )
+            payments.extend(
+                PaymentRecord(
+                    invoice_id=invoice_id, amount=amount, method=self.rng.choice(PAYMENT_METHODS),
+                    date=invoice_date + timedelta(days=self.rng.randint(0, 30)),
+                )
+                for amount in paid_parts
+            )
+        for payment, payment_id in zip(payments, self.allocate_ids(PaymentRecord, len(payments))):
+            payment.id = payment_id
+
+        self.insert(Invoice, invoices)
+        self.insert(Invoice.shipments.through, links)
+        self.insert(PaymentRecord, payments)
+        return len(invoices), len(payments)
+
+    def generate_incidents(self, routes):
+        affected = [route for route in routes if self.rng.random() < 0.05]
+        incidents = [
+            Incident(
+                id=incident_id, type=self.rng.choice([choice for choice, _ in Incident.TYPE_CHOICES]),
+                description='Generated incident', date=route.date, related_entity_id=str(route.id),
+                resolved=route.status == 'Completed', driver_id=route.driver_id, vehicle_id=route.vehicle_id,
+                created_at=self.now,
+            )
+            for incident_id, route in zip(self.allocate_ids(Incident, len(affected)), affected)
+        ]
+        self.insert(Incident, incidents)
+        return len(incidents)
+
+    def generate_complaints(self, shipments):
+        affected = [shipment for shipment in shipments if self.rng.random() < 0.005]
+        complaint_ids = self.allocate_ids(Complaint, len(affected))
+        complaints = [
+            Complaint(
+                id=complaint_id, client_id=shipment.client_id, description='Generated complaint',
+                date=shipment.created_at.date(), created_at=shipment.created_at,
+                status=self.rng.choice([choice for choice, _ in Complaint.STATUS_CHOICES]),
+                priority=self.rng.choice([choice for choice, _ in Complaint.PRIORITY_CHOICES]),
+            )
+            for complaint_id, shipment in zip(complaint_ids, affected)
+        ]
+        items = [
+            ComplaintItem(id=item_id, complaint_id=complaint_id, type='shipment', entity_id=str(shipment.id))
+            for item_id, complaint_id, shipment in zip(self.allocate_ids(ComplaintItem, len(affected)), complaint_ids, affected)
+        ]
+        self.insert(Complaint, complaints)
+        self.insert(ComplaintItem, items)
+        return len(complaints)
+
+    def generate_audit_logs(self, count, days, user_ids):
+        start = self.now - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+
+        def rows():
+            for i, log_id in enumerate(self.allocate_ids(AuditLog, count)):
+                action = self.rng.choice(AUDIT_ACTIONS)
+                user_id = self.rng.choice(user_ids) if action != 'login_failed' else None
+                resource = self.rng.choice(AUDIT_RESOURCES)
+                yield AuditLog(
+                    id=log_id, user_id=user_id, username=self.usernames[user_id] if user_id else 'Anonymous',
+                    action=action, resource_type=resource, resource_id=str(self.rng.randint(1, 100000)),
+                    severity='medium' if action in ('permission_denied', 'login_failed', 'resource_deleted') else 'low',
+                    ip_address=f'10.{self.rng.randint(0, 255)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}',
+                    user_agent='LoadGenerator/1.0', endpoint=f'/api/v1/{resource.lower()}s/',
+                    http_method=self.rng.choice(['GET', 'POST', 'PATCH', 'DELETE']),
+                    timestamp=start + step * i, success=action not in ('permission_denied', 'login_failed'),
+                )
+
+        self.write(AuditLog, rows())
@@ -0,0 +1,122 @@
+"""
+Opt-in Keyset Pagination
+========================
+Cursor pagination for every list endpoint, enabled per request
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination that is only applied when the client asks for it.
+
+    - No `cursor` / `page_size` query param: legacy mode, the full list is
+      returned as a plain JSON array (current DataContext consumers).
+    - `?page_size=N` starts paginating, `?cursor=...` follows the
+      `next`/`previous` links returned in the envelope.
+
+    Pages are located with a `WHERE <key> < <position>` filter instead of an
+    OFFSET, so fetching page 1000 costs the same as fetching page 1.
+    ViewSets declare their keyset with `cursor_ordering`, which should start
+    with an indexed column and end with a unique one (`-id`). Unlike DRF's
+    single-column cursor, the position holds every column of the keyset and
+    the filter compares them lexicographically, so a leading column with
+    many ties (e.g. a route or invoice date) never falls back to offsets.
+    Keyset columns must not be null.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+    def get_page_size(self, request):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().get_page_size(request)
+
+    def get_ordering(self, request, queryset, view):
+        # The keyset is fixed per view: `?ordering=` from OrderingFilter
+        # still applies in legacy mode but cannot change the cursor key.
+        ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset, filtering on the whole keyset
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = tuple(_flip(order) for order in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, current_position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [
+            instance[order.lstrip('-')] if isinstance(instance, dict) else getattr(instance, order.lstrip('-'))
+            for order in ordering
+        ]
+        return json.dumps([str(value) for value in values])
+
+    @staticmethod
+    def _after(ordering, position):
+        """Rows strictly after `position` in `ordering`: (a < pa) | (a = pa & b < pb) | ..."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(ordering):
+            values = [position]  # Single-column cursor issued before keysets were composite
+        query, equal = Q(), Q()
+        for order, value in zip(ordering, values):
+            field = order.lstrip('-')
+            query |= equal & Q(**{f"{field}__{'lt' if order.startswith('-') else 'gt'}": value})
+            equal &= Q(**{field: value})
+        return query
+
+
+def _flip(order):
+    return order[1:] if order.startswith('-') else f'-{order}'
@@ -0,0 +1,32 @@
+"""
+Request Parsers
+===============
+"""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.utils.json import strict_constant
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON (one object per line), parsed into a list.
+    Blank lines are ignored. Like DRF's strict JSONParser, NaN and
+    Infinity literals are rejected.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        for line_number, line in enumerate(stream.read().decode(encoding).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line, parse_constant=strict_constant))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {line_number}: {exc}')
+        return items
@@ -22,6 +22,18 @@ class AuditLogSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'timestamp'] # Only ID and Timestamp are truly system-generated
 
+class AuditLogBatchItemSerializer(serializers.ModelSerializer):
+    """
+    One event of a batch upload. Who/where fields are filled by the view once
+    per batch; `timestamp` may carry the time the event happened client-side.
+    """
+    timestamp = serializers.DateTimeField(required=False)
+
+    class Meta:
+        model = AuditLog
+        fields = ('action', 'resource_type', 'resource_id', 'severity', 'endpoint', 'http_method',
+                  'timestamp', 'details', 'success', 'error_message')
+
 class DetailedAuditLogSerializer(serializers.ModelSerializer):
     """Serializer used for admin reporting with expanded details"""
     class Meta:
@@ -1,3 +1,506 @@
-from django.test import TestCase
+"""
+Query-Budget Regression Suite
+=============================
+Hits every GET route registered on the API router as each role, with N and
+10N rows of every model, and fails when:
 
-# Create your tests here.
+1. the number of SQL queries grows with the number of rows (N+1 pattern), or
+2. an endpoint exceeds the budget recorded in `query_budgets.json`
+   (queries, response size, wall time).
+
+Regenerate the baseline after an intentional change with:
+
+    UPDATE_QUERY_BUDGETS=1 python manage.py test users
+"""
+import base64
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User, AuditLog
+from users.audit_archive import archive_audit_logs, load_index
+from users.audit_writer import BufferedAuditWriter, audit_writer
+from users.exception_handlers import denial_aggregator
+from clients.models import Client
+from drivers.models import Driver
+from vehicles.models import Vehicle
+from destinations.models import Destination
+from service_types.models import ServiceType
+from pricing.models import PricingRule
+from shipments.models import Shipment, ShipmentEvent
+from routes.models import Route
+from billing.models import Invoice, PaymentRecord
+from incidents.models import Incident
+from complaints.models import Complaint, ComplaintItem
+
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'query_budgets.json'
+API_PREFIX = '/api/v1/'
+ROLES = ('admin', 'manager', 'driver', 'client')
+
+# Response size and wall time are noisier than query counts: only flag
+# regressions well beyond the recorded baseline.
+SIZE_TOLERANCE = float(os.environ.get('QUERY_BUDGET_SIZE_TOLERANCE', '1.25'))
+TIME_TOLERANCE = float(os.environ.get('QUERY_BUDGET_TIME_TOLERANCE', '5.0'))
+TIME_SLACK_MS = float(os.environ.get('QUERY_BUDGET_TIME_SLACK_MS', '100'))
+
+
+def seed_rows(n, role_users, offset=0):
+    """
+    Create `n` rows of every model, owned by the role users so each role
+    sees a growing list. `offset` keeps unique fields unique across calls.
+    """
+    client_user, driver_user = role_users['client'], role_users['driver']
+    driver = Driver.objects.get(user=driver_user)
+    today = datetime.date.today()
+
+    extra_users = User.objects.bulk_create([
+        User(username=f'seed-{role}-{offset + i}', email=f'seed-{role}-{offset + i}@example.com', role=role)
+        for i in range(n) for role in ('client', 'driver')
+    ])
+    Client.objects.bulk_create([Client(user=u) for u in extra_users if u.role == 'client'])
+    Driver.objects.bulk_create([
+        Driver(user=u, license_number=f'LIC-{u.username}') for u in extra_users if u.role == 'driver'
+    ])
+
+    vehicles = Vehicle.objects.bulk_create([
+        Vehicle(plate=f'SEED-{offset + i}', model='Truck', capacity_kg=1000) for i in range(n)
+    ])
+    destinations = Destination.objects.bulk_create([
+        Destination(name=f'Dest {offset + i}', country='Algeria', city='Algiers',
+                    delivery_zone='Zone A', distance_km=10 + i, type='Regular')
+        for i in range(n)
+    ])
+    service_types = ServiceType.objects.bulk_create([
+        ServiceType(name=f'Service {offset + i}', description='', category='Delivery',
+                    base_price=Decimal('500.00'), price_per_km=Decimal('15.00'),
+                    estimated_delivery_time='3 days')
+        for i in range(n)
+    ])
+    PricingRule.objects.bulk_create([
+        PricingRule(service_type=st, destination=dest, base_price=Decimal('500.00'), price_per_km=Decimal('15.00'))
+        for st, dest in zip(service_types, destinations)
+    ])
+
+    shipments = Shipment.objects.bulk_create([
+        Shipment(client=client_user, destination=destinations[i], weight_kg=10, volume_m3=1,
+                 price=Decimal('1000.00'))
+        for i in range(n)
+    ])
+    ShipmentEvent.objects.bulk_create([
+        ShipmentEvent(shipment=shipment, status='Pending', location='Algiers Hub') for shipment in shipments
+    ])
+    routes = Route.objects.bulk_create([
+        Route(driver=driver, vehicle=vehicles[i], date=today) for i in range(n)
+    ])
+    Route.shipments.through.objects.bulk_create([
+        Route.shipments.through(route=route, shipment=shipment)
+        for route, shipment in zip(routes, shipments)
+    ])
+
+    invoices = Invoice.objects.bulk_create([
+        Invoice(client=client_user, amount_ht=Decimal('1000.00'), tva=Decimal('190.00'),
+                amount_ttc=Decimal('1190.00'), date=today)
+        for _ in range(n)
+    ])
+    Invoice.shipments.through.objects.bulk_create([
+        Invoice.shipments.through(invoice=invoice, shipment=shipment)
+        for invoice, shipment in zip(invoices, shipments)
+    ])
+    PaymentRecord.objects.bulk_create([
+        PaymentRecord(invoice=invoice, amount=Decimal('100.00'), date=today, method='Cash')
+        for invoice in invoices
+    ])
+
+    Incident.objects.bulk_create([
+        Incident(type='Delay', description='Traffic', date=today, driver=driver, vehicle=vehicles[i])
+        for i in range(n)
+    ])
+    complaints = Complaint.objects.bulk_create([
+        Complaint(client=client_user, description='Late delivery', date=today) for _ in range(n)
+    ])
+    ComplaintItem.objects.bulk_create([
+        ComplaintItem(complaint=complaint, type='shipment', entity_id=str(shipment.id))
+        for complaint, shipment in zip(complaints, shipments)
+    ])
+    AuditLog.objects.bulk_create([
+        AuditLog(user=client_user, username=client_user.username, action='resource_created',
+                 resource_type='Shipment', resource_id=str(shipment.id))
+        for shipment in shipments
+    ])
+
+
+def get_budget_cases():
+    """
+    Every GET endpoint registered on the API router: list, paginated list,
+    detail, and GET extra actions. Returns (name, viewset, url) tuples where
+    detail URLs carry a `{pk}` placeholder.
+    """
+    from config.urls import router
+
+    cases = []
+    for prefix, viewset, basename in router.registry:
+        cases.append((f'{basename}-list', viewset, f'{API_PREFIX}{prefix}/'))
+        cases.append((f'{basename}-list-paged', viewset, f'{API_PREFIX}{prefix}/?page_size=10'))
+        if hasattr(viewset, 'retrieve'):
+            cases.append((f'{basename}-detail', viewset, f'{API_PREFIX}{prefix}/{{pk}}/'))
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            if extra.detail:
+                cases.append((f'{basename}-{extra.url_name}', viewset, f'{API_PREFIX}{prefix}/{{pk}}/{extra.url_path}/'))
+            else:
+                cases.append((f'{basename}-{extra.url_name}', viewset, f'{API_PREFIX}{prefix}/{extra.url_path}/'))
+    return cases
+
+
+# A zero-length denial window writes every 403 so counts do not depend on test order
+@override_settings(AUDIT_DENIAL_WINDOW_SECONDS=0)
+class QueryBudgetTests(TestCase):
+    N = int(os.environ.get('QUERY_BUDGET_N', '5'))
+
+    @classmethod
+    def setUpClass(cls):
+        # Keep the archive endpoint independent of any local archive directory
+        archive_dir = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(AUDIT_LOG_ARCHIVE_DIR=archive_dir))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role_users = {
+            role: User.objects.create_user(username=role, email=f'{role}@example.com', password='pass', role=role)
+            for role in ROLES
+        }
+        Driver.objects.create(user=cls.role_users['driver'], license_number='LIC-DRIVER')
+        Client.objects.create(user=cls.role_users['client'])
+        seed_rows(cls.N, cls.role_users)
+
+    def _measure(self, role, viewset, url):
+        api = APIClient()
+        api.force_authenticate(self.role_users[role])
+        if '{pk}' in url:
+            url = url.format(pk=self._pick_pk(api, viewset, url))
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = api.get(url)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        return {
+            'status': response.status_code,
+            'queries': len(ctx.captured_queries),
+            'bytes': len(body),
+            'ms': round(elapsed_ms, 2),
+        }
+
+    def _pick_pk(self, api, viewset, url):
+        """Prefer an object the role can actually see, else any row."""
+        list_url = url.split('{pk}')[0]
+        response = api.get(list_url)
+        if response.status_code == 200 and isinstance(response.data, list) and response.data:
+            return response.data[0]['id']
+        return viewset.queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+
+    def _run_all(self):
+        results = {}
+        for name, viewset, url in get_budget_cases():
+            for role in ROLES:
+                results[f'{role} GET {name}'] = self._measure(role, viewset, url)
+        return results
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        small = self._run_all()
+        seed_rows(self.N * 9, self.role_users, offset=self.N)
+        large = self._run_all()
+
+        for key, measured in large.items():
+            with self.subTest(endpoint=key):
+                self.assertEqual(
+                    measured['status'], small[key]['status'],
+                    f'{key}: status changed between N and 10N rows'
+                )
+                self.assertLessEqual(
+                    measured['queries'], small[key]['queries'],
+                    f'{key}: {small[key]["queries"]} queries at N={self.N}, '
+                    f'{measured["queries"]} at N={self.N * 10} (N+1 pattern?)'
+                )
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            BASELINE_PATH.write_text(json.dumps(
+                {'n': self.N * 10, 'endpoints': dict(sorted(large.items()))}, indent=2
+            ) + '\n')
+            return
+
+        self.assertTrue(BASELINE_PATH.exists(), f'Missing {BASELINE_PATH.name}; run with UPDATE_QUERY_BUDGETS=1')
+        baseline = json.loads(BASELINE_PATH.read_text())
+        if baseline.get('n') != self.N * 10:
+            self.skipTest(f'Baseline was recorded with N={baseline.get("n")}, not {self.N * 10}')
+
+        for key, measured in large.items():
+            with self.subTest(endpoint=key):
+                budget = baseline['endpoints'].get(key)
+                self.assertIsNotNone(budget, f'{key}: no budget recorded; run with UPDATE_QUERY_BUDGETS=1')
+                self.assertEqual(measured['status'], budget['status'], f'{key}: status changed')
+                self.assertLessEqual(measured['queries'], budget['queries'], f'{key}: query budget exceeded')
+                self.assertLessEqual(
+                    measured['bytes'], budget['bytes'] * SIZE_TOLERANCE,
+                    f'{key}: response grew from {budget["bytes"]} to {measured["bytes"]} bytes'
+                )
+                self.assertLessEqual(
+                    measured['ms'], budget['ms'] * TIME_TOLERANCE + TIME_SLACK_MS,
+                    f'{key}: took {measured["ms"]}ms (baseline {budget["ms"]}ms)'
+                )
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', role='manager')
+        client = User.objects.create_user(username='client', role='client')
+        invoice = Invoice.objects.create(client=client, amount_ht=Decimal('1'), tva=Decimal('0'),
+                                         amount_ttc=Decimal('1'), date=datetime.date(2026, 1, 1))
+        # Keyset ('-date', '-id'): many ties on the leading date
+        PaymentRecord.objects.bulk_create([
+            PaymentRecord(invoice=invoice, amount=Decimal('1'), date=datetime.date(2026, 1, 1 + index // 4),
+                          method='Cash')
+            for index in range(11)
+        ])
+        cls.expected = list(PaymentRecord.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def test_pages_through_ties_on_the_leading_column_without_offsets(self):
+        api = APIClient()
+        api.force_authenticate(self.manager)
+        url, seen = f'{API_PREFIX}payments/?page_size=3', []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = api.get(url)
+                seen += [row['id'] for row in response.data['results']]
+                url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertFalse([query for query in queries.captured_queries if 'OFFSET' in query['sql']])
+
+        # And back again from the last page
+        url, back = response.data['previous'], []
+        while url:
+            response = api.get(url)
+            back = [row['id'] for row in response.data['results']] + back
+            url = response.data['previous']
+        self.assertEqual(back + seen[-(len(seen) % 3 or 3):], self.expected)
+
+        bad = base64.b64encode(b'p=%5B%22not-a-date%22%2C%221%22%5D').decode()  # p=["not-a-date","1"]
+        self.assertEqual(api.get(f'{API_PREFIX}payments/?cursor={bad}').status_code, 404)
+
+
+class AuditUpdateDiffTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='pass', role='manager')
+        cls.client_user = User.objects.create_user(username='client', password='pass', role='client', first_name='Old')
+        cls.client_profile = Client.objects.create(user=cls.client_user)
+        driver = Driver.objects.create(
+            user=User.objects.create_user(username='driver', password='pass', role='driver'), license_number='LIC'
+        )
+        vehicle = Vehicle.objects.create(plate='AUD-1', model='Truck', capacity_kg=1000)
+        cls.shipments = [
+            Shipment.objects.create(client=cls.client_user, weight_kg=1, volume_m3=1, price=Decimal('10.00'))
+            for _ in range(2)
+        ]
+        cls.route = Route.objects.create(driver=driver, vehicle=vehicle, date=datetime.date(2026, 1, 1))
+        cls.route.shipments.add(cls.shipments[0])
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.manager)
+
+    def last_update_log(self):
+        return AuditLog.objects.filter(action='resource_updated').latest('timestamp')
+
+    def test_diff_only_contains_changed_submitted_fields(self):
+        response = self.api.patch(
+            f'{API_PREFIX}routes/{self.route.id}/',
+            {'status': 'Active', 'date': '2026-01-01'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.last_update_log().details['details']['changes'], {
+            'status': {'before': 'Planned', 'after': 'Active'},
+        })
+
+    def test_m2m_and_nested_source_changes_are_captured(self):
+        ids = sorted(s.id for s in self.shipments)
+        self.api.patch(f'{API_PREFIX}routes/{self.route.id}/', {'shipments': ids}, format='json')
+        self.assertEqual(self.last_update_log().details['details']['changes'], {
+            'shipments': {'before': [self.shipments[0].id], 'after': ids},
+        })
+
+        self.api.patch(f'{API_PREFIX}clients/{self.client_profile.id}/', {'name': 'New'}, format='json')
+        self.assertEqual(self.last_update_log().details['details']['changes'], {
+            'user.first_name': {'before': 'Old', 'after': 'New'},
+        })
+
+
+class AuditLogBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='pass', role='client')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def test_json_batch_returns_per_item_results(self):
+        events = [
+            {'action': 'resource_created', 'resource_type': 'UI_Event', 'details': {'page': 'shipments'}},
+            {'action': 'not-an-action'},
+            {'action': 'logout', 'timestamp': '2025-01-01T10:00:00Z'},
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post(f'{API_PREFIX}audit-logs/batch/', events, format='json',
+                                     HTTP_USER_AGENT='pytest', REMOTE_ADDR='10.0.0.9')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'invalid', 'created'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        logs = AuditLog.objects.order_by('timestamp')
+        self.assertEqual(logs.count(), 2)
+        self.assertEqual(logs[0].timestamp.year, 2025)
+        self.assertTrue(all(log.user_id == self.user.id and log.ip_address == '10.0.0.9' for log in logs))
+
+    def test_ndjson_batch(self):
+        body = '{"action": "login_success"}\n\n{"action": "logout"}\n'
+        response = self.api.post(f'{API_PREFIX}audit-logs/batch/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+
+
+class BufferedAuditWriterTests(TestCase):
+    @override_settings(AUDIT_LOG_FLUSH_RETRIES=0)
+    def test_a_failing_batch_falls_back_to_row_writes(self):
+        writer = BufferedAuditWriter()
+        entry = {'username': 'admin', 'action': 'login_success', 'severity': 'low', 'timestamp': timezone.now()}
+        writer._write([(1, entry), (2, {**entry, 'unknown_field': 1}), (3, {**entry, 'action': 'logout'})])
+
+        self.assertEqual(sorted(AuditLog.objects.values_list('action', flat=True)), ['login_success', 'logout'])
+        self.assertEqual((writer.counters['written'], writer.counters['dropped']), (2, 1))
+
+
+class PermissionDenialCoalescingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='pass', role='client')
+
+    def setUp(self):
+        denial_aggregator.flush()
+        AuditLog.objects.all().delete()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    @override_settings(AUDIT_DENIAL_WINDOW_SECONDS=60, AUDIT_DENIAL_SAMPLE_RATE=1.0)
+    def test_identical_denials_are_coalesced_into_a_summary(self):
+        for _ in range(5):
+            self.assertEqual(self.api.get(f'{API_PREFIX}users/').status_code, 403)
+        self.api.get(f'{API_PREFIX}vehicles/')
+        self.assertEqual(AuditLog.objects.filter(action='permission_denied').count(), 2)
+
+        denial_aggregator.flush()
+        summary = AuditLog.objects.get(action='permission_denied', details__coalesced=True)
+        self.assertEqual(summary.endpoint, f'{API_PREFIX}users/')
+        self.assertEqual(summary.details['count'], 4)
+
+    @override_settings(AUDIT_DENIAL_WINDOW_SECONDS=60, AUDIT_DENIAL_SAMPLE_RATE=0.0)
+    def test_unsampled_windows_only_write_the_summary(self):
+        for _ in range(3):
+            self.api.get(f'{API_PREFIX}users/')
+        self.assertFalse(AuditLog.objects.exists())
+
+        denial_aggregator.flush()
+        self.assertEqual(AuditLog.objects.get().details['count'], 3)
+
+    @override_settings(AUDIT_DENIAL_WINDOW_SECONDS=60, AUDIT_DENIAL_SAMPLE_RATE=1.0)
+    def test_closed_windows_are_swept_without_a_new_denial(self):
+        for _ in range(3):
+            self.api.get(f'{API_PREFIX}users/')
+        denial_aggregator.sweep()
+        self.assertFalse(AuditLog.objects.filter(details__coalesced=True).exists())  # Still open
+
+        with self.settings(AUDIT_DENIAL_WINDOW_SECONDS=0):
+            denial_aggregator.sweep()
+        self.assertEqual(AuditLog.objects.get(details__coalesced=True).details['count'], 2)
+
+    @override_settings(AUDIT_DENIAL_WINDOW_SECONDS=60, AUDIT_DENIAL_SAMPLE_RATE=0.0)
+    def test_open_windows_are_flushed_when_the_audit_writer_stops(self):
+        self.api.get(f'{API_PREFIX}users/')
+        audit_writer.stop()
+        self.assertEqual(AuditLog.objects.get().details['count'], 1)
+
+
+class AuditArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='pass', role='admin')
+
+    def setUp(self):
+        self.archive_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(AUDIT_LOG_ARCHIVE_DIR=self.archive_dir))
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def make_log(self, when, action='login_success'):
+        log = AuditLog.objects.create(username='admin', action=action, severity='low')
+        AuditLog.objects.filter(pk=log.pk).update(timestamp=when)
+
+    def test_old_rows_are_moved_to_daily_archives_and_streamed_back(self):
+        old = datetime.datetime(2025, 1, 5, 12, tzinfo=datetime.timezone.utc)
+        for hours in range(3):
+            self.make_log(old + datetime.timedelta(hours=hours))
+        self.make_log(old + datetime.timedelta(days=1), action='logout')
+        self.make_log(datetime.datetime.now(datetime.timezone.utc))
+
+        archived = archive_audit_logs(datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc), chunk_size=2)
+
+        self.assertEqual(archived, 4)
+        self.assertEqual(AuditLog.objects.count(), 1)
+        files = load_index(self.archive_dir)['files']
+        self.assertEqual(files['2025/01/audit-2025-01-05.ndjson.gz']['count'], 3)
+        with gzip.open(Path(self.archive_dir) / '2025/01/audit-2025-01-06.ndjson.gz', 'rt') as archive:
+            self.assertEqual(json.loads(archive.readline())['action'], 'logout')
+
+        response = self.api.get(f'{API_PREFIX}audit-logs/archive/?start=2025-01-05&end=2025-01-05&limit=2')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row['timestamp'].startswith('2025-01-05') for row in rows))
+
+        response = self.api.get(f'{API_PREFIX}audit-logs/archive/?action=logout')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        for query in ('limit=-1', 'limit=ten', 'start=2025-02-30'):
+            self.assertEqual(self.api.get(f'{API_PREFIX}audit-logs/archive/?{query}').status_code, 400, query)
+
+    def test_a_run_interrupted_before_the_delete_is_not_archived_twice(self):
+        old = datetime.datetime(2025, 1, 5, 12, tzinfo=datetime.timezone.utc)
+        for hours in range(3):
+            self.make_log(old + datetime.timedelta(hours=hours))
+        rows = list(AuditLog.objects.values())
+        cutoff = datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc)
+        archive_audit_logs(cutoff, chunk_size=2)
+
+        # As if the last delete had not committed: its rows are back
+        AuditLog.objects.bulk_create([AuditLog(**row) for row in rows[2:]])
+        self.make_log(old + datetime.timedelta(hours=5))
+        self.assertEqual(archive_audit_logs(cutoff, chunk_size=2), 2)
+
+        self.assertFalse(AuditLog.objects.exists())
+        self.assertEqual(load_index(self.archive_dir)['files']['2025/01/audit-2025-01-05.ndjson.gz']['count'], 4)
+        with gzip.open(Path(self.archive_dir) / '2025/01/audit-2025-01-05.ndjson.gz', 'rt') as archive:
+            self.assertEqual(len(archive.readlines()), 4)
@@ -1,12 +1,23 @@
+import json
+from itertools import islice
+
 from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import User
-from .serializers import UserSerializer, EmailTokenObtainPairSerializer, UserRegistrationSerializer, AuditLogSerializer
+from .serializers import (
+    UserSerializer, EmailTokenObtainPairSerializer, UserRegistrationSerializer,
+    AuditLogSerializer, AuditLogBatchItemSerializer
+)
 from .permissions import IsAdmin, IsManager, IsAuthenticated
 from .audit import AuditLog, get_client_ip, AuditLogMixin
-from rest_framework import filters, mixins
+from .audit_archive import iter_archived_logs, parse_bound
+from .parsers import NDJSONParser
+from rest_framework import filters, mixins, serializers
+from rest_framework.parsers import JSONParser
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
 
 class UserViewSet(AuditLogMixin, viewsets.ModelViewSet):
@@ -21,7 +32,7 @@ class UserViewSet(AuditLogMixin, viewsets.ModelViewSet):
     audit_resource_type = 'User'
 
     def perform_update(self, serializer):
-        old_instance = self.get_object()
+        old_instance = serializer.instance
         user = self.request.user
         
         # Check for role change specifically for special logging
@@ -161,17 +172,96 @@ class AuditLogViewSet(mixins.CreateModelMixin,
     """
     ViewSet for Audit Logs.
     - LIST/RETRIEVE: Only accessible by Admins.
-    - CREATE: Accessible by all authenticated users (for frontend sync).
+    - CREATE / BATCH: Accessible by all authenticated users (for frontend sync).
+    - ARCHIVE: Admins only, streams rows moved out by `archive_audit_logs`.
     Provides comprehensive audit trail for security and compliance.
     """
     queryset = AuditLog.objects.all().order_by('-timestamp')
     serializer_class = AuditLogSerializer
-    
+    cursor_ordering = ('-timestamp', '-id')
+    batch_max_size = 500
+    archive_max_limit = 10000
+
     def get_permissions(self):
-        if self.action == 'create':
+        if self.action in ['create', 'batch']:
             return [IsAuthenticated()]
         return [IsAdmin()]
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def batch(self, request):
+        """
+        Ingest many frontend audit events in one request.
+        Body: a JSON array, or NDJSON (Content-Type: application/x-ndjson).
+        Items are validated in one pass and all valid ones are inserted with a
+        single bulk_create; the response lists a result per input item.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Expected a non-empty list of events.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.batch_max_size:
+            return Response(
+                {'detail': f'At most {self.batch_max_size} events per batch.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Who/where is the same for every event of the batch
+        user = request.user
+        now = timezone.now()
+        common = {
+            'user': user,
+            'username': user.username,
+            'ip_address': get_client_ip(request),
+            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:500],
+        }
+        
+        item_serializer = AuditLogBatchItemSerializer()
+        results, rows = [], []
+        for index, item in enumerate(items):
+            try:
+                data = item_serializer.run_validation(item)
+            except serializers.ValidationError as exc:
+                results.append({'index': index, 'status': 'invalid', 'errors': exc.detail})
+                continue
+            # Client clocks may run ahead: never record events in the future
+            data['timestamp'] = min(data.get('timestamp') or now, now)
+            rows.append(AuditLog(**data, **common))
+            results.append({'index': index, 'status': 'created'})
+        
+        AuditLog.objects.bulk_create(rows)
+        
+        return Response(
+            {'created': len(rows), 'invalid': len(items) - len(rows), 'results': results},
+            status=status.HTTP_201_CREATED if len(rows) == len(items) else status.HTTP_207_MULTI_STATUS
+        )
+
+    @action(detail=False, methods=['get'])
+    def archive(self, request):
+        """
+        Stream archived (retention-expired) audit logs as NDJSON.
+        Query params: start / end (YYYY-MM-DD or ISO datetime), severity,
+        action, username, search, limit (default 1000, max archive_max_limit).
+        """
+        params = request.query_params
+        try:
+            start = parse_bound(params.get('start'))
+            end = parse_bound(params.get('end'), end_of_day=True)
+            limit = min(int(params.get('limit', 1000)), self.archive_max_limit)
+            if limit < 0:
+                raise ValueError(limit)
+        except ValueError:
+            return Response({'detail': 'Invalid start, end or limit.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = iter_archived_logs(
+            start=start,
+            end=end,
+            action=params.get('action'),
+            severity=params.get('severity'),
+            username=params.get('username'),
+            search=params.get('search'),
+        )
+        lines = (json.dumps(row) + '\n' for row in islice(matches, limit))
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
     def perform_create(self, serializer):
         # Auto-fill system fields if not provided
         serializer.save(
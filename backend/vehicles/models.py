@@ -10,6 +10,7 @@ class Vehicle(models.Model):
     plate = models.CharField(max_length=20, unique=True)
     model = models.CharField(max_length=50)
     capacity_kg = models.IntegerField()
+    capacity_m3 = models.FloatField(null=True, blank=True)  # Unknown: volume is not constrained
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Available')
     
     def __str__(self):
@@ -14,9 +14,20 @@ export const ENDPOINTS = {
     // Logistics
     SHIPMENTS: 'shipments/',
     DESTINATIONS: 'destinations/',
+    DESTINATIONS_NEAREST: 'destinations/nearest/',
+    DESTINATIONS_NEARBY: 'destinations/nearby/',
     SERVICE_TYPES: 'service-types/',
     PRICING_RULES: 'pricing-rules/',
+    PRICING_SIMULATE: 'pricing-rules/simulate/',
+    QUOTES: 'quotes/',
+    QUOTES_BATCH: 'quotes/batch/',
     ROUTES: 'routes/',
+    ROUTES_PLAN: 'routes/plan/',
+    ROUTES_LOADS: 'routes/loads/',
+    ROUTES_ASSIGN: 'routes/assign/',
+    ROUTES_AVAILABILITY: 'routes/availability/',
+    ROUTES_CONFLICTS: 'routes/conflicts/',
+    ROUTES_COMPLETE: 'routes/complete/',
 
     // Fleet
     VEHICLES: 'vehicles/',
@@ -27,8 +38,16 @@ export const ENDPOINTS = {
     // Support
     COMPLAINTS: 'complaints/',
     AUDIT_LOGS: 'audit-logs/',
+    AUDIT_LOGS_BATCH: 'audit-logs/batch/',
 
     // Billing
     INVOICES: 'invoices/',
     PAYMENTS: 'payments/',
+
+    // Dashboard aggregates
+    STATS: 'stats/',
+    STATS_SHIPMENTS: 'stats/shipments/',
+    STATS_REVENUE: 'stats/revenue/',
+    STATS_UNPAID: 'stats/unpaid/',
+    STATS_ROUTES_PER_DRIVER: 'stats/routes-per-driver/',
 };
@@ -114,6 +114,7 @@ export const DataProvider = ({ children }: { children: ReactNode }) => {
           plate: v.plate,
           model: v.model,
           capacityKg: v.capacity_kg || 0,
+          capacityM3: v.capacity_m3 ?? null,
           status: v.status
         }));
       }
@@ -322,6 +323,8 @@ export const DataProvider = ({ children }: { children: ReactNode }) => {
             city: d.city,
             deliveryZone: d.deliveryZone || d.delivery_zone,
             distanceKm: d.distanceKm || d.distance_km || 0,
+            latitude: d.latitude ?? null,
+            longitude: d.longitude ?? null,
             type: d.type,
             destinationType: d.destinationType || d.destination_type || 'Domestic',
             status: (d.isActive !== undefined ? d.isActive : d.is_active) ? 'Active' : 'Inactive',
@@ -9,6 +9,8 @@ import { useAuth } from '../contexts/AuthContext';
 import { auditLog } from '../services/auditLog';
 
 import { useData } from '../contexts/DataContext';
+import apiClient from '../api/client';
+import { ENDPOINTS } from '../api/endpoints';
 
 const Shipments: React.FC = () => {
   const { getItems, addItem, deleteItem, updateItem, isClientsLoading, refetchClients } = useData();
@@ -20,6 +22,17 @@ const Shipments: React.FC = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [showModal, setShowModal] = useState(false);
   const [historyViewShipment, setHistoryViewShipment] = useState<Shipment | null>(null);
+
+  // Lists no longer carry the tracking history: load it from the detail endpoint
+  const openHistory = async (shipment: Shipment) => {
+    setHistoryViewShipment({ ...shipment, history: [] });
+    try {
+      const res = await apiClient.get(`${ENDPOINTS.SHIPMENTS}${shipment.id}/`);
+      setHistoryViewShipment(current => current && current.id === shipment.id ? { ...current, history: res.data.history || [] } : current);
+    } catch (error) {
+      console.error('Failed to load shipment history', error);
+    }
+  };
   const [errors, setErrors] = useState<string[]>([]);
 
   // Form State
@@ -643,7 +656,7 @@ const Shipments: React.FC = () => {
                           </button>
                         )}
                         <button
-                          onClick={() => setHistoryViewShipment(shipment)}
+                          onClick={() => openHistory(shipment)}
                           className="inline-flex items-center text-sm font-medium px-3 py-1.5 rounded-lg transition-colors text-slate-500 dark:text-slate-400 hover:text-blue-600 dark:hover:text-blue-400 hover:bg-slate-100 dark:hover:bg-slate-800"
                         >
                           <History size={16} className="mr-2" /> History
@@ -10,9 +10,100 @@ interface AuditEntry {
 }
 
 const STORAGE_KEY = 'routemind_audit_log';
+// Events waiting to be synced; kept in localStorage so a reload does not lose them
+const PENDING_KEY = 'routemind_audit_pending';
+const FLUSH_INTERVAL_MS = 5000;
+const MAX_BATCH = 100;
+const MAX_PENDING = 1000;
+
+interface PendingEvent {
+  // Client-side identity, not sent: the queue is trimmed while a batch is in flight
+  _id: string;
+  action: string;
+  severity: 'low' | 'medium' | 'high' | 'critical';
+  resource_type: string;
+  resource_id: string;
+  timestamp: string;
+  details: Record<string, any>;
+}
+
+let flushTimer: ReturnType<typeof setTimeout> | null = null;
+let flushing = false;
 
 function nowISO() { return new Date().toISOString(); }
 
+function newId() { return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 9)}`; }
+
+function loadPending(): PendingEvent[] {
+  try {
+    return JSON.parse(localStorage.getItem(PENDING_KEY) || '[]');
+  } catch (e) { return []; }
+}
+
+// Remove the events of a batch by identity; the queue may have been trimmed or grown meanwhile
+function removePending(sent: PendingEvent[]) {
+  const ids = new Set(sent.map(event => event._id));
+  savePending(loadPending().filter(event => !ids.has(event._id)));
+}
+
+function savePending(events: PendingEvent[]) {
+  try {
+    localStorage.setItem(PENDING_KEY, JSON.stringify(events.slice(-MAX_PENDING)));
+  } catch (e) {
+    // ignore
+  }
+}
+
+function scheduleFlush() {
+  if (flushTimer) return;
+  flushTimer = setTimeout(() => {
+    flushTimer = null;
+    flush();
+  }, FLUSH_INTERVAL_MS);
+}
+
+// Sync buffered events to the backend in batches instead of one POST per action
+async function flush() {
+  if (flushing) return;
+  let pending = loadPending();
+  if (pending.length === 0) return;
+  if (pending.some(event => !event._id)) {
+    // Queued by an older version: give them an identity before sending
+    pending = pending.map(event => event._id ? event : { ...event, _id: newId() });
+    savePending(pending);
+  }
+
+  flushing = true;
+  const batch = pending.slice(0, MAX_BATCH);
+  try {
+    const { default: apiClient } = await import('../api/client');
+    const { ENDPOINTS } = await import('../api/endpoints');
+    await apiClient.post(ENDPOINTS.AUDIT_LOGS_BATCH, batch.map(({ _id, ...event }) => event));
+    // Every item got a result (created or invalid): none of them is worth retrying
+    removePending(batch);
+  } catch (e: any) {
+    const status = e?.response?.status;
+    if (status && status >= 400 && status < 500 && status !== 429) {
+      // Rejected as a whole (e.g. logged out): drop instead of retrying forever
+      removePending(batch);
+    }
+    // Fail silently for audit logs to not block main UI
+    console.error('Failed to sync audit log to backend', e);
+  } finally {
+    flushing = false;
+  }
+
+  if (loadPending().length > 0) scheduleFlush();
+}
+
+if (typeof window !== 'undefined') {
+  document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') flush();
+  });
+  // Retry whatever a previous session left behind
+  if (loadPending().length > 0) scheduleFlush();
+}
+
 function persist(entry: AuditEntry) {
   try {
     const existing = JSON.parse(localStorage.getItem(STORAGE_KEY) || '[]');
@@ -38,20 +129,22 @@ export const auditLog = {
     // Persist locally
     persist(entry);
 
-    // Sync to backend
-    try {
-      const { default: apiClient } = await import('../api/client');
-      const { ENDPOINTS } = await import('../api/endpoints');
-      await apiClient.post(ENDPOINTS.AUDIT_LOGS || '/api/v1/audit-logs/', {
-        action: action,
-        severity: severityMap[level],
-        resource_type: details?.resource_type || 'UI_Event',
-        resource_id: details?.resource_id || '',
-        details: details || {}
-      });
-    } catch (e) {
-      // Fail silently for audit logs to not block main UI
-      console.error('Failed to sync audit log to backend', e);
+    // Queue for the next batched sync to the backend
+    const pending = loadPending();
+    pending.push({
+      _id: newId(),
+      action: action,
+      severity: severityMap[level],
+      resource_type: details?.resource_type || 'UI_Event',
+      resource_id: details?.resource_id || '',
+      timestamp: entry.time,
+      details: details || {}
+    });
+    savePending(pending);
+    if (pending.length >= MAX_BATCH) {
+      flush();
+    } else {
+      scheduleFlush();
     }
 
     // Console output for developer visibility
@@ -62,6 +155,8 @@ export const auditLog = {
     }
   },
 
+  flush,
+
   getRecent: (limit = 50) => {
     try {
       const existing = JSON.parse(localStorage.getItem(STORAGE_KEY) || '[]');
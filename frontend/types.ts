@@ -30,6 +30,7 @@ export interface Vehicle {
   plate: string;
   model: string;
   capacityKg: number;
+  capacityM3?: number | null;
   status: 'Available' | 'In Use' | 'Maintenance';
 }
 
@@ -38,6 +39,8 @@ export interface ShipmentHistoryEvent {
   status: ShipmentStatus;
   location: string;
   description?: string;
+  timestamp?: string;
+  actor?: string | null;
 }
 
 export interface Shipment {
@@ -82,6 +85,9 @@ export interface Route {
   fuel_consumed_liters?: number;
   estimatedDistance?: number;
   estimatedDuration?: number;
+  estimated_distance_km?: number | null;
+  estimated_duration_hours?: number | null;
+  stops?: number[]; // Destination ids in visiting order (route planner)
 }
 
 export interface Invoice {
@@ -168,6 +174,7 @@ export interface PricingRule {
   basePrice: number;
   pricePerKm?: number;
   isActive: boolean;
+  effectiveFrom?: string | null;
 }
 
 export type DestinationType = 'Stock Warehouse' | 'Main Hub' | 'Checkpoint' | 'Regular';
@@ -181,6 +188,8 @@ export interface DestinationRecord {
   city: string;
   deliveryZone: string;
   distanceKm: number;
+  latitude?: number | null;
+  longitude?: number | null;
   type: DestinationType;
   destinationType?: 'Domestic' | 'International';
   packagesCapacity?: number;